@@ -28,7 +28,7 @@ print("%s genes have at least one annotation"%(len(gene2go.keys())))
 print("Term graph for with %s nodes successfully created."%(len(G.nodes())))
 
 # Calculate term distances (most time consuming step)
-termDistancePath = os.path.join(homeDir,"term-distances.npy")
+termDistancePath = os.path.join(homeDir,"term-distances.dist")
 if not os.path.exists(termDistancePath):
     td = TermDistances(termsPath,graphPath)
     print("total distances to evaluate: %s"%td.totalDistances)
@@ -37,14 +37,14 @@ if not os.path.exists(termDistancePath):
     print time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart))
 
 # Calculate gene distances
-geneDistancePath = os.path.join(homeDir,"gene-distances.csv")
+geneDistancePath = os.path.join(homeDir,"gene-distances.dist")
 if not os.path.exists(geneDistancePath):
     gd = GeneDistances(termsPath,termDistancePath,outFile=geneDistancePath)
     gd.run()
 
 # Spectral Clustering parameter search 
-silvalFile = re.sub("\.csv","-scparams-sv.csv",geneDistancePath)
-clustersFile = re.sub("\.csv","-scparams-cl.csv",geneDistancePath)
+silvalFile = re.sub("\.dist","-scparams-sv.csv",geneDistancePath)
+clustersFile = re.sub("\.dist","-scparams-cl.csv",geneDistancePath)
 if not os.path.exists(silvalFile):
     scps = SpectralClusterParamSearch(geneDistancePath,dtype='distance')
     scps.run(chunks=15)
@@ -94,21 +94,21 @@ if not os.path.exists(graphPath):
     print("Term graph for with %s nodes successfully created."%(len(G.nodes())))
 
 # Calculate term distances
-termDistancePath = os.path.join(gsaDir,"term-distances-%s.npy"%(_aspect))
+termDistancePath = os.path.join(gsaDir,"term-distances-%s.dist"%(_aspect))
 if not os.path.exists(termDistancePath):
     td = TermDistances(termsPath,graphPath)
     print("total distances to evaluate: %s"%td.totalDistances)
     td.run_with_multiprocessing(termDistancePath,cpus=7)
 
 # Calculate gene distances
-geneDistancePath = os.path.join(gsaDir,"gene-distances-%s.csv"%(_aspect))
+geneDistancePath = os.path.join(gsaDir,"gene-distances-%s.dist"%(_aspect))
 if not os.path.exists(geneDistancePath):
     gd = GeneDistances(termsPath,termDistancePath,outFile=geneDistancePath)
     gd.run()
 
 # Spectral Clustering parameter search
-silvalFile = re.sub("\.csv","-scparams-sv.csv",geneDistancePath)
-clustersFile = re.sub("\.csv","-scparams-cl.csv",geneDistancePath)
+silvalFile = re.sub("\.dist","-scparams-sv.csv",geneDistancePath)
+clustersFile = re.sub("\.dist","-scparams-cl.csv",geneDistancePath)
 if not os.path.exists(silvalFile):
     scps = SpectralClusterParamSearch(geneDistancePath,dtype='distance')
     scps.run(chunks=5,kRange=range(3,11))
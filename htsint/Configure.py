@@ -17,6 +17,8 @@ defaultCONFIG = {'data':'/usr/local/share/htsint',
                  'dbpass':"",
                  'dbhost':"localhost",
                  'dbport':"5433",
+                 'dbbackend':"postgresql",
+                 'dbfile':"",
                  'taxa': ['3702','4932','5476','7227','7955','8355','8364','9031','9606',\
                           '10090','10566','10116','28377']
 }
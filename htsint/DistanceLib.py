@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+"""
+library of functions used to calculate and index pairwise distances
+
+distances are kept in condensed form, that is, the upper triangle of the
+square distance matrix (i < j) stored row by row as a 1-D array.
+The ordering is the same as scipy.spatial.distance.squareform
+"""
+
+__author__ = "Adam Richards"
+
+import os,json,hashlib
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+def get_condensed_size(n):
+    """
+    return the number of pairwise distances among n items
+    """
+
+    n = int(n)
+    return (n * (n - 1)) // 2
+
+def get_chunk_ranges(total,chunks):
+    """
+    split total distances into approximately equal condensed ranges (first,last)
+    """
+
+    stopPoints = np.linspace(0,total,max(1,int(chunks))+1).round().astype(np.int64)
+    return [(int(first),int(last)) for first,last in zip(stopPoints[:-1],stopPoints[1:]) if last > first]
+
+def get_condensed_starts(n):
+    """
+    return the condensed index where each row begins
+    row i holds the distances (i,i+1) ... (i,n-1)
+    """
+
+    i = np.arange(n,dtype=np.int64)
+    return (i * n) - ((i * (i + 1)) // 2)
+
+def get_condensed_index(i,j,n):
+    """
+    return the condensed index of the pair (i,j)
+    """
+
+    if i == j:
+        raise Exception("There is no condensed index for a self distance %s"%i)
+    if i > j:
+        i,j = j,i
+
+    return (i * n) - ((i * (i + 1)) // 2) + (j - i - 1)
+
+def graph_to_csr(G,terms):
+    """
+    convert a weighted networkx graph into a scipy CSR matrix
+
+    G     - the networkx graph (i.e. GeneOntology.create_gograph)
+    terms - the nodes of interest
+
+    returns the csr matrix and an array that maps each term to its row
+    terms not present in G are given an isolated row so all distances to them are inf
+    """
+
+    nodes = list(G.nodes())
+    nodeIndex = dict([(node,i) for i,node in enumerate(nodes)])
+    for term in terms:
+        if term not in nodeIndex:
+            nodeIndex[term] = len(nodeIndex)
+
+    ## each undirected edge is stored once and solved with directed=False
+    rows = np.zeros(G.number_of_edges(),dtype=np.int32)
+    cols = np.zeros(G.number_of_edges(),dtype=np.int32)
+    weights = np.zeros(G.number_of_edges(),dtype=np.float64)
+    for e,(source,sink,data) in enumerate(G.edges(data=True)):
+        rows[e] = nodeIndex[source]
+        cols[e] = nodeIndex[sink]
+        weights[e] = data.get('weight',1.0)
+
+    total = len(nodeIndex)
+    csgraph = csr_matrix((weights,(rows,cols)),shape=(total,total))
+    termNodes = np.array([nodeIndex[term] for term in terms],dtype=np.int32)
+
+    return csgraph,termNodes
+
+def term_distances(csgraph,termNodes,first=0,last=None,blockSize=256,out=None):
+    """
+    calculate the condensed shortest path distances among terms
+
+    csgraph   - csr matrix from graph_to_csr
+    termNodes - row of csgraph for each term
+    first     - first condensed index to calculate
+    last      - last condensed index to calculate (exclusive)
+    blockSize - number of source terms solved with each call to dijkstra
+    out       - optional float32 array of size last-first
+
+    each call to dijkstra returns the distances from a block of sources to every node
+    so all the sinks of a term are found in a single pass
+    """
+
+    n = termNodes.size
+    total = get_condensed_size(n)
+    if last == None:
+        last = total
+
+    if first < 0 or last > total or first > last:
+        raise Exception("Invalid distance range %s-%s (total=%s)"%(first,last,total))
+
+    if out is None:
+        out = np.empty(last-first,dtype=np.float32)
+    out[:] = np.inf
+
+    if first == last:
+        return out
+
+    ## find the rows (source terms) that overlap the requested range
+    starts = get_condensed_starts(n)
+    rowFirst = int(np.searchsorted(starts,first,side='right')) - 1
+    rowLast = int(np.searchsorted(starts,last,side='left'))
+
+    for blockStart in range(rowFirst,rowLast,blockSize):
+        rows = np.arange(blockStart,min(blockStart+blockSize,rowLast))
+        dist = dijkstra(csgraph,directed=False,indices=termNodes[rows])
+
+        for k,i in enumerate(rows):
+            a = max(starts[i],first)
+            b = min(starts[i] + (n - i - 1),last)
+            if b <= a:
+                continue
+            j = i + 1 + (a - starts[i])
+            out[a-first:b-first] = dist[k,termNodes[j:j+(b-a)]]
+
+    return out
+
+def get_square_rows(distances,rows,n,diagonal=0.0):
+    """
+    return full rows of the square distance matrix from condensed distances
+
+    distances - condensed distances
+    rows      - indices of the rows to return
+    n         - the number of items
+    diagonal  - the value used for self distances
+    """
+
+    starts = get_condensed_starts(n)
+    out = np.empty((len(rows),n),dtype=np.float32)
+    for k,i in enumerate(rows):
+        j = np.arange(i,dtype=np.int64)
+        out[k,:i] = distances[starts[j] + (i - j - 1)]
+        out[k,i] = diagonal
+        out[k,i+1:] = distances[starts[i]:starts[i]+(n-i-1)]
+
+    return out
+
+def condensed_to_square(distances,n,out=None):
+    """
+    expand condensed distances into a square matrix (the diagonal is zero)
+    out - optional preallocated (n,n) array (i.e. a memory-mapped array)
+    """
+
+    if out is None:
+        out = np.zeros((n,n),dtype=np.float32)
+
+    starts = get_condensed_starts(n)
+    for i in range(n):
+        row = distances[starts[i]:starts[i]+(n-i-1)]
+        out[i,i] = 0.0
+        out[i,i+1:] = row
+        out[i+1:,i] = row
+
+    return out
+
+def pack_gene_terms(geneTerms):
+    """
+    pack the term indices of each gene into a single array
+
+    returns the flat term indices, the offset of each gene with at least
+    one term and the indices of those genes
+    """
+
+    sizes = np.array([terms.size for terms in geneTerms],dtype=np.int64)
+    valid = np.where(sizes > 0)[0]
+    if valid.size == 0:
+        return np.zeros(0,dtype=np.int64),np.zeros(0,dtype=np.int64),valid
+
+    flat = np.hstack([geneTerms[i] for i in valid]).astype(np.int64)
+    offsets = np.hstack([[0],np.cumsum(sizes[valid])[:-1]]).astype(np.int64)
+
+    return flat,offsets,valid
+
+def gene_distances(termDistances,nTerms,geneTerms,packed,rowFirst,rowLast):
+    """
+    calculate the condensed gene distances for a block of source genes
+
+    termDistances - condensed term distances
+    nTerms        - the number of terms
+    geneTerms     - sorted term indices for each gene
+    packed        - the output of pack_gene_terms(geneTerms)
+    rowFirst      - the first source gene
+    rowLast       - the last source gene (exclusive)
+
+    The distance between two genes is the minimum distance among their terms,
+    pairs of identical terms are ignored.  For each source gene the minimum over
+    its terms is found for every term, then gathered and reduced over the terms
+    of every sink gene.  Returns the first condensed index and the distances.
+    """
+
+    flat,offsets,valid = packed
+    nGenes = len(geneTerms)
+    total = get_condensed_size(nGenes)
+    starts = np.hstack([get_condensed_starts(nGenes),[total]])
+    first,last = int(starts[rowFirst]),int(starts[rowLast])
+    out = np.empty(last-first,dtype=np.float32)
+    out[:] = np.inf
+
+    blockTerms = np.unique(np.hstack([np.zeros(0,dtype=np.int64)] + 
+                                     [geneTerms[i] for i in range(rowFirst,rowLast)]))
+    if blockTerms.size == 0 or valid.size == 0:
+        return first,out
+
+    ## minimum distance from each source gene to every term
+    termRows = get_square_rows(termDistances,blockTerms,nTerms,diagonal=np.inf)
+    termMins = np.empty((rowLast-rowFirst,nTerms),dtype=np.float32)
+    termMins[:] = np.inf
+    for b,i in enumerate(range(rowFirst,rowLast)):
+        if geneTerms[i].size > 0:
+            termMins[b] = termRows[np.searchsorted(blockTerms,geneTerms[i])].min(axis=0)
+
+    ## minimum over the terms of each sink gene
+    geneMins = np.empty((rowLast-rowFirst,nGenes),dtype=np.float32)
+    geneMins[:] = np.inf
+    geneMins[:,valid] = np.minimum.reduceat(termMins[:,flat],offsets,axis=1)
+
+    for b,i in enumerate(range(rowFirst,rowLast)):
+        a = starts[i] - first
+        out[a:a+(nGenes-i-1)] = geneMins[b,i+1:]
+
+    return first,out
+
+def get_file_checksum(filePath,blockSize=4194304):
+    """
+    return the md5 checksum of a file
+    """
+
+    md5 = hashlib.md5()
+    fid = open(filePath,'rb')
+    for block in iter(lambda: fid.read(blockSize),b''):
+        md5.update(block)
+    fid.close()
+
+    return md5.hexdigest()
+
+def get_chunk_file(resultsDir,first,last):
+    """
+    return the results file path for a chunk of condensed distances
+    """
+
+    return os.path.join(resultsDir,"out-%s-%s.npy"%(int(first),int(last)))
+
+def write_chunk_manifest(resultsDir,chunkRanges,total):
+    """
+    write the manifest that describes how the distances were split into chunks
+    the md5 checksum of each finished chunk is added by get_incomplete_chunks
+    """
+
+    manifest = {'version':1,'total':int(total),
+                'chunks':[{'first':first,'last':last,
+                           'file':os.path.basename(get_chunk_file(resultsDir,first,last)),'checksum':None}
+                          for first,last in chunkRanges]}
+    save_chunk_manifest(resultsDir,manifest)
+
+    return manifest
+
+def save_chunk_manifest(resultsDir,manifest):
+    """
+    save a chunk manifest (the file is replaced in a single step)
+    """
+
+    manifestPath = os.path.join(resultsDir,"manifest.json")
+    fid = open(manifestPath+".tmp",'w')
+    json.dump(manifest,fid,indent=1)
+    fid.close()
+    os.replace(manifestPath+".tmp",manifestPath)
+
+def read_chunk_manifest(resultsDir):
+    """
+    return the chunk manifest (None if there is no manifest)
+    """
+
+    manifestPath = os.path.join(resultsDir,"manifest.json")
+    if os.path.exists(manifestPath) == False:
+        return None
+
+    fid = open(manifestPath,'r')
+    manifest = json.load(fid)
+    fid.close()
+
+    return manifest
+
+def mark_chunk_complete(chunkFile):
+    """
+    write a completion marker holding the checksum of a finished chunk
+    each job writes its own marker so the jobs never write to the shared manifest
+    """
+
+    fid = open(chunkFile+".done",'w')
+    fid.write(get_file_checksum(chunkFile))
+    fid.close()
+
+def read_chunk_marker(chunkFile):
+    """
+    return the checksum in the completion marker of a chunk (None if there is no marker)
+    """
+
+    if os.path.exists(chunkFile+".done") == False:
+        return None
+
+    fid = open(chunkFile+".done",'r')
+    checksum = fid.read().strip()
+    fid.close()
+
+    return checksum
+
+def check_chunk(chunkFile,size,checksum=None):
+    """
+    return True if a chunk is complete, is not corrupt and has the expected size
+    the checksum of the completion marker is used and checksum (i.e. from the manifest) when there is no marker
+    """
+
+    marker = read_chunk_marker(chunkFile)
+    if marker != None:
+        checksum = marker
+
+    if os.path.exists(chunkFile) == False or checksum == None:
+        return False
+
+    if get_file_checksum(chunkFile) != checksum:
+        return False
+
+    return np.load(chunkFile,mmap_mode='r').shape == (size,)
+
+def get_incomplete_chunks(resultsDir,manifest):
+    """
+    return the (index,chunk) of chunks in a manifest that are missing or corrupt
+    the checksums of the complete chunks are recorded in the manifest so a chunk can still be
+    verified if its completion marker is removed
+    """
+
+    incomplete = []
+    updated = False
+    for i,chunk in enumerate(manifest['chunks']):
+        chunkFile = os.path.join(resultsDir,chunk['file'])
+        if check_chunk(chunkFile,chunk['last']-chunk['first'],chunk.get('checksum')) == False:
+            incomplete.append((i,chunk))
+            continue
+
+        marker = read_chunk_marker(chunkFile)
+        if marker != None and chunk.get('checksum') != marker:
+            chunk['checksum'] = marker
+            updated = True
+
+    if updated == True:
+        save_chunk_manifest(resultsDir,manifest)
+
+    return incomplete
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+A compact binary store for pairwise distances
+
+The file holds a sorted item index (i.e. GO terms or genes) followed by the
+float32 condensed distances (see DistanceLib).  The distances are memory-mapped
+so a store of any size is opened without reading or parsing it.
+
+layout (little-endian)
+    magic     - 8 bytes 'HTSDIST'
+    header    - uint64 version, number of items, item width, distance offset
+    items     - sorted item ids as fixed width bytes
+    distances - float32 condensed distances (missing distances are inf)
+"""
+
+__author__ = "Adam Richards"
+
+import os
+import numpy as np
+from .DistanceLib import get_condensed_size,get_condensed_index
+
+MAGIC = b'HTSDIST\x00'
+VERSION = 1
+
+class DistanceStore(object):
+    """
+    a class to read and write pairwise distances in a memory-mapped binary file
+    """
+
+    def __init__(self,storePath,items=None,mode='r'):
+        """
+        Constructor
+
+        storePath - path to the store
+        items     - list of item ids (required when mode='w')
+        mode      - 'r' read only, 'r+' read and write, 'w' create a new store
+                    a new store is filled with inf
+        """
+
+        ## error checking
+        if mode not in ['r','r+','w']:
+            raise Exception("Invalid mode specified %s"%mode)
+
+        self.storePath = os.path.realpath(storePath)
+        self.mode = mode
+        self.index = None
+
+        if mode == 'w':
+            if items is None:
+                raise Exception("items must be specified when creating a distance store")
+            self._create(items)
+        elif os.path.exists(self.storePath) == False:
+            raise Exception("Cannot find specified path\n%s"%self.storePath)
+
+        ## read the header
+        fid = open(self.storePath,'rb')
+        magic = fid.read(len(MAGIC))
+        if magic != MAGIC:
+            fid.close()
+            raise Exception("Not a valid distance store\n%s"%self.storePath)
+        version,n,width,offset = np.frombuffer(fid.read(32),dtype='<u8')
+        fid.close()
+
+        if version != VERSION:
+            raise Exception("Unsupported distance store version %s (expected %s)"%(version,VERSION))
+
+        ## memory-map the items and the distances
+        self.n = int(n)
+        self.size = get_condensed_size(self.n)
+        self.offset = int(offset)
+        mmapMode = 'r' if mode == 'r' else 'r+'
+        self.items = np.memmap(self.storePath,dtype='S%s'%int(width),mode='r',
+                               offset=len(MAGIC)+32,shape=(self.n,))
+        if self.size == 0:
+            self.distances = np.zeros(0,dtype=np.float32)
+        else:
+            self.distances = np.memmap(self.storePath,dtype='<f4',mode=mmapMode,
+                                       offset=self.offset,shape=(self.size,))
+
+        if mode == 'w':
+            self.distances[:] = np.inf
+
+    def _create(self,items):
+        """
+        write the header and item index then allocate the distances
+        """
+
+        _items = np.array([str(item).encode('utf-8') for item in items])
+        if _items.size > 1 and np.any(_items[1:] <= _items[:-1]):
+            raise Exception("items must be sorted and unique to create a distance store")
+
+        width = max(1,_items.dtype.itemsize)
+        itemsEnd = len(MAGIC) + 32 + (_items.size * width)
+        offset = itemsEnd + ((8 - (itemsEnd % 8)) % 8)
+        header = np.array([VERSION,_items.size,width,offset],dtype='<u8')
+
+        fid = open(self.storePath,'wb')
+        fid.write(MAGIC)
+        fid.write(header.tobytes())
+        fid.write(_items.astype('S%s'%width).tobytes())
+        fid.truncate(offset + (get_condensed_size(_items.size) * 4))
+        fid.close()
+
+    def get_items(self):
+        """
+        return the item ids as a list of strings
+        """
+
+        return [item.decode('utf-8') for item in self.items]
+
+    def get_index(self,item):
+        """
+        return the index of an item (None if the item is not in the store)
+        """
+
+        if self.index == None:
+            self.index = dict([(item,i) for i,item in enumerate(self.get_items())])
+
+        return self.index.get(item)
+
+    def get_distance(self,i,j):
+        """
+        return the distance between the items with indices i and j
+        """
+
+        if i == j:
+            return 0.0
+
+        return self.distances[get_condensed_index(i,j,self.n)]
+
+    def get_item_distance(self,source,sink):
+        """
+        return the distance between two items (None if either is not in the store)
+        """
+
+        i,j = self.get_index(source),self.get_index(sink)
+        if i == None or j == None:
+            return None
+
+        return self.get_distance(i,j)
+
+    def flush(self):
+        """
+        write any changes to disk
+        """
+
+        if isinstance(self.distances,np.memmap):
+            self.distances.flush()
+
+    def close(self):
+        """
+        flush and release the memory-mapped arrays
+        """
+
+        self.flush()
+        self.items = None
+        self.distances = None
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""
+Executors dispatch the chunk scripts created by classes like TermDistances
+and ParallelBlast
+
+    LocalExecutor   - run the scripts with a pool of local processes
+    SgeExecutor     - submit the scripts via qsub (optionally waiting for the jobs to finish)
+    CommandExecutor - run the scripts with any command template (i.e. 'sbatch --wait {script}')
+
+A check function may be given to submit so a script only counts as done when
+its output is complete (i.e. a chunk with a valid completion marker), scripts
+that fail the check are retried and scripts that pass it are not run again.
+The output of the commands (i.e. the qsub job ids) is written to a separate
+log for each script (name.submit.log).
+
+"""
+
+__author__ = "Adam Richards"
+
+import os,sys,time,subprocess
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+## the exit code recorded when a script exits with 0 but its output is not complete
+INCOMPLETE = -1
+
+class Executor(object):
+    """
+    a base class to dispatch, monitor and retry a list of scripts
+    """
+
+    def __init__(self,retries=0,verbose=True):
+        """
+        Constructor
+
+        retries - the number of times a failed script is run again
+        verbose - print progress
+        """
+
+        self.retries = retries
+        self.verbose = verbose
+        self.wait = True
+        self.check = None
+        self.results = {}
+        self.attempts = {}
+        self.skipped = []
+
+    def get_command(self,script):
+        """
+        return the command used to run a script
+        """
+
+        raise NotImplementedError
+
+    def run_command(self,script,logFile):
+        """
+        run the command of a script and return its exit code
+        """
+
+        fid = open(logFile,'a')
+        returnCode = subprocess.call(self.get_command(script),shell=True,stdout=fid,stderr=subprocess.STDOUT)
+        fid.close()
+
+        return returnCode
+
+    def run_script(self,script):
+        """
+        run a single script (with retries) and return its exit code
+        a script is only successful when it exits with 0 and its output passes the check
+        (the check is skipped when the executor does not wait for the scripts to finish)
+        """
+
+        logFile = os.path.splitext(script)[0] + ".submit.log"
+        for attempt in range(self.retries+1):
+            self.attempts[script] = attempt + 1
+            returnCode = self.run_command(script,logFile)
+            if returnCode == 0 and self.wait == True and self.check != None and self.check(script) == False:
+                returnCode = INCOMPLETE
+            if returnCode == 0:
+                break
+            if self.verbose == True and attempt < self.retries:
+                print("...retrying %s (exit code %s)"%(os.path.basename(script),returnCode))
+
+        return returnCode
+
+    def report(self,done,total,timeStart):
+        """
+        print the progress
+        """
+
+        if self.verbose == False:
+            return
+
+        action = 'finished' if self.wait == True else 'submitted'
+        print("...%s/%s scripts %s (%s"%(done,total,action,round(done/float(total) * 100.0,2)) +
+              "%%) %s seconds"%(round(time.time()-timeStart,1)))
+
+    def submit(self,scripts,jobs=1,check=None):
+        """
+        run the scripts with a pool of jobs threads
+        returns a dictionary of script -> exit code
+
+        check - a function check(script) that returns True when the output of a script is complete
+                scripts that are already complete are not run again
+        """
+
+        if len(scripts) == 0:
+            raise Exception("There are no script to be submitted to the queue\n did you run create_scripts?")
+
+        timeStart = time.time()
+        self.check = check
+        self.results = {}
+        self.attempts = {}
+        self.skipped = []
+
+        ## scripts with complete output (i.e. from an earlier run)
+        toRun = []
+        for script in scripts:
+            if check != None and check(script) == True:
+                self.results[script] = 0
+                self.skipped.append(script)
+            else:
+                toRun.append(script)
+
+        if self.verbose == True and len(self.skipped) > 0:
+            print("...%s/%s scripts are already complete"%(len(self.skipped),len(scripts)))
+
+        ## the scripts run in their own processes so threads are used to wait on them
+        if len(toRun) > 0:
+            p = ThreadPool(max(1,min(jobs,len(toRun))))
+            for done,(script,returnCode) in enumerate(p.imap_unordered(lambda s: (s,self.run_script(s)),toRun)):
+                self.results[script] = returnCode
+                self.report(len(self.skipped)+done+1,len(scripts),timeStart)
+            p.close()
+            p.join()
+
+        failed = self.get_failed()
+        if self.verbose == True and len(failed) > 0:
+            print("...%s scripts failed\n%s"%(len(failed),"\n".join(failed)))
+
+        return self.results
+
+    def get_failed(self):
+        """
+        return the scripts that did not finish with an exit code of 0
+        """
+
+        return sorted([script for script,returnCode in self.results.items() if returnCode != 0])
+
+class LocalExecutor(Executor):
+    """
+    run the scripts on the local machine
+    """
+
+    def __init__(self,cpus=None,retries=1,verbose=True,shell='/bin/bash'):
+        """
+        Constructor
+
+        cpus - the number of scripts run at the same time (defaults to all cores)
+        """
+
+        Executor.__init__(self,retries=retries,verbose=verbose)
+        self.cpus = cpu_count() if cpus == None else cpus
+        self.shell = shell
+
+    def get_command(self,script):
+        return "%s %s"%(self.shell,script)
+
+    def submit(self,scripts,check=None):
+        return Executor.submit(self,scripts,jobs=self.cpus,check=check)
+
+class CommandExecutor(Executor):
+    """
+    run the scripts with a command template where {script} is replaced with the script path
+    i.e. 'sbatch --wait {script}' or 'ssh node01 bash {script}'
+    the command should not return before the script has finished
+    """
+
+    def __init__(self,template,jobs=1,retries=0,verbose=True):
+        """
+        Constructor
+
+        template - the command template
+        jobs     - the number of commands run at the same time
+        """
+
+        if "{script}" not in template:
+            raise Exception("The command template must contain {script}\n%s"%template)
+
+        Executor.__init__(self,retries=retries,verbose=verbose)
+        self.template = template
+        self.jobs = jobs
+
+    def get_command(self,script):
+        return self.template.format(script=script)
+
+    def submit(self,scripts,check=None):
+        return Executor.submit(self,scripts,jobs=self.jobs,check=check)
+
+class SgeExecutor(CommandExecutor):
+    """
+    submit the scripts to a Sun Grid Engine queue
+    by default each script is submitted once with qsub and submit returns as soon as the jobs are queued
+    with wait=True each job is polled with qstat until it leaves the queue, its exit status is then
+    read with qacct (when available) and the check and retries are applied
+    """
+
+    def __init__(self,qsub='qsub',qstat='qstat',qacct='qacct',wait=False,jobs=100,pollInterval=30,retries=0,verbose=True):
+        """
+        Constructor
+
+        wait         - wait for the jobs to finish
+        jobs         - the number of jobs in the queue at the same time (when waiting)
+        pollInterval - the number of seconds between qstat calls
+        """
+
+        CommandExecutor.__init__(self,qsub + " -terse {script}",jobs=jobs,retries=retries,verbose=verbose)
+        self.wait = wait
+        self.qstat = qstat
+        self.qacct = qacct
+        self.pollInterval = pollInterval
+
+    def get_exit_status(self,jobId):
+        """
+        return the exit status of a finished job (0 when the accounting is not available)
+        """
+
+        try:
+            output = subprocess.check_output("%s -j %s"%(self.qacct,jobId),shell=True,stderr=subprocess.DEVNULL)
+        except subprocess.CalledProcessError:
+            return 0
+
+        for line in output.decode('utf-8').split("\n"):
+            fields = line.split()
+            if len(fields) == 2 and fields[0] == 'exit_status' and fields[1].isdigit():
+                return int(fields[1])
+
+        return 0
+
+    def run_command(self,script,logFile):
+        """
+        submit a script and (when waiting) wait for the job to leave the queue
+        """
+
+        fid = open(logFile,'a')
+        process = subprocess.Popen(self.get_command(script),shell=True,stdout=subprocess.PIPE,stderr=fid)
+        output = process.communicate()[0].decode('utf-8')
+        fid.write(output)
+        fid.close()
+        if process.returncode != 0 or self.wait == False:
+            return process.returncode
+
+        ## i.e. '1234' or '1234.1-10:1' for array jobs
+        jobId = output.strip().split(".")[0]
+        while subprocess.call("%s -j %s"%(self.qstat,jobId),shell=True,
+                              stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL) == 0:
+            time.sleep(self.pollInterval)
+
+        return self.get_exit_status(jobId)
+
+    def submit(self,scripts,check=None):
+        """
+        submit the scripts (in order when the jobs are not waited for)
+        """
+
+        jobs = self.jobs if self.wait == True else 1
+        return Executor.submit(self,scripts,jobs=jobs,check=check)
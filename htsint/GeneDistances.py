@@ -5,15 +5,39 @@ Calcuates the pairwise distances between genes
 
 __author__ = "Adam Richards"
 
-import os,sys,csv,shutil,getopt
+import os,sys,csv,shutil,getopt,re
 import numpy as np
+from multiprocessing import Pool
 from .basedir import __basedir__
+from .DistanceLib import get_condensed_size,get_condensed_starts,pack_gene_terms,gene_distances
+from .DistanceStore import DistanceStore
 
 try:
     import cPickle as pickle
 except:
     import pickle
 
+## term distances shared by the worker processes (see mp_init)
+_worker = {}
+
+def mp_init(termDistancesPath,geneTerms):
+    """
+    memory-map the term distances once in each worker process
+    """
+    _worker['termDist'] = DistanceStore(termDistancesPath)
+    _worker['geneTerms'] = geneTerms
+    _worker['packed'] = pack_gene_terms(geneTerms)
+
+def mp_worker(args):
+    """
+    find the gene distances for a block of source genes
+    """
+    rowFirst,rowLast = args
+    termDist = _worker['termDist']
+
+    return gene_distances(termDist.distances,termDist.n,_worker['geneTerms'],
+                          _worker['packed'],rowFirst,rowLast)
+
 class GeneDistances(object):
     """
     A generic class to handle calculate gene distances using term distances
@@ -22,46 +46,45 @@ class GeneDistances(object):
     def __init__(self,termsPath,termDistancesPath,outFile=None):
         """
         Constructor
+
+        outFile - a DistanceStore path (default) or a csv file (i,j,distance)
         """
 
         ## error checking
-        for path in [termsPath]:
+        for path in [termsPath,termDistancesPath]:
             if os.path.exists(path) == False:
                 raise Exception("Cannot find specified path\n%s"%path)
         
         ## variables
         self.termsPath = os.path.realpath(termsPath)
+        self.termDistancesPath = os.path.realpath(termDistancesPath)
         self.queue = []
         self.baseDir =  os.path.realpath(os.path.dirname(__file__))
             
         if outFile == None:
-            self.outFile = "gdistances.csv"
+            self.outFile = "gdistances.dist"
         else:
             self.outFile = outFile
 
-        ## load the graph, the terms and the term distances
-        tmp = open(self.termsPath,'r')
+        ## load the terms and the term distances
+        tmp = open(self.termsPath,'rb')
         self.gene2go,self.go2gene = pickle.load(tmp)
         tmp.close()
 
-        ## read in the term distances
-        termDist = {}
-        mat = np.load(termDistancesPath)
-
-        for i in range(mat.shape[0]):
-            
-            linja = mat[i,:]
-            if not termDist.has_key(linja[0]):
-                termDist[linja[0]] = {}
-            if not termDist[linja[0]].has_key(linja[1]):
-                termDist[linja[0]][linja[1]] = float(linja[2])
+        ## the term distances are memory-mapped (see DistanceStore)
+        self.termDist = DistanceStore(self.termDistancesPath)
 
-        self.termDist = termDist
+        ## variables (genes are sorted so the condensed index is reproducible)
+        self.genes = sorted(self.gene2go.keys())
+        self.totalGenes = len(self.genes)
+        self.totalDistances = get_condensed_size(self.totalGenes)
 
-        ## variables
-        self.genes = self.gene2go.keys()
-        self.totalGenes = float(len(self.genes))
-        self.totalDistances = ((self.totalGenes*(self.totalGenes+1))/2) - self.totalGenes
+        ## map the terms of each gene to term indices
+        self.geneTerms = []
+        for gene in self.genes:
+            termIndices = [self.termDist.get_index(term) for term in self.gene2go[gene]]
+            termIndices = [i for i in termIndices if i != None]
+            self.geneTerms.append(np.unique(np.array(termIndices,dtype=np.int64)))
 
     def get_min_term_dist(self,sourceTerms,sinkTerms):
         """
@@ -70,52 +93,80 @@ class GeneDistances(object):
         return the shorest path between two sets of terms
         """
 
-        minDistance = 1e8
-        td = 1e8
+        minDistance = np.inf
         for source in sourceTerms:            
             for sink in sinkTerms:
                 if source == sink:
                     continue
-            
-                ## get dist
-                if self.termDist.has_key(source) and self.termDist[source].has_key(sink):
-                    td = self.termDist[source][sink]
-                elif self.termDist.has_key(sink) and self.termDist[sink].has_key(source):
-                    td = self.termDist[sink][source]
 
-                if td < minDistance:
+                ## get dist
+                td = self.termDist.get_item_distance(source,sink)
+                if td != None and td < minDistance:
                     minDistance = td
 
-        if minDistance == 1e8:
+        if np.isinf(minDistance):
             minDistance = None
 
         return minDistance
 
-
-    def run(self,first=None,last=None):
+    def run(self,cpus=1,blockSize=64):
         """
-        Search for all pairwise shortest paths
+        calculate all pairwise gene distances
+
+        cpus      - the number of processes to use
+        blockSize - the number of source genes calculated at a time
+
+        missing distances are inf in a DistanceStore and omitted from a csv file
         """
 
+        blocks = [(i,min(i+blockSize,self.totalGenes)) for i in range(0,self.totalGenes,blockSize)]
+        blockStarts = dict([(int(first),block) for first,block in 
+                            zip(get_condensed_starts(self.totalGenes)[[b[0] for b in blocks]],blocks)])
+        isCsv = re.search("\.csv$",self.outFile) != None
+
         ## create a results file 
-        outFid = open(self.outFile,'wa')
-        writer = csv.writer(outFid)
-        writer.writerow(["i","j","distance"])
+        if isCsv:
+            outFid = open(self.outFile,'w')
+            writer = csv.writer(outFid)
+            writer.writerow(["i","j","distance"])
+        else:
+            store = DistanceStore(self.outFile,items=self.genes,mode='w')
 
-        for i,geneI in enumerate(self.genes):
-            termsI = self.gene2go[geneI]
-            
-            if i % 20 == 0:
-                print("%s/%s"%(i,int(self.totalGenes)))
+        if cpus > 1:
+            p = Pool(cpus,initializer=mp_init,initargs=(self.termDistancesPath,self.geneTerms))
+            results = p.imap_unordered(mp_worker,blocks)
+        else:
+            packed = pack_gene_terms(self.geneTerms)
+            results = (gene_distances(self.termDist.distances,self.termDist.n,self.geneTerms,
+                                      packed,rowFirst,rowLast) for rowFirst,rowLast in blocks)
+
+        for b,(first,row) in enumerate(results):
+            if b % 20 == 0:
+                print("%s/%s"%(b,len(blocks)))
+
+            if isCsv:
+                rowFirst,rowLast = blockStarts[first]
+                self.write_rows(writer,rowFirst,rowLast,row)
+            else:
+                store.distances[first:first+row.size] = row
+
+        if cpus > 1:
+            p.close()
+            p.join()
+
+        if isCsv:
+            outFid.close()
+        else:
+            store.close()
 
-            for j,geneJ in enumerate(self.genes):
-                termsJ = self.gene2go[geneJ]
-                if j >= i:
-                    continue
-                
-                ## find the distance
-                distance = self.get_min_term_dist(termsI,termsJ)
-                if distance != None:
-                    writer.writerow([geneI,geneJ,distance])
+    def write_rows(self,writer,rowFirst,rowLast,row):
+        """
+        write the finite distances for a block of source genes to csv
+        """
 
-        outFid.close()
+        position = 0
+        for i in range(rowFirst,rowLast):
+            values = row[position:position+(self.totalGenes-i-1)]
+            position += values.size
+            for j in np.where(np.isfinite(values))[0]:
+                writer.writerow([self.genes[i],self.genes[i+1+j],values[j]])
@@ -3,7 +3,7 @@ import numpy as np
 import networkx as nx
 from sqlalchemy.sql import select
 from htsint.database import Base,Taxon,Gene,Uniprot,GoTerm,GoAnnotation,db_connect
-from htsint.database import read_ontology_file,fetch_taxa_annotations
+from htsint.database import read_ontology_file,fetch_taxa_annotations,fetch_taxa_gene_terms
 
 try:
     import cPickle as pickle
@@ -68,6 +68,7 @@ class GeneOntology(object):
 
             print("there are  %s genes from %s (%s)"%(len(taxaDict.keys()),tquery['name'],tquery['ncbi_id']))
             gene2id.update(taxaDict)
+        conn.close()
 
         ## check for unmatched genes
         unmatched = 0
@@ -116,16 +117,16 @@ class GeneOntology(object):
         'accepted' - list of genes that restrict included terms to a particular list
         """
 
-        conn = self.engine.connect()
-
         ## error checking
         if self.aspect not in ['biological_process','molecular_function','cellular_component']:
             raise Exception("Invalid aspect specified%s"%self.aspect)
 
-        ## gene2go
-        print("...creating gene2go dictionary -- this may take several minutes or longer depending on the number of genes")
-        _gene2go,prot2go = fetch_taxa_annotations(self.taxaList,self.engine,aspect=self.aspect,\
-                                                 useIea=self.useIea)
+        ## gene2go (from the taxa_gene_terms table when the database has one)
+        _gene2go = fetch_taxa_gene_terms(self.taxaList,self.engine,aspect=self.aspect,useIea=self.useIea)
+        if _gene2go is None:
+            print("...creating gene2go dictionary -- this may take several minutes or longer depending on the number of genes")
+            _gene2go,prot2go = fetch_taxa_annotations(self.taxaList,self.engine,aspect=self.aspect,\
+                                                     useIea=self.useIea)
 
         print("...creating go2gene dictionary -- this may take several minutes")
         go2gene = {}
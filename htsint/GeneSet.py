@@ -12,6 +12,7 @@ import matplotlib as mpl
 import matplotlib.pyplot as plt
 from htsint.database import db_connect,Gene,Taxon,GoTerm
 from htsint.blast import BlastMapper
+from htsint.DistanceStore import DistanceStore
 
 try:
     import cPickle as pickle
@@ -30,7 +31,6 @@ class GeneSet(object):
 
         ## setup db
         self.session, self.engine = db_connect(verbose=verbose)
-        self.conn = self.engine.connect()
 
         ## global variables
         self.verbose = verbose
@@ -60,6 +60,7 @@ class GeneSet(object):
     def load_geneset(self,genesetFile,gene2go,distMat):
         """
         gene2go - dictionary or file path
+        distMat - term distances as a DistanceStore or file path
         """
 
         ## gene2go input
@@ -79,9 +80,12 @@ class GeneSet(object):
         self.read_geneset_file(genesetFile)
 
         ## distance matrix
-        if type(distMat) != type(np.array([])):
-            raise Exception("Argument 'distMat' must be a NumPy array")
-        self.distMat = distMat
+        if isinstance(distMat,DistanceStore):
+            self.distMat = distMat
+        elif os.path.exists(distMat):
+            self.distMat = DistanceStore(distMat)
+        else:
+            raise Exception("Argument 'distMat' must be a DistanceStore or a valid file path")
 
     def read_geneset_file(self,genesetFile):
         """
@@ -146,7 +150,8 @@ class GeneSet(object):
         if self.verbose:
             print("...getting gene info")
         geneInfo = {}
-        results = self.conn.execute(Gene.__table__.select(Gene.ncbi_id.in_(geneList)))
+        with self.engine.connect() as conn:
+            results = conn.execute(Gene.__table__.select(Gene.ncbi_id.in_(geneList))).fetchall()
         for row in results:
             taxaQuery = self.session.query(Taxon).filter_by(id=row.taxa_id).first()
             geneInfo[str(row.ncbi_id)] = {'symbol': str(row.symbol),
@@ -168,7 +173,9 @@ class GeneSet(object):
             """
             return ((val - src[0]) / (src[1]-src[0])) * (dst[1]-dst[0]) + dst[0]
 
-        mat = self.distMat[:,2].astype(float)
+        mat = np.asarray(self.distMat.distances)
+        mat = mat[np.isfinite(mat)]
+        src = (mat.min(),mat.max())
 
         ## get the percentile threshold
         threshold = np.percentile(mat,percentile)
@@ -176,16 +183,15 @@ class GeneSet(object):
             print("percentile threshold: %s (%s)"%(threshold,percentile))
 
         termDist = {}
-        for i in range(self.distMat.shape[0]):
-            linja = self.distMat[i,:]
-            if linja[0] not in termList or linja[1] not in termList:
-                continue
-            if float(linja[2]) > threshold:
-                continue
-            if not termDist.has_key(linja[0]):
-                termDist[linja[0]] = {}
-            if not termDist[linja[0]].has_key(linja[1]):
-                termDist[linja[0]][linja[1]] = 1.0 - scale(float(linja[2]),(mat.min(),mat.max()),(0,1))
+        termList = sorted(set(termList))
+        for i,termI in enumerate(termList):
+            for termJ in termList[i+1:]:
+                distance = self.distMat.get_item_distance(termI,termJ)
+                if distance == None or not np.isfinite(distance) or distance > threshold:
+                    continue
+                if termI not in termDist:
+                    termDist[termI] = {}
+                termDist[termI][termJ] = 1.0 - scale(float(distance),src,(0,1))
 
         return termDist
 
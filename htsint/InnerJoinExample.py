@@ -1,6 +1,7 @@
 import time,sys
 from htsint.database import db_connect,Gene,GoAnnotation,GoTerm
 from htsint.database import fetch_annotations,gene_mapper
+from htsint.database import encode_evidence_codes,encode_aspect,decode_aspect
 
 
 ## variables
@@ -36,7 +37,7 @@ for key,items in annotations.items():
         annotations[key].remove(None)
 
 for at in annotations['30970']:
-    print(at,session.query(GoTerm).filter_by(id = at.go_term_id).first().aspect)
+    print(at,decode_aspect(session.query(GoTerm).filter_by(id = at.go_term_id).first().aspect))
 
 ## get results with table join by aspect
 timeStart = time.time()
@@ -45,8 +46,8 @@ print('filtered results')
 for geneQuery in geneQueries:
     results = session.query(GoAnnotation).join(GoTerm).\
               filter(GoAnnotation.gene_id==geneQuery.id).\
-              filter(GoAnnotation.evidence_code.in_(['ISS'])).\
-              filter(GoTerm.aspect=='molecular_function').all()
+              filter(GoAnnotation.evidence_code.in_(encode_evidence_codes(['ISS']))).\
+              filter(GoTerm.aspect==encode_aspect('molecular_function')).all()
     
     for r in results:
-        print(r, session.query(GoTerm).filter_by(id = r.go_term_id).first().aspect)
+        print(r, decode_aspect(session.query(GoTerm).filter_by(id = r.go_term_id).first().aspect))
@@ -8,6 +8,7 @@ __author__ = "Adam Richards"
 
 import csv,re,sys
 from htsint.database import db_connect,Taxon,Gene,Uniprot,GoAnnotation,fetch_annotations,get_evidence_codes
+from htsint.database import encode_evidence_codes
 
 class TaxaSummary(object):
     """
@@ -141,7 +142,7 @@ class TaxaSummary(object):
         acceptedCodes = get_evidence_codes(useIea=useIea)
         taxaQuery = self.session.query(Taxon).filter_by(ncbi_id=taxonId).first()
         annotations = self.session.query(GoAnnotation).filter(GoAnnotation.taxa_id==taxaQuery.id).\
-                      filter(GoAnnotation.evidence_code.in_(acceptedCodes)).all()
+                      filter(GoAnnotation.evidence_code.in_(encode_evidence_codes(acceptedCodes))).all()
 
         geneIds = [g.id for g in self.session.query(Gene).filter_by(taxa_id=taxaQuery.id).all()]
         uniprotQuery = self.session.query(Uniprot).filter_by(taxa_id=taxaQuery.id).all()
@@ -10,26 +10,34 @@ import numpy as np
 import networkx as nx
 from multiprocessing import Pool, cpu_count
 from .basedir import __basedir__
+from .DistanceLib import get_condensed_size,get_condensed_starts,graph_to_csr,term_distances
+from .DistanceLib import get_chunk_ranges,get_chunk_file,write_chunk_manifest,read_chunk_manifest
+from .DistanceLib import mark_chunk_complete,get_incomplete_chunks,check_chunk
+from .DistanceStore import DistanceStore
+from .Executor import SgeExecutor
 
 try:
     import cPickle as pickle
 except:
     import pickle
 
+## graph shared by the worker processes (see mp_init)
+_worker = {}
+
+def mp_init(csgraph,termNodes):
+    """
+    store the term graph once in each worker process
+    """
+    _worker['csgraph'] = csgraph
+    _worker['termNodes'] = termNodes
+
 def mp_worker(args):
     """
-    find shortest path length
+    find the shortest path lengths for a range of condensed indices
     """
-    source,sink,graphPath = args
-    G = nx.read_gpickle(graphPath)
-    minDistance = 1e8
-    if G.has_node(source) and G.has_node(sink):
-        (dijkDist, dijkPath) = nx.bidirectional_dijkstra(G,source,sink)
-    else:
-        dijkDist = None
-    
-    if dijkDist:
-        return [source,sink,dijkDist]
+    first,last = args
+
+    return first,term_distances(_worker['csgraph'],_worker['termNodes'],first=first,last=last)
 
 class TermDistances(object):
     """
@@ -53,6 +61,7 @@ class TermDistances(object):
         self.termsPath = os.path.realpath(termsPath)
         self.termGraphPath = os.path.realpath(termGraphPath)
         self.queue = []
+        self.chunkFiles = {}
         self.baseDir =  os.path.realpath(os.path.dirname(__file__))
             
         ## results dir will be emptied on each run
@@ -60,43 +69,49 @@ class TermDistances(object):
 
         ## load the term graph and the terms
         self.G = nx.read_gpickle(self.termGraphPath)
-        tmp = open(self.termsPath,'r')
+        tmp = open(self.termsPath,'rb')
         self.gene2go,self.go2gene = pickle.load(tmp)
         tmp.close()
 
-        ## variables
-        self.terms = self.go2gene.keys()
-        self.totalTerms = float(len(self.terms))
-        self.totalDistances = ((self.totalTerms*(self.totalTerms+1))/2) - self.totalTerms
+        ## variables (terms are sorted so the condensed index is reproducible)
+        self.terms = sorted(self.go2gene.keys())
+        self.totalTerms = len(self.terms)
+        self.totalDistances = get_condensed_size(self.totalTerms)
+        self.csgraph,self.termNodes = graph_to_csr(self.G,self.terms)
 
-    def create_scripts(self,email,name='dist',cpus=1):
+    def create_scripts(self,email,name='dist',cpus=1,resume=False):
         """
         creates bash scripts to be submitted to the cluster queue
+
+        resume - keep the results dir and only create scripts for chunks that
+                 are missing or corrupt (the chunks are taken from the manifest)
         """
 
-        ## empty the results directory
-        if os.path.isdir(self.resultsDir):
-            shutil.rmtree(self.resultsDir)
-        os.mkdir(self.resultsDir)
-        
+        manifest = None
+        if resume == True:
+            manifest = read_chunk_manifest(self.resultsDir)
+            if manifest != None and manifest['total'] != self.totalDistances:
+                raise Exception("The chunk manifest does not match the terms -- rerun without resume")
+
+        ## empty the results directory and write a new manifest
+        if manifest == None:
+            if os.path.isdir(self.resultsDir):
+                shutil.rmtree(self.resultsDir)
+            os.mkdir(self.resultsDir)
+            chunkRanges = get_chunk_ranges(self.totalDistances,cpus)
+            manifest = write_chunk_manifest(self.resultsDir,chunkRanges,self.totalDistances)
+
         ## variables
-        chunks = cpus
         script = os.path.join(__basedir__,"TermDistances.py")
-        stopPoints = np.arange(0,self.totalDistances,
-                               int(round(float(self.totalDistances)/float(chunks))))
-        if stopPoints[-1] < self.totalDistances:
-            stopPoints = np.hstack([stopPoints[1:],np.array([self.totalDistances])])
+        toRun = get_incomplete_chunks(self.resultsDir,manifest)
 
-        print('... submitting %s jobs'%(len(stopPoints)))
+        print('... submitting %s/%s jobs'%(len(toRun),len(manifest['chunks'])))
 
         ## create scripts
-        begin = 0
-        for i,chunk in enumerate(range(stopPoints.size)):
-            stop = stopPoints[chunk] 
-
+        for i,chunk in toRun:
             submitFile = os.path.join(self.resultsDir,"%s-%s.sh"%(name,i))
             submitLog =  os.path.join(self.resultsDir,"%s-%s.log"%(name,i))
-            args = " -f %s -l %s -t '%s' -g '%s' -r %s"%(int(begin),int(stop),self.termsPath,
+            args = " -f %s -l %s -t '%s' -g '%s' -r %s"%(chunk['first'],chunk['last'],self.termsPath,
                                                          self.termGraphPath,self.resultsDir)
             f = open(submitFile, 'w')
             f.write("#!/bin/bash\n" +
@@ -108,105 +123,79 @@ class TermDistances(object):
 
             f.close()
             self.queue.append(submitFile)
-            begin = stop
+            self.chunkFiles[submitFile] = (os.path.join(self.resultsDir,chunk['file']),chunk['last']-chunk['first'])
 
-    def submit(self):
+    def submit(self,executor=None):
         """
-        submit the file to the cluster        
+        submit the scripts with an executor (defaults to the cluster queue via qsub)
+        the default executor returns once the jobs are queued, use td.submit(SgeExecutor(wait=True))
+        to wait for the jobs or td.submit(LocalExecutor(cpus=64)) to run the chunks on this machine
+        chunks with a valid completion marker are not submitted again and when the executor waits
+        a script only counts as done when its chunk has a valid completion marker
         """
     
         if len(self.queue) == 0:
             raise Exception("There are no script to be submitted to the queue\n did you run create_scripts?")
 
-        for queueFileName in self.queue:
-            os.system("qsub " + queueFileName)
+        if executor == None:
+            executor = SgeExecutor()
+
+        return executor.submit(self.queue,check=lambda script: check_chunk(*self.chunkFiles[script]))
 
     def run(self,first=None,last=None):
         """
         Search for all pairwise shortest paths
+        results are saved as a float32 condensed array (missing paths are inf)
         """
 
-        ## create a results file 
-        outFile = os.path.join(self.resultsDir,"out-%s-%s.npy"%(first,last))
-        mat = np.zeros((last-first,3),).astype(str)
-        
         if first == None or last == None:
             first = 0
-            last = int(self.totalDistances)
-
-        toRun = range(first,last)
-
-        count = -1
-        lineCount = -1
-        for i,termI in enumerate(self.terms):
-            
-            if i % 20 == 0:
-                print("%s/%s"%(i,len(self.terms)))
-
-            for j,termJ in enumerate(self.terms):
-                if j >= i:
-                    continue
-                count += 1
-                if count not in toRun:
-                    continue
-                
-                ## find the distance
-                distance = self.get_distance(termI,termJ)
+            last = self.totalDistances
 
-                if distance != None:
-                    lineCount+=1
-                    mat[lineCount,:] = [termI,termJ,distance]
-
-        np.save(outFile,mat)
+        ## write the results then mark the chunk as complete
+        outFile = get_chunk_file(self.resultsDir,first,last)
+        mat = term_distances(self.csgraph,self.termNodes,first=first,last=last)
+        tmp = open(outFile+".tmp",'wb')
+        np.save(tmp,mat)
+        tmp.close()
+        os.rename(outFile+".tmp",outFile)
+        mark_chunk_complete(outFile)
 
     def get_distance(self,source,sink):
         """
         find shortest path length
         """
 
-        minDistance = 1e8
         if self.G.has_node(source) and self.G.has_node(sink):
             (dijkDist, dijkPath) = nx.bidirectional_dijkstra(self.G,source,sink)
             return dijkDist
         return None
 
-    def run_with_multiprocessing(self,resultsFilePath,chunkSize=1000,cpus=8):
+    def run_with_multiprocessing(self,resultsFilePath,blockSize=64,cpus=8):
         """
         method to calculate distances on a single multicore machine
-        """
+        results are saved as a DistanceStore (missing paths are inf)
 
-        ## assemble the pairwise terms
-        print("loading data")
-        pairwiseTerms = []
-        for i,termI in enumerate(self.terms):
-            for j,termJ in enumerate(self.terms):
-                if j >= i:
-                    continue
-                pairwiseTerms.append([termI,termJ,self.termGraphPath])
-                
-        print("loaded.")
-
-        start = 0
-        stop = chunkSize
-        lineCount = 0 
-        mat = np.zeros((len(pairwiseTerms),3),).astype(str)
-        numChunks = int(np.ceil(float(len(pairwiseTerms) / float(chunkSize))))
-        for chunk in range(numChunks):
-            p = Pool(cpus)
-            _results = p.map_async(mp_worker,pairwiseTerms[start:start+chunkSize])
-            results = _results.get()
-            p.close()
-            p.join()
- 
-            for row in results:
-                if row:
-                    lineCount+=1
-                    mat[lineCount,:] = row
-        
-            print("%s"%((start+chunkSize)/float(len(pairwiseTerms)) * 100.0)+"% complete")
-            start += chunkSize
+        blockSize - the number of source terms sent to a worker at a time
+
+        A single pool is used for all blocks and each worker receives the graph once
+        """
 
-        np.save(resultsFilePath,mat)
+        ## split the work into blocks of source terms
+        starts = list(get_condensed_starts(self.totalTerms)) + [self.totalDistances]
+        blocks = [(int(starts[i]),int(starts[min(i+blockSize,self.totalTerms)]))
+                  for i in range(0,self.totalTerms,blockSize)]
+
+        store = DistanceStore(resultsFilePath,items=self.terms,mode='w')
+        mat = store.distances
+        p = Pool(cpus,initializer=mp_init,initargs=(self.csgraph,self.termNodes))
+        for b,(first,row) in enumerate(p.imap_unordered(mp_worker,blocks)):
+            mat[first:first+row.size] = row
+            if b % 20 == 0:
+                print("%s"%(round((b+1)/float(len(blocks)) * 100.0,2))+"% complete")
+        p.close()
+        p.join()
+        store.close()
 
 if __name__ == "__main__":
     ## read in input file      
@@ -16,6 +16,8 @@ from .GeneOntology import GeneOntology
 from .TermDistances import TermDistances
 from .GeneDistances import GeneDistances
 from .AssembleDistances import AssembleDistances
+from .DistanceStore import DistanceStore
+from .Executor import LocalExecutor, SgeExecutor, CommandExecutor
 from .TaxaSummary import TaxaSummary 
 from .GeneSetCollection import GeneSetCollection
 from .GeneSet import GeneSet
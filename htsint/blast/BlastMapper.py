@@ -33,7 +33,6 @@ class BlastMapper(object):
         """
 
         self.session,self.engine = db_connect()
-        self.conn = self.engine.connect()
         self.hits = None
 
     def create_summarized(self,parsedFilePath,summaryFilePath=None,large=False,uniprot=False,species=None,
@@ -87,7 +86,8 @@ class BlastMapper(object):
             print("batch querying %s UniProt entries in the database... this may take some time"%(len(hitEntries)))
             upEntry2Gene, upEntry2Taxa = {},{}
             if large == False:
-                results = self.conn.execute(Uniprot.__table__.select(Uniprot.uniprot_entry.in_(hitEntries)))
+                with self.engine.connect() as conn:
+                    results = conn.execute(Uniprot.__table__.select(Uniprot.uniprot_entry.in_(hitEntries))).fetchall()
                 for row in results:
                     upEntry2Gene[str(row.uniprot_entry)] = str(row.gene_id)
                     upEntry2Taxa[str(row.uniprot_entry)] = str(row.taxa_id)
@@ -102,16 +102,16 @@ class BlastMapper(object):
             taxaList = list(set(upEntry2Taxa.values()))
             while 'None' in taxaList: taxaList.remove('None')
             s = select([Taxon.id,Taxon.ncbi_id,Taxon.name]).where(Taxon.id.in_([int(tid) for tid in taxaList]))
-            _taxaQueries = self.conn.execute(s)
-            taxaQueries = _taxaQueries.fetchall()
+            with self.engine.connect() as conn:
+                taxaQueries = conn.execute(s).fetchall()
             taxaId2Ncbi = dict([(str(tquery['id']),str(tquery['ncbi_id'])) for tquery in taxaQueries])
 
         ## create a single dictionary of all gene information 
         gene2id = {}
         for taxaDbId in taxaList:
             s = select([Gene.id,Gene.ncbi_id],Gene.taxa_id==taxaDbId)
-            _geneQueries = self.conn.execute(s)
-            taxaDict = dict([(str(r['id']),str(r['ncbi_id'])) for r in _geneQueries.fetchall()])
+            with self.engine.connect() as conn:
+                taxaDict = dict([(str(r['id']),str(r['ncbi_id'])) for r in conn.execute(s).fetchall()])
             #print("there are  %s genes from %s (%s)"%(len(taxaDict.keys()),tquery['name'],tquery['ncbi_id']))
             gene2id.update(taxaDict)
 
@@ -204,8 +204,8 @@ class BlastMapper(object):
         ## if taxa filter provided
         if taxaList != None:
             s = select([Taxon.id,Taxon.ncbi_id,Taxon.name]).where(Taxon.ncbi_id.in_(taxaList))
-            _taxaQueries = self.conn.execute(s)
-            taxaQueries = _taxaQueries.fetchall()
+            with self.engine.connect() as conn:
+                taxaQueries = conn.execute(s).fetchall()
             selectedTaxa = [str(tquery['id']) for tquery in taxaQueries]
             taxa2name = dict([(str(tquery['id']),str(tquery['ncbi_id'])) for tquery in taxaQueries])
 
@@ -26,6 +26,7 @@ def get_blast_map(resultsFilePath,evalue=0.00001,taxaList=None,asGenes=False,app
         s = select([Taxon.id,Taxon.ncbi_id,Taxon.name]).where(Taxon.ncbi_id.in_(taxaList))
         _taxaQueries = conn.execute(s)
         taxaQueries = _taxaQueries.fetchall()
+        conn.close()
         totalQueries = set([])
         filteredQueries = set([])
         filteredHits = set([])
@@ -145,6 +146,7 @@ def create_blast_map(refTaxon,taxaList,resultsFilePath,evalue=0.00001,verbose=Fa
         s = select([Gene.taxa_id,Gene.ncbi_id],Gene.taxa_id==tquery['id'])
         _geneQueries = conn.execute(s)
         gene2taxa.update(dict([(str(r['ncbi_id']),str(r['taxa_id'])) for r in _geneQueries.fetchall()]))
+    conn.close()
 
     ## creats a dictionary results['geneId]['taxaId'] = bestHitMappedTaxa
     results = {}
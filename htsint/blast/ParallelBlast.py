@@ -9,11 +9,27 @@ currently this is only working with blastx
 
 """
 
-import shutil,os,sys
+import shutil,os,sys,re
 import numpy as np
 from Bio import SeqIO
 from htsint import __basedir__
 from htsint.blast import Blast
+from htsint.Executor import SgeExecutor
+
+def check_blast_output(filePath):
+    """
+    return True when a blast xml file exists and is complete (ends with the closing BlastOutput tag)
+    """
+
+    if os.path.exists(filePath) == False or os.path.getsize(filePath) == 0:
+        return False
+
+    fid = open(filePath,'rb')
+    fid.seek(max(0,os.path.getsize(filePath)-256))
+    tail = fid.read()
+    fid.close()
+
+    return tail.rstrip().endswith(b"</BlastOutput>")
 
 class ParallelBlast(object):
     
@@ -29,6 +45,7 @@ class ParallelBlast(object):
         self.database = database
         self.resultsDir = os.path.realpath(resultsDir)
         self.submitFileNames = []
+        self.outFiles = {}
         self.evalue = 0.05
         self.cmd = cmd
 
@@ -48,6 +65,7 @@ class ParallelBlast(object):
 
         ## variables
         script = os.path.join(__basedir__,"blast","Blast.py")
+        outFileBase = re.sub("\.\w+","",os.path.split(self.queryFile)[-1],flags=re.IGNORECASE)
 
         handleIn = open(self.queryFile, "r")
         total = 0
@@ -80,16 +98,23 @@ class ParallelBlast(object):
                     "#$ -o %s\n"%submitLog + 
                     "/usr/bin/python "+ script + args)
             f.close()
-            begin = stop
             self.submitFileNames.append(submitFile)
+            self.outFiles[submitFile] = os.path.join(self.resultsDir,outFileBase+"-%s-%s.xml"%(begin,stop))
+            begin = stop
 
-    def submit(self):
+    def submit(self,executor=None):
         """
-        submit the scripts via qsub
+        submit the scripts with an executor (defaults to qsub)
+        the default executor returns once the jobs are queued, use pb.submit(SgeExecutor(wait=True))
+        to wait for the jobs or pb.submit(LocalExecutor(cpus=64)) to run the chunks on this machine
+        chunks with a complete xml file are not submitted again and when the executor waits
+        a script only counts as done when its xml file is complete
         """
         
         if len(self.submitFileNames) == 0:
             raise Exception("There are no script to be submitted to the queue\n did you run create_scripts?")
 
-        for submitFile in self.submitFileNames:
-            os.system("qsub " + submitFile)
+        if executor == None:
+            executor = SgeExecutor()
+
+        return executor.submit(self.submitFileNames,check=lambda script: check_blast_output(self.outFiles[script]))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+library of functions used to stream the annotations of a GAF 2.x file
+(i.e. gene_association.goa_uniprot)
+
+http://www.geneontology.org/GO.format.gaf-2_0.shtml
+
+The records are filtered by database, taxon, evidence code and aspect as
+the lines are read so only the wanted annotations are ever kept.  An
+uncompressed file is split into byte ranges (shards) that are parsed by a
+pool of processes, a compressed file is read as a single stream.
+"""
+
+### make imports
+import os,sys
+from multiprocessing import Pool,cpu_count
+from .DatabaseTables import encode_aspect
+from .FileTools import get_line_shards,read_file_shard
+
+## the filters used by each worker process
+_filters = None
+
+class GafRecord(object):
+    """
+    a single annotation (one line) of a GAF file
+    """
+
+    __slots__ = ['db','uniprotId','symbol','qualifier','goId','references','evidenceCode',
+                 'withFrom','aspect','name','synonyms','objectType','taxon','date','assignedBy','uniprotEntry']
+
+    def __init__(self,fields):
+        """
+        Constructor
+
+        fields - the first 15 columns of the line
+        """
+
+        (self.db,self.uniprotId,self.symbol,self.qualifier,self.goId,self.references,self.evidenceCode,
+         self.withFrom,self.aspect,self.name,self.synonyms,self.objectType,self.taxon,self.date,
+         self.assignedBy) = fields[:15]
+
+        ## 'taxon:9606' -> '9606'
+        if self.taxon.startswith("taxon:"):
+            self.taxon = self.taxon[6:]
+
+        ## the uniprot entry (i.e. ADH1_HUMAN) is the first synonym
+        self.uniprotEntry = self.synonyms.split("|",1)[0]
+
+    def __getstate__(self):
+        return tuple([getattr(self,slot) for slot in self.__slots__])
+
+    def __setstate__(self,state):
+        for slot,value in zip(self.__slots__,state):
+            setattr(self,slot,value)
+
+    def __repr__(self):
+        return "GafRecord(%s,%s,%s,%s,%s)"%(self.uniprotId,self.goId,self.evidenceCode,self.aspect,self.taxon)
+
+def get_gaf_filters(db='UniProtKB',taxaList=None,evidenceCodes=None,aspects=None):
+    """
+    return the filters used by parse_gaf_lines as a tuple (None means no filter)
+
+    db            - the database of the annotated objects (column 1)
+    taxaList      - list of ncbi taxa ids
+    evidenceCodes - list of evidence codes (i.e. ['IDA','IEA'])
+    aspects       - list of aspects (i.e. ['biological_process'] or ['P'])
+    """
+
+    taxa = None if taxaList is None else set([str(taxon) for taxon in taxaList])
+    codes = None if evidenceCodes is None else set(evidenceCodes)
+    letters = None
+    if aspects is not None:
+        values = set([encode_aspect(aspect) for aspect in aspects])
+        letters = set([letter for letter in ['P','F','C'] if encode_aspect(letter) in values])
+
+    return (db,taxa,codes,letters)
+
+def parse_gaf_lines(lines,filters):
+    """
+    yield a GafRecord for each annotation that passes the filters (see get_gaf_filters)
+    header lines, malformed lines and annotations with more than one taxon are skipped
+    """
+
+    db,taxa,codes,letters = filters
+
+    for line in lines:
+        if line[0] == "!":
+            continue
+
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) < 15:
+            continue
+        if db is not None and fields[0] != db:
+            continue
+        if codes is not None and fields[6] not in codes:
+            continue
+        if letters is not None and fields[8] not in letters:
+            continue
+
+        taxon = fields[12]
+        if taxon.startswith("taxon:"):
+            taxon = taxon[6:]
+        if taxon == "" or "|" in taxon:
+            continue
+        if taxa is not None and taxon not in taxa:
+            continue
+
+        yield GafRecord(fields)
+
+def parse_gaf_shard(filePath,start,end,filters):
+    """
+    return the records of a shard that pass the filters
+    """
+
+    return list(parse_gaf_lines(read_file_shard(filePath,start,end),filters))
+
+def mp_init(filters):
+    global _filters
+
+    ## forked workers must not use the database connections of the parent process
+    databaseTools = sys.modules.get(__package__ + ".DatabaseTools")
+    if databaseTools is not None:
+        databaseTools.dispose_engines(close=False)
+
+    _filters = filters
+
+def mp_worker(args):
+    filePath,start,end = args
+    return parse_gaf_shard(filePath,start,end,_filters)
+
+def read_gaf_file(filePath,db='UniProtKB',taxaList=None,evidenceCodes=None,aspects=None,
+                  processes=None,shardSize=67108864):
+    """
+    yield the records (GafRecord) of a GAF file that pass the filters in file order
+
+    processes - the number of processes used for an uncompressed file (defaults to the number of cpus)
+    shardSize - the approximate size in bytes of the pieces parsed by each process
+    """
+
+    filters = get_gaf_filters(db=db,taxaList=taxaList,evidenceCodes=evidenceCodes,aspects=aspects)
+    if processes is None:
+        processes = cpu_count()
+
+    shards = [(0,None)]
+    if processes > 1 and filePath.endswith(".gz") == False:
+        shards = get_line_shards(filePath,max(processes,int(os.path.getsize(filePath) / shardSize)))
+
+    ## stream the lines
+    if len(shards) == 1:
+        for record in parse_gaf_lines(read_file_shard(filePath,0,None),filters):
+            yield record
+        return
+
+    po = Pool(processes=min(processes,len(shards)),initializer=mp_init,initargs=(filters,))
+    try:
+        for records in po.imap(mp_worker,[(filePath,start,end) for start,end in shards]):
+            for record in records:
+                yield record
+    finally:
+        po.terminate()
+        po.join()
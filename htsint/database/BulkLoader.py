@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""
+A loader that streams table rows into the database
+
+With PostgreSQL rows are written to an in-memory text buffer and sent with
+COPY FROM STDIN.  Other databases fall back to executemany inserts.
+
+Primary keys are assigned here (the tables use client side sequences) and
+the sequence is moved past the largest id when the loader is closed.
+"""
+
+### make imports
+import sys,os,time
+from io import StringIO
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable,AddConstraint
+from .IdResolver import get_id_resolver
+from .IndexTools import create_indexes
+
+def create_tables(engine,metadata,deferConstraints=True):
+    """
+    drop and create all tables
+    deferConstraints - foreign keys and indexes are created by finalize_tables (i.e. after loading)
+    """
+
+    metadata.drop_all(engine)
+    get_id_resolver(engine).clear()
+    if deferConstraints == False:
+        metadata.create_all(engine)
+        return
+
+    for sequence in _get_sequences(metadata):
+        sequence.create(engine,checkfirst=True)
+
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            connection.execute(CreateTable(table,include_foreign_key_constraints=[]))
+
+def finalize_tables(engine,metadata,jobs=4):
+    """
+    create the foreign keys and indexes that were deferred by create_tables
+    jobs - the number of indexes built at the same time
+    """
+
+    timeStart = time.time()
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            for table in metadata.sorted_tables:
+                for constraint in table.foreign_key_constraints:
+                    connection.execute(AddConstraint(constraint))
+
+    create_indexes(engine,metadata,jobs=jobs)
+
+    return "...constraints and indexes created: %s"%time.strftime('%H:%M:%S',time.gmtime(time.time()-timeStart))
+
+def _get_sequences(metadata):
+    """
+    return the sequences used by the primary keys
+    """
+
+    sequences = []
+    for table in metadata.sorted_tables:
+        for column in table.columns:
+            if column.primary_key and column.default is not None and hasattr(column.default,'create'):
+                sequences.append(column.default)
+
+    return sequences
+
+def _copy_value(value):
+    """
+    format a single value for the COPY text format
+    """
+
+    if value is None:
+        return "\\N"
+
+    value = str(value)
+    if "\\" in value:
+        value = value.replace("\\","\\\\")
+    if "\t" in value or "\n" in value or "\r" in value:
+        value = value.replace("\t","\\t").replace("\n","\\n").replace("\r","\\r")
+
+    return value
+
+class BulkLoader(object):
+    """
+    stream rows (dictionaries) into a single table
+    """
+
+    def __init__(self,engine,table,bufferSize=100000,verbose=True):
+        """
+        Constructor
+
+        engine     - sqlalchemy engine
+        table      - the table (i.e. Gene.__table__)
+        bufferSize - the number of rows sent at a time
+        """
+
+        self.engine = engine
+        self.table = table
+        self.bufferSize = bufferSize
+        self.verbose = verbose
+        self.columns = [column.name for column in table.columns]
+        self.useCopy = engine.dialect.name == 'postgresql'
+        self.buffer = []
+        self.totalRows = 0
+        self.timeStart = time.time()
+
+        ## ids continue from the largest id in the table
+        with engine.connect() as connection:
+            maxId = connection.execute(text("SELECT max(id) FROM %s"%table.name)).scalar()
+        self.nextId = 1 if maxId is None else int(maxId) + 1
+
+    def add(self,row):
+        """
+        add a single row (a dictionary keyed by column name)
+        """
+
+        if row.get('id') is None:
+            row['id'] = self.nextId
+            self.nextId += 1
+        self.buffer.append(row)
+
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def add_rows(self,rows):
+        """
+        add several rows
+        """
+
+        for row in rows:
+            self.add(row)
+
+    def flush(self):
+        """
+        send the buffered rows to the database
+        """
+
+        if len(self.buffer) == 0:
+            return
+
+        if self.useCopy == True:
+            self._copy(self.buffer)
+        else:
+            with self.engine.begin() as connection:
+                connection.execute(self.table.insert(),[dict([(c,row.get(c)) for c in self.columns]) for row in self.buffer])
+
+        self.totalRows += len(self.buffer)
+        self.buffer = []
+
+    def _copy(self,rows):
+        """
+        COPY rows using the text format
+        """
+
+        data = StringIO()
+        for row in rows:
+            data.write("\t".join([_copy_value(row.get(c)) for c in self.columns]) + "\n")
+        data.seek(0)
+
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.copy_expert("COPY %s (%s) FROM STDIN"%(self.table.name,",".join(self.columns)),data)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def get_rate(self):
+        """
+        return the number of rows loaded per second
+        """
+
+        return self.totalRows / max(time.time()-self.timeStart,1e-6)
+
+    def close(self):
+        """
+        flush the remaining rows, move the id sequence forward and report the load rate
+        """
+
+        self.flush()
+
+        if self.useCopy == True and self.nextId > 1:
+            sequence = self.table.c.id.default
+            if sequence is not None and hasattr(sequence,'name'):
+                with self.engine.begin() as connection:
+                    connection.execute(text("SELECT setval('%s',%s)"%(sequence.name,self.nextId-1)))
+
+        rateStr = "...%s rows loaded into %s (%s rows/sec)"%(self.totalRows,self.table.name,int(round(self.get_rate())))
+        if self.verbose == True:
+            print(rateStr)
+
+        return rateStr
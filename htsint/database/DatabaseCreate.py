@@ -17,13 +17,13 @@ it is best to re-run FetchDbdata.py and then this script.
 ### make imports
 import sys,os,re,time,csv
 from htsint import Configure
-from sqlalchemy.ext.declarative import declarative_base
+from .DatabaseTables import Base
+from .BulkLoader import create_tables,finalize_tables
+from .IndexTools import analyze_tables
 from .DatabaseTools import db_connect, get_file_sizes,print_db_summary
 from .DatabaseTools import populate_taxon_table,populate_gene_table,populate_uniprot_table
-from .DatabaseTools import populate_go_terms, populate_go_annotations
-from .GeneOntologyLib import read_annotation_file,get_annotation_file,get_total_annotations
-
-Base = declarative_base()
+from .DatabaseTools import populate_go_terms, populate_go_annotations, populate_taxa_gene_terms
+from .GeneOntologyLib import get_annotation_file,get_total_annotations
 
 class DatabaseCreate(object):
     """
@@ -49,7 +49,12 @@ class DatabaseCreate(object):
 
         self.taxaList = self.config.log['taxa']
 
-    def run(self):
+    def run(self,materialize=True):
+        """
+        create and populate the tables
+        materialize - build the taxa_gene_terms table used by GeneOntology.create_dicts
+        """
+
         ## prepare a log file
         fid = open(os.path.join(self.config.log['data'],'createdb.log'),'w')
         writer = csv.writer(fid)
@@ -63,22 +68,19 @@ class DatabaseCreate(object):
         push_out("Getting ready to create database...")
 
         ## conect to the database
-        session,engine = db_connect(verbose=False)
-        Base.metadata.drop_all(engine)
-        Base.metadata.create_all(engine)
+        ## foreign keys and indexes are created after the tables are loaded
+        session,engine = db_connect(verbose=False,bulkLoad=True)
+        create_tables(engine,Base.metadata,deferConstraints=True)
 
         push_out("Creating database with...")
         for t in Base.metadata.sorted_tables:
             push_out("\t"+t.name)
 
-        ## determine file sizes
-        timeStart = time.time()
-        push_out("determining filesizes...")
+        ## file sizes are counted as the files are loaded and used to report progress in the next build
         idmapCount,geneInfoCount = get_file_sizes()
-
-        push_out("extracting taxa list...")
         totalAnnotations = get_total_annotations()
-        push_out("...extraction time: %s"%time.strftime('%H:%M:%S',time.gmtime(time.time()-timeStart)))
+        if None in [idmapCount,geneInfoCount,totalAnnotations]:
+            push_out("the data files have not been counted -- progress is reported from the next build")
 
         ## taxa table
         push_out("Populating the database taxa table")
@@ -87,13 +89,13 @@ class DatabaseCreate(object):
         push_out(addedStr)
 
         ## gene table
-        push_out("Populating the database with %s genes"%(geneInfoCount))
+        push_out("Populating the database with %s genes"%('the' if geneInfoCount is None else geneInfoCount))
         timeStr,addedStr = populate_gene_table(geneInfoCount,session,engine)
         push_out(timeStr)
         push_out(addedStr)
         
         ## uniprot table
-        push_out("Populating the database with %s uniprot entries"%(idmapCount))
+        push_out("Populating the database with %s uniprot entries"%('the' if idmapCount is None else idmapCount))
         timeStr,addedStr = populate_uniprot_table(idmapCount,session,engine)
         push_out(timeStr)
         push_out(addedStr)
@@ -112,6 +114,19 @@ class DatabaseCreate(object):
         push_out("There were %s uniprot annotations ignored"%str(ignored[0]))
         push_out("There were %s gene annotations ignored"%str(ignored[1]))
 
+        ## foreign keys and indexes
+        push_out("Creating foreign keys and indexes...")
+        push_out(finalize_tables(engine,Base.metadata))
+
+        ## the go terms of each gene
+        if materialize == True:
+            push_out("Populating the database with the go terms of each gene...")
+            timeStr,addedStr = populate_taxa_gene_terms(engine)
+            push_out(timeStr)
+            push_out(addedStr)
+
+        push_out(analyze_tables(engine,Base.metadata))
+
         print_db_summary()
         fid.close()
 
@@ -14,9 +14,13 @@ class DatabaseFetch(object):
     Run each time we want files updated for database
     """
 
-    def __init__(self,wget=os.path.join("/","usr","bin","wget"),gunzip=os.path.join("/","usr","bin","gunzip")):
+    def __init__(self,wget=os.path.join("/","usr","bin","wget"),gunzip=os.path.join("/","usr","bin","gunzip"),
+                 uncompress=False):
         """  
         Constructor
+
+        uncompress - also write decompressed (.db) copies of the .gz files
+                     the copies are optional because the files are read directly from the .gz files
         """
  
         config = Configure()
@@ -63,6 +67,7 @@ class DatabaseFetch(object):
         if gunzipPath == None:
             raise Exception("ERROR: cannot find gunzip -- either download the files (see documentation) or specify a path")
         self.gunzipPath = gunzipPath
+        self.uncompress = uncompress
 
     def _run_subprocess(self,cmd):
         proc = subprocess.Popen(cmd,shell=True,stdout=subprocess.PIPE,stdin=subprocess.PIPE)
@@ -120,19 +125,25 @@ class DatabaseFetch(object):
             fetchTime = time.time() - timeStart
             push_out("...%s"%fetchTime)
 
-            ## unzip the gz files
+            ## unzip the gz files (the tar files are always extracted)
             if not re.search("\.gz",fileName):
                 continue
 
-            if not os.path.exists(fileName[:-3]+".db") or fetchTime > 10:
-                if re.search("\.tar\.gz",fileName):
-                    self.untar_file(fileName)
-                else:
-                    self.unzip_file(fileName)
+            if re.search("\.tar\.gz",fileName):
+                self.untar_file(fileName)
+            elif self.uncompress == True and (not os.path.exists(fileName[:-3]+".db") or fetchTime > 10):
+                self.unzip_file(fileName)
+            elif self.uncompress == False and os.path.exists(fileName[:-3]+".db") and fetchTime > 10:
+                ## a stale copy would be read instead of the new download
+                os.remove(fileName[:-3]+".db")
 
         ## make the uniprot BLAST index
         try:
-            self._run_subprocess("makeblastdb -in uniprot_sprot.fasta.db -dbtype 'prot' -out uniprot_sprot")
+            if os.path.exists("uniprot_sprot.fasta.db"):
+                self._run_subprocess("makeblastdb -in uniprot_sprot.fasta.db -dbtype 'prot' -out uniprot_sprot")
+            else:
+                self._run_subprocess("%s -c uniprot_sprot.fasta.gz | makeblastdb -in - -dbtype 'prot' "%self.gunzipPath+\
+                                     "-title uniprot_sprot -out uniprot_sprot")
         except:
             print("WARNING: makeblastdb failed")
             
@@ -5,17 +5,74 @@ These are the tables for the database
 
 ### make imports
 import sys,os,re
-from sqlalchemy import Table, Column, Integer, String, MetaData, ForeignKey
+from sqlalchemy import Table, Column, Integer, SmallInteger, String, MetaData, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Sequence
+from sqlalchemy.dialects.postgresql import ARRAY
+from .IdResolver import get_id_resolver
 Base = declarative_base()
 
+## evidence classes used by the taxa_gene_terms table
+CURATED,NON_CURATED = 0,1
+
+## evidence codes and aspects are stored as small integers (0 is an unknown code)
+## codes may only be appended to these lists or existing databases will be misread
+EVIDENCE_CODES = ["EXP","IDA","IPI","IMP","IGI","IEP","ISS","ISO","ISA","ISM","IGC","RCA",
+                  "TAS","NAS","IC","ND","IEA","NR","IBA","IBD","IKR","IRD","HTP","HDA",
+                  "HMP","HGI","HEP"]
+ASPECTS = ["biological_process","molecular_function","cellular_component"]
+_evidenceValues = dict([(code,i+1) for i,code in enumerate(EVIDENCE_CODES)])
+_aspectValues = dict([(aspect,i+1) for i,aspect in enumerate(ASPECTS)])
+_aspectValues.update({'P':1,'F':2,'C':3})
+
+def encode_evidence_code(evidenceCode):
+    """
+    return the integer stored for an evidence code
+    """
+
+    return _evidenceValues.get(evidenceCode,0)
+
+def encode_evidence_codes(evidenceCodes):
+    """
+    return the integers stored for a list of evidence codes
+    """
+
+    return sorted(set([encode_evidence_code(code) for code in evidenceCodes]) - set([0]))
+
+def decode_evidence_code(value):
+    """
+    return the evidence code of a stored integer (None if unknown)
+    """
+
+    if value is None or value < 1 or value > len(EVIDENCE_CODES):
+        return None
+    return EVIDENCE_CODES[value-1]
+
+def encode_aspect(aspect):
+    """
+    return the integer stored for an aspect (i.e. 'biological_process' or 'P')
+    """
+
+    if aspect not in _aspectValues:
+        raise Exception("Invalid aspect specified %s"%aspect)
+    return _aspectValues[aspect]
+
+def decode_aspect(value):
+    """
+    return the aspect of a stored integer (None if unknown)
+    """
+
+    if value is None or value < 1 or value > len(ASPECTS):
+        return None
+    return ASPECTS[value-1]
+
 class Taxon(Base):
     '''
     class that handles the ncbi taxa
     '''
 
     __tablename__ = 'taxa'
+    __table_args__ = (Index('ix_taxa_ncbi_id','ncbi_id'),)
 
     id = Column(Integer, Sequence('taxon_id_seq'),primary_key=True)
     ncbi_id = Column(Integer)
@@ -38,20 +95,17 @@ class Taxon(Base):
                                                     self.common_name_2,
                                                     self.common_name_3)
 
-def taxa_mapper(session,ncbiIdList=None,myDict={},yieldPer=5):
+def taxa_mapper(session,ncbiIdList=None,myDict=None):
     """
     a function that maps ncbi_ids to taxa.id
     if a dict is provided keys must be the string of the ncbi_id
     """
 
-    if ncbiIdList:
-        ncbiIdList = dict([(i,None)for i in list(set(ncbiIdList))])
-
-    for t in session.query(Taxon).yield_per(yieldPer):
-        if ncbiIdList and not ncbiIdList.has_key(str(t)):
-            continue
+    if myDict is None:
+        myDict = {}
 
-        myDict[str(t.ncbi_id)] = t.id
+    resolver = get_id_resolver(session.get_bind())
+    myDict.update(resolver.resolve(Taxon.ncbi_id,ncbiIdList))
 
     return myDict
 
@@ -62,6 +116,8 @@ class Gene(Base):
     '''
 
     __tablename__ = 'genes'
+    __table_args__ = (Index('ix_genes_ncbi_id','ncbi_id'),
+                      Index('ix_genes_taxa_id','taxa_id',postgresql_include=['ncbi_id']))
 
     id = Column(Integer, Sequence('gene_id_seq'),primary_key=True)
     ncbi_id = Column(String)
@@ -91,19 +147,17 @@ class Gene(Base):
                                                              self.map_location,
                                                              self.taxa_id)
 
-def gene_mapper(session,ncbiIdList=None,myDict={}):
+def gene_mapper(session,ncbiIdList=None,myDict=None):
     """
     a function that maps ncbi_ids to gene.id
     if a dict is provided keys must be the string of the ncbi_id
     """
 
-    if ncbiIdList:
-        ncbiIdList = dict([(i,None)for i in list(set(ncbiIdList))])
+    if myDict is None:
+        myDict = {}
 
-    for g in session.query(Gene).yield_per(5):
-        if ncbiIdList and not ncbiIdList.has_key(g):
-            continue
-        myDict[str(g.ncbi_id)] = g.id
+    resolver = get_id_resolver(session.get_bind())
+    myDict.update(resolver.resolve(Gene.ncbi_id,ncbiIdList))
 
     return myDict
 
@@ -113,6 +167,9 @@ class Uniprot(Base):
     '''
 
     __tablename__ = 'uniprot'
+    __table_args__ = (Index('ix_uniprot_uniprot_entry','uniprot_entry'),
+                      Index('ix_uniprot_uniprot_ac','uniprot_ac'),
+                      Index('ix_uniprot_gene_id','gene_id'))
 
     id = Column(Integer, Sequence('uniprot_id_seq'),primary_key=True)
     uniprot_ac = Column(String)
@@ -135,7 +192,7 @@ class Uniprot(Base):
                                                       self.taxa_id,
                                                       self.gene_id)
 
-def uniprot_mapper(session,uniprotIdList=None,myDict={},gene=False,taxa=False):
+def uniprot_mapper(session,uniprotIdList=None,myDict=None,gene=False,taxa=False):
     """
     a function that maps uniprot_entry to uniprot.id
     if a dict is provided keys must be the string of the ncbi_id
@@ -148,34 +205,38 @@ def uniprot_mapper(session,uniprotIdList=None,myDict={},gene=False,taxa=False):
 
     """
 
-    if uniprotIdList:
-        uniprotIdList = dict([(i,None) for i in list(set(uniprotIdList))])
+    if myDict is None:
+        myDict = {}
 
-    for u in session.query(Uniprot).yield_per(5):
-        if uniprotIdList and not uniprotIdList.has_key(u.uniprot_entry):
-            continue
+    resolver = get_id_resolver(session.get_bind())
+    if gene == False and taxa == False:
+        myDict.update(resolver.resolve(Uniprot.uniprot_entry,uniprotIdList))
+        return myDict
 
-        if gene == False and taxa == False:
-            myDict[str(u.uniprot_entry)] = u.id
-        elif gene == True and taxa == False:
-            myDict[str(u.uniprot_entry)] = {'id':u.id,'gene_id':u.gene_id}
-        elif gene == False and taxa == True:
-            myDict[str(u.uniprot_entry)] = {'id':u.id,'taxa_id':u.taxa_id}
-        elif gene == True and taxa == True:
-            myDict[str(u.uniprot_entry)] = {'id':u.id,'gene_id':u.gene_id,'taxa_id':u.taxa_id}
+    results = resolver.resolve(Uniprot.uniprot_entry,uniprotIdList,
+                               valueColumns=[Uniprot.id,Uniprot.gene_id,Uniprot.taxa_id])
+    for uniprotEntry,(uniprotId,geneId,taxaId) in results.items():
+        myDict[uniprotEntry] = {'id':uniprotId}
+        if gene == True:
+            myDict[uniprotEntry]['gene_id'] = geneId
+        if taxa == True:
+            myDict[uniprotEntry]['taxa_id'] = taxaId
 
     return myDict
 
 class GoTerm(Base):
     '''
     class that handles gene ontology terms
+    the aspect is stored as an integer (see encode_aspect)
     '''
 
     __tablename__ = 'go_terms'
+    __table_args__ = (Index('ix_go_terms_go_id','go_id'),
+                      Index('ix_go_terms_aspect_id','aspect','id',postgresql_include=['go_id','name']))
 
     id = Column(Integer, Sequence('go_term_id_seq'),primary_key=True)
     go_id = Column(String)
-    aspect = Column(String)
+    aspect = Column(SmallInteger)
     name = Column(String)
     alternate_id = Column(String)
     description = Column(String)
@@ -189,25 +250,22 @@ class GoTerm(Base):
     
     def __repr__(self):
         return "<GoTerm('%s','%s','%s','%s','%s')>"%(self.go_id,
-                                                     self.aspect,
+                                                     decode_aspect(self.aspect),
                                                      self.name,
                                                      self.alternate_id,
                                                      self.description)
 
-def goterm_mapper(session,gotermIdList=None,myDict={}):
+def goterm_mapper(session,gotermIdList=None,myDict=None):
     """
-    a function that maps uniprot_id to uniprot.id
-    if a dict is provided keys must be the string of the ncbi_id
+    a function that maps go_id to go_terms.id
+    if a dict is provided keys must be the go_id
     """
 
-    if gotermIdList:
-        gotermIdList = dict([(i,None)for i in list(set(gotermIdList))])
-
-    for g in session.query(GoTerm).yield_per(5):
-        if gotermIdList and not gotermIdList.has_key(g):
-            continue
+    if myDict is None:
+        myDict = {}
 
-        myDict[g.go_id] = g.id
+    resolver = get_id_resolver(session.get_bind())
+    myDict.update(resolver.resolve(GoTerm.go_id,gotermIdList))
 
     return myDict
 
@@ -215,35 +273,88 @@ class GoAnnotation(Base):
     '''
     class that handles gene ontology annotations
     annotations may be associated with a gene id or a uniprot id
+    the evidence code is stored as an integer (see encode_evidence_code)
+    and the references are kept in the go_annotation_refs table
     '''
 
     __tablename__ = 'go_annotations'
+    ## the taxa and gene/uniprot queries in GeneOntologyLib are answered from these indexes
+    __table_args__ = (Index('ix_go_annotations_taxa_evidence','taxa_id','evidence_code',
+                            postgresql_include=['go_term_id','gene_id','uniprot_id']),
+                      Index('ix_go_annotations_gene_id','gene_id','evidence_code',
+                            postgresql_include=['go_term_id']),
+                      Index('ix_go_annotations_uniprot_id','uniprot_id','evidence_code',
+                            postgresql_include=['go_term_id']))
 
     id = Column(Integer, Sequence('go_annotation_id_seq'),primary_key=True)
     go_term_id = Column(Integer, ForeignKey('go_terms.id'))
-    evidence_code = Column(String)
-    pubmed_refs = Column(String)
+    evidence_code = Column(SmallInteger)
     uniprot_id = Column(Integer, ForeignKey('uniprot.id'),nullable=True)
     gene_id = Column(Integer, ForeignKey('genes.id'),nullable=True)
     taxa_id = Column(Integer,ForeignKey('taxa.id'),nullable=False)
 
-    def __init__(self,go_term_id,evidence_code,pubmed_refs,uniprot_id,gene_id,taxa_id):
+    def __init__(self,go_term_id,evidence_code,uniprot_id,gene_id,taxa_id):
         self.go_term_id = go_term_id
         self.evidence_code = evidence_code
-        self.pubmed_refs = pubmed_refs
         self.uniprot_id = uniprot_id
         self.gene_id = gene_id
         self.taxa_id = taxa_id
 
     def __repr__(self):
-        return "<GoAnnotation('%s','%s','%s','%s','%s','%s')>"%(self.go_term_id,
-                                                                self.evidence_code,
-                                                                self.pubmed_refs,
-                                                                self.uniprot_id,
-                                                                self.gene_id,
-                                                                self.taxa_id)
+        return "<GoAnnotation('%s','%s','%s','%s','%s')>"%(self.go_term_id,
+                                                           decode_evidence_code(self.evidence_code),
+                                                           self.uniprot_id,
+                                                           self.gene_id,
+                                                           self.taxa_id)
+
+class GoAnnotationRef(Base):
+    '''
+    class that handles the references (i.e. pubmed ids) of gene ontology annotations
+    '''
+
+    __tablename__ = 'go_annotation_refs'
+    __table_args__ = (Index('ix_go_annotation_refs_annotation_id','annotation_id'),)
+
+    id = Column(Integer, Sequence('go_annotation_ref_id_seq'),primary_key=True)
+    annotation_id = Column(Integer, ForeignKey('go_annotations.id'),nullable=False)
+    pubmed_refs = Column(String)
 
+    def __init__(self,annotation_id,pubmed_refs):
+        self.annotation_id = annotation_id
+        self.pubmed_refs = pubmed_refs
 
+    def __repr__(self):
+        return "<GoAnnotationRef('%s','%s')>"%(self.annotation_id,self.pubmed_refs)
+
+
+class TaxaGeneTerm(Base):
+    '''
+    a denormalized table of the go terms of each gene (built by populate_taxa_gene_terms)
+    one row per (taxon, aspect, evidence class, gene) where the evidence class is
+    CURATED or NON_CURATED (IEA).  The terms of the uniprot entries of a gene are included.
+    go_ids is an array with PostgreSQL and a comma separated string otherwise
+    '''
+
+    __tablename__ = 'taxa_gene_terms'
+
+    taxa_ncbi_id = Column(Integer,primary_key=True)
+    aspect = Column(SmallInteger,primary_key=True)
+    evidence_class = Column(SmallInteger,primary_key=True)
+    ncbi_id = Column(String,primary_key=True)
+    go_ids = Column(String().with_variant(ARRAY(String),'postgresql'))
+
+    def __init__(self,taxa_ncbi_id,aspect,evidence_class,ncbi_id,go_ids):
+        self.taxa_ncbi_id = taxa_ncbi_id
+        self.aspect = aspect
+        self.evidence_class = evidence_class
+        self.ncbi_id = ncbi_id
+        self.go_ids = go_ids
+
+    def __repr__(self):
+        return "<TaxaGeneTerm('%s','%s','%s','%s')>"%(self.taxa_ncbi_id,
+                                                      decode_aspect(self.aspect),
+                                                      self.evidence_class,
+                                                      self.ncbi_id)
 
 if __name__ == "__main__":
     print("test")
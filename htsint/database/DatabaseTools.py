@@ -7,13 +7,22 @@ These are helper scripts to populate the database
 import sys,os,re,time,csv
 import sqlalchemy
 import getpass
+from contextlib import contextmanager
 import numpy as np
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine,event
+from sqlalchemy.sql import select,union_all,literal,distinct,func
 from sqlalchemy.orm import sessionmaker
 from htsint import Configure
-from .DatabaseTables import Base,Taxon,Gene,Uniprot,GoTerm,GoAnnotation
+from .DatabaseTables import Base,Taxon,Gene,Uniprot,GoTerm,GoAnnotation,GoAnnotationRef,TaxaGeneTerm
+from .DatabaseTables import CURATED,NON_CURATED,encode_evidence_codes,encode_evidence_code
 from .DatabaseTables import taxa_mapper,gene_mapper,uniprot_mapper,goterm_mapper
+from .BulkLoader import BulkLoader
 from htsint.database import get_annotation_file, get_ontology_file, get_gene2go_file
+from .GeneOntologyLib import read_ontology_alt_ids,get_evidence_codes
+from .FileTools import find_data_file,open_data_file,get_file_stats,write_file_stats
+from .IdmappingLib import parse_idmapping_file
+from .OntologyIndex import get_ontology_index
+from .AnnotationLib import read_gaf_file
 
 def ask_upass():
     """
@@ -33,43 +42,142 @@ def ask_upass():
 
     return upass
 
-def db_connect(verbose=False,upass=''):
+def get_db_file():
     """
-    generic function to connect to db
+    return the path of the sqlite database file
+    defaults to 'dbname'.db in the data directory
+    """
+
+    config = Configure()
+    dbfile = config.log.get('dbfile','')
+    if dbfile == '':
+        dbfile = os.path.join(config.log['data'],"%s.db"%config.log['dbname'])
 
+    return dbfile
+
+def set_sqlite_pragmas(dbapiConnection,bulkLoad=False):
+    """
+    set the pragmas used with every sqlite connection
+    bulkLoad - trade durability for speed while the database is created
     """
 
+    cursor = dbapiConnection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=%s"%("OFF" if bulkLoad == True else "NORMAL"))
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-262144")
+    cursor.execute("PRAGMA mmap_size=34359738368")
+    cursor.close()
+
+## engines (and their connection pools) are shared by every caller in the process
+_engines = {}
+_sessionmakers = {}
+
+def get_engine(verbose=False,upass='',bulkLoad=False):
+    """
+    return the engine shared by all callers with the same arguments
+    the config is only read (and the password asked for) when the engine is created
+
+    the config 'dbbackend' is either 'postgresql' (default) or 'sqlite'
+    a sqlite database is a single file (see get_db_file) opened in WAL mode
+    bulkLoad - sqlite only, use faster and less durable pragmas (i.e. DatabaseCreate)
+
+    the PostgreSQL pool is set with the config 'dbpoolsize' (default 5) and
+    'dbmaxoverflow' (default 10), connections are tested before they are used
+    """
+
+    engineKey = (bool(verbose),upass,bool(bulkLoad))
+    if engineKey in _engines:
+        return _engines[engineKey]
+
     config = Configure()
 
     for key in ['data','dbname']:
         if config.log[key] == '':
             raise Exception("You must modify the config file before running DatabaseFetch.py")
-    
-    ## declare variables
-    uname = config.log['dbuser']
-    dbhost = config.log['dbhost']
-    dbname = config.log['dbname']
-    port = config.log['dbport']
 
-    ## get data base parameters
-    if upass == '':
-        upass = ask_upass()
+    backend = config.log.get('dbbackend','postgresql')
+    if backend not in ['postgresql','sqlite']:
+        raise Exception("Invalid database backend '%s' use 'postgresql' or 'sqlite'"%backend)
 
-    if dbname == '' or port == '' or dbhost == '' or uname=='':
-        raise Exception("Invalid database parameters -- parameters not specified in config file")
-            
-    ## create connection to db and create necessary tables 
-    if verbose:
-        print("connecting to database: %s"%dbname)
-    engine = create_engine('postgresql://%s:%s@%s:%s/%s'%(uname,upass,dbhost,port,dbname),echo=verbose)
-    connection = engine.connect()
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    if backend == 'sqlite':
+        dbfile = get_db_file()
+        if verbose:
+            print("connecting to database: %s"%dbfile)
+        engine = create_engine('sqlite:///%s'%dbfile,echo=verbose,pool_pre_ping=True)
+        event.listen(engine,'connect',lambda dbapiConnection,record: set_sqlite_pragmas(dbapiConnection,bulkLoad))
+    else:
+        ## declare variables
+        uname = config.log['dbuser']
+        dbhost = config.log['dbhost']
+        dbname = config.log['dbname']
+        port = config.log['dbport']
+
+        ## get data base parameters
+        if upass == '':
+            upass = ask_upass()
+
+        if dbname == '' or port == '' or dbhost == '' or uname=='':
+            raise Exception("Invalid database parameters -- parameters not specified in config file")
+
+        if verbose:
+            print("connecting to database: %s"%dbname)
+        engine = create_engine('postgresql://%s:%s@%s:%s/%s'%(uname,upass,dbhost,port,dbname),echo=verbose,
+                               pool_size=int(config.log.get('dbpoolsize',5)),
+                               max_overflow=int(config.log.get('dbmaxoverflow',10)),
+                               pool_pre_ping=True,pool_recycle=3600)
+
+    _engines[engineKey] = engine
+    _sessionmakers[engine] = sessionmaker(bind=engine)
+
+    return engine
+
+def dispose_engines(close=True):
+    """
+    close the pooled connections of every shared engine and empty the registry
+
+    close - use False in a forked worker process (see IdmappingLib.mp_init) so the
+            connections inherited from the parent are dropped without being closed
+    """
+
+    for engine in _engines.values():
+        engine.dispose(close=close)
+    _engines.clear()
+    _sessionmakers.clear()
+
+def db_connect(verbose=False,upass='',bulkLoad=False):
+    """
+    generic function to connect to db
+    returns a new session and the shared engine (see get_engine)
+
+    """
+
+    engine = get_engine(verbose=verbose,upass=upass,bulkLoad=bulkLoad)
+    session = _sessionmakers[engine]()
     if verbose:
         print('connected.')
 
     return session,engine
 
+@contextmanager
+def session_scope(verbose=False,upass=''):
+    """
+    provide a session that is committed (or rolled back on errors) and closed
+
+        with session_scope() as session:
+            taxon = session.query(Taxon).filter_by(ncbi_id=9606).first()
+    """
+
+    session,engine = db_connect(verbose=verbose,upass=upass)
+    try:
+        yield session
+        session.commit()
+    except:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
 def read_gene_info_file(lineCount=False,short=False):
     """
     read the essential info from NCBI's gene info file
@@ -77,8 +185,8 @@ def read_gene_info_file(lineCount=False,short=False):
 
     config = Configure()
     taxaList = config.log['taxa']
-    geneInfoFile = os.path.join(config.log['data'],"gene_info.db")
-    geneInfoFid = open(geneInfoFile,'rU')
+    geneInfoFile = get_gene_info_file()
+    geneInfoFid = open_data_file(geneInfoFile)
     header = geneInfoFid.__next__()
     geneInfo ={}
     totalLines = 0
@@ -119,28 +227,27 @@ def read_gene_info_file(lineCount=False,short=False):
 
 def get_file_sizes():
     """
-    return a unique dict of geneids with refseq values from the idmapping file
+    return the number of uniprot entries (idmapping file) and genes (gene_info file) for the taxa
+    the counts are written by populate_uniprot_table and populate_gene_table (see FileTools.get_file_stats)
+    a count is None when the file has not been loaded before
 
     """
 
     config = Configure()
     taxaList = config.log['taxa']
-    geneInfoCount = read_gene_info_file(lineCount=True)
-    idmappingFile = get_idmapping_file()
-    idmappingFid = open(idmappingFile,'rU')
-    reader = csv.reader(idmappingFid,delimiter="\t")
-    records = set([])
-    totalRecords = 0
 
-    for record in reader:
-        totalRecords += 1
-        if record[1] == 'ncbi-taxa-id' and record[2] not in taxaList:
-            continue
-        records.update([record[0]])
+    return get_file_stats(get_idmapping_file(),taxaList),get_file_stats(get_gene_info_file(),taxaList)
+
+def get_waypoints(total,points=20):
+    """
+    return the record counts at which the progress is printed
+    there is no progress when the total is not known (i.e. the files have not been counted)
+    """
+
+    if not total:
+        return set([])
 
-    idmappingFid.close()
-    print('debug. totalRecords %s, records %s, geneInfoCount %s'%(totalRecords, len(list(records)), geneInfoCount))
-    return len(list(records)),geneInfoCount
+    return set([round(int(w)) for w in np.linspace(0,total,points)])
 
 def populate_taxon_table(engine):
     """
@@ -153,9 +260,10 @@ def populate_taxon_table(engine):
     if os.path.exists(namesFile) == False:
         raise Exception("Cannot find names.dmp... exiting")
 
-    namesFID = open(namesFile,'rU')
+    namesFID = open(namesFile,'r')
     taxaCount = 0
     timeStart = time.time()
+    loader = BulkLoader(engine,Taxon.__table__)
     toAdd = {}
     taxaID = None
     debug = 0
@@ -184,9 +292,7 @@ def populate_taxon_table(engine):
         if taxaID not in toAdd:
             taxaCount += 1
             if len(toAdd) >= 300000:
-                with engine.begin() as connection:
-                    connection.execute(Taxon.__table__.insert().
-                                       values(toAdd.values()))
+                loader.add_rows(toAdd.values())
                 toAdd = {}
 
             toAdd[taxaID] = {'ncbi_id':taxaID,'name':None,'common_name_1':None,
@@ -206,11 +312,11 @@ def populate_taxon_table(engine):
             continue
 
     print('committing changes...')
-    with engine.begin() as connection:
-        connection.execute(Taxon.__table__.insert().
-                           values(toAdd.values()))
+    loader.add_rows(toAdd.values())
+    loader.close()
     namesFID.close()
-    timeStr = "...total time taken: %s"%time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart))
+    timeStr = "...total time taken: %s (%s rows/sec)"%(time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart)),
+                                                      int(round(loader.get_rate())))
     addedStr =  "...%s unique taxa were added."%taxaCount
     return timeStr, addedStr
 
@@ -225,11 +331,12 @@ def populate_gene_table(geneInfoCount,session,engine):
     toAdd = []
     totalRecords = 0
     total = geneInfoCount
-    wayPoints = [round(int(w)) for w in np.linspace(0,total,20)]
-    geneInfoFile = os.path.join(config.log['data'],"gene_info.db")
-    geneInfoFid = open(geneInfoFile,'rU')
+    wayPoints = get_waypoints(total)
+    geneInfoFile = get_gene_info_file()
+    geneInfoFid = open_data_file(geneInfoFile)
     header = geneInfoFid.__next__()
     taxaIdMap = taxa_mapper(session)
+    loader = BulkLoader(engine,Gene.__table__)
 
     for record in geneInfoFid:
         record = record.rstrip("\n")
@@ -266,10 +373,7 @@ def populate_gene_table(geneInfoCount,session,engine):
             for ta in toRemove:
                 toAdd.remove(ta)
                 
-            if len(toAdd) > 0:
-                with engine.begin() as connection:
-                    connection.execute(Gene.__table__.insert().
-                                       values(toAdd))
+            loader.add_rows(toAdd)
             toAdd = []
 
         ## show progress
@@ -287,173 +391,62 @@ def populate_gene_table(geneInfoCount,session,engine):
     for ta in toRemove:
         toAdd.remove(ta)
 
-    if len(toAdd) > 0:
-        with engine.begin() as connection:
-            connection.execute(Gene.__table__.insert().
-                               values(toAdd))
+    loader.add_rows(toAdd)
+    loader.close()
 
     ## clean up
     geneInfoFid.close()
+    write_file_stats(geneInfoFile,taxaList,{'records':totalRecords})
 
-    timeStr = "...total time taken: %s"%time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart))
+    timeStr = "...total time taken: %s (%s rows/sec)"%(time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart)),
+                                                      int(round(loader.get_rate())))
     addedStr = "...%s unique genes were added."%totalRecords
     return timeStr,addedStr
 
-def populate_uniprot_table(lineCount,session,engine):
+def populate_uniprot_table(lineCount,session,engine,processes=None):
     """
     populate the uniprot table with entries from idmappings
+    the file is parsed in shards by a pool of processes (see IdmappingLib)
+    lineCount - the number of uniprot entries (used to report progress)
     """
 
     config = Configure()
     taxaList = config.log['taxa']
     timeStart = time.time()
-    totalLines,totalRecords = 0,0
+    totalRecords = 0
     idmappingFile = get_idmapping_file()
-    idmappingFid = open(idmappingFile,'rb')
-    reader = csv.reader(idmappingFid,delimiter="\t")
-    ac2kbMap,toAdd = {},{}
-    wayPoints = [round(int(w)) for w in np.linspace(0,lineCount,20)]
+    wayPoints = get_waypoints(lineCount)
 
     print("getting mappers...")
     geneIdMap = gene_mapper(session)
     taxonIdMap = taxa_mapper(session)
+    loader = BulkLoader(engine,Uniprot.__table__)
     print("mappers loaded... %s"%time.strftime('%H:%M:%S',time.gmtime(time.time()-timeStart)))
 
-    def queue_entries(toAdd,geneIdMap,taxonIdMap,engine):
-
-        toCommit = []
-
-        for uniprotKbEntry, entry in toAdd.iteritems():
-            db_gene_id = None
-            db_taxa_id = None
-            db_gene_taxa_id = None
-
-            ## convert the gene id to a database key (check old names if we cannot find it)
-            if entry['gene-id'] == None:
-                pass
-            elif entry['gene-id'] in geneIdMap:
-                db_gene_id = geneIdMap[entry['gene-id']]
-            elif entry['gene-id'] not in geneIdMap:
-                _geneIds = [re.sub("\s+","",_ncid) for _ncid in entry['gene-id'].split(";")]
-                db_gene_id = None
-        
-                for _gid in _geneIds:
-                    if _gid in geneIdMap:
-                        db_gene_id= _gid
-
-            ## convert the taxa id to a database key
-            if entry['ncbi-taxa-id'] and entry['ncbi-taxa-id'] in taxonIdMap:
-                db_taxa_id = taxonIdMap[entry['ncbi-taxa-id']]
-
-            ## check that the linked gene taxa is the same as the entry taxa
-            #if db_gene_id:
-            #    db_gene_taxa_id = session.query(Gene).filter_by(id=db_gene_id).first().taxa_id
-            #if db_taxa_id and db_gene_id:
-            #    if db_taxa_id != db_gene_taxa_id:
-            #        print("WARNING: two taxa present in single uniprot entry? %s %s "%(uniprotKbEntry,\
-            #                                                                           entry['gene-id']))
-
-            ## if no taxa was provdied use the one assocated with the linked gene
-            #if not db_taxa_id:
-            #    dgeneQuery = session.query(Gene).filter_by(id=db_gene_id).first()
-            #    if dgeneQuery:
-            #        db_taxa_id = dgeneQuery.taxa_id 
-
-            ## ensure we are in appropriate taxa
-            if entry['ncbi-taxa-id'] not in taxaList:
-                continue
-
-            ## ready the uniprot-ac and refseq rows
-            entry['uniprot-ac'] = list(entry['uniprot-ac'])
-            if len(entry['uniprot-ac']) == 0:
-                entry['uniprot-ac'] = None
-            elif  len(entry['uniprot-ac']) == 1:
-                entry['uniprot-ac'] = entry['uniprot-ac'][0]
-            else:
-                entry['uniprot-ac'] = ";".join(entry['uniprot-ac'])
-
-            entry['refseq'] = list(entry['refseq'])
-            if len(entry['refseq']) == 0:
-                entry['refseq'] = None
-            elif  len(entry['refseq']) == 1:
-                entry['refseq'] = entry['refseq'][0]
-            else:
-                entry['refseq'] = ";".join(entry['refseq'])
-
-            ## commit to db
-            toCommit.append({'uniprot_ac':entry['uniprot-ac'],'uniprot_entry':uniprotKbEntry,
-                             'refseq':entry['refseq'],'taxa_id':db_taxa_id,'gene_id':db_gene_id})
-        if len(toCommit) > 0:
-            with engine.begin() as connection:
-                connection.execute(Uniprot.__table__.insert().
-                                   values(toCommit))
-
     ## parse the idmapping file into the db
-    for record in reader:
-
-        if len(record) != 3:
-            continue
-
-        uniprotKbAc,uniprotKbEntry,ncbiId,refseq,ncbiTaxaId = None,None,None,None,None
-        uniprotKbAc = record[0]
-        totalLines += 1
-        if totalLines in wayPoints:
-            print("\t%s / %s"%(totalLines,lineCount))
-        
-        if record[1] == 'NCBI_TaxID':
-            ncbiTaxaId = record[2]
-        elif record[1] == 'GeneID':
-            ncbiId = record[2]
-        elif record[1] == 'UniProtKB-ID':
-            uniprotKbEntry = record[2]
-            if uniprotKbAc not in ac2kbMap:
-                ac2kbMap[uniprotKbAc] = uniprotKbEntry
-        elif record[1] == 'RefSeq':
-            refseq = record[2]
-        else:
-            continue
-
-        ## skip the XXXX-1 like uniprot ac
-        if uniprotKbAc not in ac2kbMap:
-            continue
-
-        ## get current key
-        uniprotKbEntry = ac2kbMap[uniprotKbAc] 
+    for entries in parse_idmapping_file(idmappingFile,taxaList,processes=processes):
+        toCommit = []
+        for uniprotAc,uniprotKbEntry,refseq,ncbiTaxaId,ncbiId in entries:
 
-        ## make new entry if necessary
-        if uniprotKbEntry and uniprotKbEntry not in toAdd:
+            ## convert the gene and taxa ids to database keys
+            db_gene_id = geneIdMap.get(ncbiId) if ncbiId else None
+            db_taxa_id = taxonIdMap.get(ncbiTaxaId)
 
-            ## queue entries in blocks
-            totalRecords += 1 
-        
-            if totalRecords % 100000 == 0:
-                queue_entries(toAdd,geneIdMap,taxonIdMap,engine)
-                toAdd,ac2kbMap = {},{}
+            toCommit.append({'uniprot_ac':uniprotAc,'uniprot_entry':uniprotKbEntry,
+                             'refseq':refseq,'taxa_id':db_taxa_id,'gene_id':db_gene_id})
 
+            totalRecords += 1
+            if totalRecords in wayPoints:
+                print("\t%s / %s"%(totalRecords,lineCount))
 
-            ac2kbMap[uniprotKbAc] = uniprotKbEntry
-            toAdd[uniprotKbEntry] = {'ncbi-taxa-id':None,
-                                     'gene-id':None,
-                                     'uniprot-ac':set([]),
-                                     'refseq':set([])}
-        
-        ## populate uniprot dictionary
-        toAdd[uniprotKbEntry]['uniprot-ac'].update([uniprotKbAc])
+        loader.add_rows(toCommit)
 
-        if ncbiTaxaId:
-            toAdd[uniprotKbEntry]['ncbi-taxa-id'] = ncbiTaxaId
-        elif ncbiId:
-            toAdd[uniprotKbEntry]['gene-id'] = ncbiId
-        elif refseq:
-            toAdd[uniprotKbEntry]['refseq'].update([refseq])
-
-    ## queue any remaining
-    if len(toAdd.keys()) > 0:
-        queue_entries(toAdd,geneIdMap,taxonIdMap,engine)
+    loader.close()
+    write_file_stats(idmappingFile,taxaList,{'records':totalRecords})
 
     ## clean up
-    idmappingFid.close()
-    timeStr = "...total time taken: %s"%time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart))
+    timeStr = "...total time taken: %s (%s rows/sec)"%(time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart)),
+                                                      int(round(loader.get_rate())))
     addedStr = "...%s unique uniprot entries were added."%totalRecords
     return timeStr,addedStr
 
@@ -463,67 +456,58 @@ def populate_go_terms(engine):
     """
 
     timeStart = time.time()
-    ontologyFile = get_ontology_file()
-    fid = open(ontologyFile,'r')
-    termCount = 0
-    goId,goName,goNamespace,goDef = None,None,None,None
-    toAdd = {}
-    isObsolete = False
-
-    for linja in fid.readlines():
-        linja = linja[:-1]
-
-        ## find go id
-        if re.search("^id\:",linja):
-            goId = re.sub("^id\:|\s+","",linja)
-            goName,goNamespace,goDef,goAltId = None,None,None,None
-            isObsolete = False
-            termCount += 1
-            toAdd[goId] = {'go_id': goId,'aspect':None,'name':None,
-                           'alternate_id':None,'description':None}
-            continue
+    index = get_ontology_index(get_ontology_file())
+    altIds = {}
+    for altId,position in zip(index.altIds,index.altTerms.tolist()):
+        if position not in altIds:
+            altIds[position] = altId
 
-        ## find namespace and description  
-        if re.search("^name\:",linja):
-            goName = re.sub("^name\:\s+","",linja)
-        if re.search("^namespace\:",linja):
-            goNamespace = re.sub("^namespace\:\s+","",linja)
-        if re.search("^alt_id\:",linja):
-            goAltId = re.sub("^alt_id\:\s+","",linja)
-        if re.search("^def\:",linja):
-            goDef = re.sub("^def\:\s+","",linja)
-            if re.search("OBSOLETE\.",goDef):
-                isObsolete = True
-        
-        ## ignore obolete terms
-        if isObsolete == True:
-            goId = None
-
-        if goId != None:
-            if goNamespace != None and toAdd[goId]['aspect'] == None:
-                toAdd[goId]['aspect'] = goNamespace
-            if goDef != None and toAdd[goId]['description'] == None:
-                toAdd[goId]['description'] = goDef
-            if goName != None and toAdd[goId]['name'] == None:
-                toAdd[goId]['name'] = goName
-            if goAltId != None and toAdd[goId]['alternate_id'] == None:
-                toAdd[goId]['alternate_id'] = goAltId
+    toAdd = []
+    for position,goId in enumerate(index.goIds):
+        ## obsolete terms are kept without a description
+        toAdd.append({'go_id':goId,'aspect':int(index.namespaces[position]) or None,
+                      'name':index.names[position] or None,'alternate_id':altIds.get(position),
+                      'description':None if index.obsolete[position] else index.definitions[position] or None})
 
     print('committing changes...')
-    with engine.begin() as connection:
-        connection.execute(GoTerm.__table__.insert().
-                           values(toAdd.values()))
+    loader = BulkLoader(engine,GoTerm.__table__)
+    loader.add_rows(toAdd)
+    loader.close()
 
-    timeStr = "...total time taken: %s"%time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart))
-    addedStr = "...%s unique go term entries were added."%termCount
+    timeStr = "...total time taken: %s (%s rows/sec)"%(time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart)),
+                                                      int(round(loader.get_rate())))
+    addedStr = "...%s unique go term entries were added."%len(index)
     return timeStr,addedStr
 
-def populate_go_annotations(totalAnnotations,session,engine):
+def get_goterm_id_map(session):
+    """
+    map every go id, including alternate ids, to go_terms.id
+    the alternate ids are taken from the go_terms table and from the ontology file
     """
-    read the annotation file into a dictionary
+
+    termIdMap = goterm_mapper(session,myDict={})
+    altIdMap = {}
+
+    for goId,altId in session.query(GoTerm.go_id,GoTerm.alternate_id):
+        if altId and altId not in termIdMap:
+            altIdMap[altId] = termIdMap[goId]
+
+    for altId,goId in read_ontology_alt_ids().items():
+        if altId not in termIdMap and goId in termIdMap:
+            altIdMap[altId] = termIdMap[goId]
+
+    termIdMap.update(altIdMap)
+
+    return termIdMap
+
+def populate_go_annotations(totalAnnotations,session,engine,processes=None):
+    """
+    read the annotation file (see AnnotationLib.read_gaf_file) and the gene2go file
     This will take some time
     This function is intended for use with 
     http://www.geneontology.org/GO.format.gaf-2_0.shtml
+
+    processes - the number of processes used to parse an uncompressed annotation file
     """
 
     timeStart = time.time()
@@ -531,26 +515,32 @@ def populate_go_annotations(totalAnnotations,session,engine):
     taxaList = config.log['taxa']
     toAdd = []
     annotationFile = get_annotation_file()
-    annotationFid = open(annotationFile,'rU')
-    wayPoints = [round(int(w)) for w in np.linspace(0,totalAnnotations,20)]
+    wayPoints = get_waypoints(totalAnnotations)
     annotationCount = 0
 
     print("...loading mappers")
-    termIdMap = goterm_mapper(session)
+    termIdMap = get_goterm_id_map(session)
+    unresolvedIds = {}
     taxaIdMap = taxa_mapper(session)
     uniprotIdMap = uniprot_mapper(session)
+    loader = BulkLoader(engine,GoAnnotation.__table__)
+    refLoader = BulkLoader(engine,GoAnnotationRef.__table__,verbose=False)
     print("...populating rows")
 
+    def add_annotations(toAdd):
+        ## the annotation ids are assigned by the loader and then used by the references
+        loader.add_rows(toAdd)
+        loader.flush()
+        refLoader.add_rows([{'annotation_id':row['id'],'pubmed_refs':row['pubmed_refs']} \
+                            for row in toAdd if row['pubmed_refs']])
+
     def queue_entry(goId,evidenceCode,pubmedRefs,uniprotId,geneId,taxon,toAdd,mapper,ignoredAnnotations):
 
-        ## remove invalid term ids
-        if not goId in termIdMap:
-            queryTerm = session.query(GoTerm).filter_by(alternate_id=goId).first()
-            if queryTerm == None:
-                return
-            go_db_id = queryTerm.id
-        else:
-            go_db_id = termIdMap[goId]
+        ## remove invalid term ids (the map includes alternate ids)
+        if goId not in termIdMap:
+            unresolvedIds[goId] = unresolvedIds.get(goId,0) + 1
+            return
+        go_db_id = termIdMap[goId]
 
         ## remove invalid uniprot ids
         if uniprotId and uniprotId not in mapper:
@@ -576,76 +566,43 @@ def populate_go_annotations(totalAnnotations,session,engine):
         ## get the taxa foreign key
         taxon_db_id = taxaIdMap[taxon]
 
-        toAdd.append({'go_term_id':go_db_id,'evidence_code':evidenceCode,
+        toAdd.append({'go_term_id':go_db_id,'evidence_code':encode_evidence_code(evidenceCode),
                       'pubmed_refs':pubmedRefs,'uniprot_id':uniprot_db_id,
                       'gene_id':gene_db_id,'taxa_id':taxon_db_id})
 
     ## add annotations from uniprot annotation file
     ignoredAnnotationsUniprot = 0
     print("...getting annotations from gene_association (uniprot)")
-    for record in annotationFid:
-        record = record[:-1].split("\t")
-
-        ## check that it is a uniprot entry
-        if record[0][0] == "!":
-            continue
-        if record[0] != 'UniProtKB':
-            continue
-        
-        uniprotId = record[1]
-        dbObjectSymbol = record[2]
-        goId = record[4]
-        pubmedRefs = record[5]
-        evidenceCode = record[6]
-        aspect = record[8]
-        uniprotEntry = record[10]
-        goTermName = record[11]
-        taxon = re.sub("taxon:","",record[12])
-        date = record[13]
-        assignedBy = record[14]
-
-        if taxon not in taxaList:
-            continue
-
-        ## parse the uniprot Entry
-        if re.search("\|",uniprotEntry):
-            uniprotEntry = re.split("\|",uniprotEntry)[0]
-
-        ## ignore annotations with multiple species
-        if re.search("\|",taxon):
-            continue
+    for record in read_gaf_file(annotationFile,taxaList=taxaList,processes=processes):
 
         ## update progress
         annotationCount += 1
         if annotationCount in wayPoints:
             print("\t%s / %s"%(annotationCount,totalAnnotations))
 
-        queue_entry(goId,evidenceCode,pubmedRefs,uniprotEntry,None,taxon,toAdd,
+        queue_entry(record.goId,record.evidenceCode,record.references,record.uniprotEntry,None,record.taxon,toAdd,
                     uniprotIdMap,ignoredAnnotationsUniprot)
 
         if len(toAdd) >= 100000: # 100000
-            with engine.begin() as connection:
-                connection.execute(GoAnnotation.__table__.insert().
-                                   values(toAdd))
+            add_annotations(toAdd)
             toAdd = []
 
     print('committing final changes...')
     print('ignored annotations after uniprot... %s'%(ignoredAnnotationsUniprot))
-    with engine.begin() as connection:
-        connection.execute(GoAnnotation.__table__.insert().
-                           values(toAdd))
+    add_annotations(toAdd)
+    write_file_stats(annotationFile,taxaList,{'records':annotationCount})
 
     del uniprotIdMap
-    annotationFid.close()
     
     ## add annotations from gene2go
     gene2goFile = get_gene2go_file()
-    gene2goFid = open(gene2goFile,'rU')
+    gene2goFid = open_data_file(gene2goFile)
     ignoredAnnotationsGene = 0 
     print("...getting annotations from gene2go")
     header = gene2goFid.__next__()
     geneIdMap = gene_mapper(session)
     toAdd = []
+    gene2goRecords = 0
 
     for record in gene2goFid:
         record = record.rstrip("\n")
@@ -653,6 +610,7 @@ def populate_go_annotations(totalAnnotations,session,engine):
 
         if re.search("^\#",record[0]) or len(record) != 8:
             continue
+        gene2goRecords += 1
     
         taxon = record[0]
         ncbiId = record[1]
@@ -674,21 +632,79 @@ def populate_go_annotations(totalAnnotations,session,engine):
                     geneIdMap,ignoredAnnotationsGene)
 
         if len(toAdd) >= 100000: #100000
-            with engine.begin() as connection:
-                connection.execute(GoAnnotation.__table__.insert().
-                                   values(toAdd))
+            add_annotations(toAdd)
             toAdd = []
+    gene2goFid.close()
+    write_file_stats(gene2goFile,taxaList,{'records':gene2goRecords})
 
     print('ignored annotations after gene2go... %s'%(ignoredAnnotationsGene))
+    print('annotations with unresolved go ids... %s (%s unique ids)'%(sum(unresolvedIds.values()),len(unresolvedIds)))
     print('committing final changes...')
-    
+    add_annotations(toAdd)
+    loader.close()
+    refLoader.close()
+
+    timeStr = "...total time taken: %s (%s rows/sec)"%(time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart)),
+                                                      int(round(loader.get_rate())))
+    addedStr = "...%s unique go annotation entries were added (%s records read)."%(loader.totalRows,annotationCount)
+    return timeStr,addedStr,(ignoredAnnotationsUniprot,ignoredAnnotationsGene)
+
+def get_gene_terms_query(evidenceCodes):
+    """
+    return the (taxa_ncbi_id,aspect,ncbi_id,go_id) rows of the annotations with the given evidence codes
+    annotations of a uniprot entry are given to its gene when both are in the same taxa
+    """
+
+    annotations = GoAnnotation.__table__
+    columns = [Taxon.ncbi_id.label('taxa_ncbi_id'),GoTerm.aspect.label('aspect'),
+               Gene.ncbi_id.label('ncbi_id'),GoTerm.go_id.label('go_id')]
+    evidenceValues = encode_evidence_codes(evidenceCodes)
+    annotated = annotations.join(GoTerm.__table__,annotations.c.go_term_id==GoTerm.id).\
+                join(Taxon.__table__,annotations.c.taxa_id==Taxon.id)
+
+    geneTerms = select(columns).\
+                select_from(annotated.join(Gene.__table__,annotations.c.gene_id==Gene.id)).\
+                where(annotations.c.evidence_code.in_(evidenceValues))
+    uniprotTerms = select(columns).\
+                   select_from(annotated.join(Uniprot.__table__,annotations.c.uniprot_id==Uniprot.id).\
+                               join(Gene.__table__,(Uniprot.gene_id==Gene.id) & \
+                                    (Gene.taxa_id==annotations.c.taxa_id))).\
+                   where(annotations.c.evidence_code.in_(evidenceValues))
+
+    return union_all(geneTerms,uniprotTerms).alias('gene_terms')
+
+def populate_taxa_gene_terms(engine):
+    """
+    (re)build the taxa_gene_terms table from the go annotations
+    the table should be rebuilt whenever the annotations are changed
+    """
+
+    timeStart = time.time()
+    table = TaxaGeneTerm.__table__
+    table.drop(engine,checkfirst=True)
+    table.create(engine)
+
+    ## the terms of each gene are aggregated into a single row
+    if engine.dialect.name == 'postgresql':
+        aggregate = func.array_agg
+    else:
+        aggregate = func.group_concat
+
+    curatedCodes = get_evidence_codes(useIea=False)
+    nonCuratedCodes = [code for code in get_evidence_codes(useIea=True) if code not in curatedCodes]
     with engine.begin() as connection:
-        connection.execute(GoAnnotation.__table__.insert().
-                           values(toAdd))
+        for evidenceClass,evidenceCodes in [(CURATED,curatedCodes),(NON_CURATED,nonCuratedCodes)]:
+            geneTerms = get_gene_terms_query(evidenceCodes)
+            s = select([geneTerms.c.taxa_ncbi_id,geneTerms.c.aspect,literal(evidenceClass),
+                        geneTerms.c.ncbi_id,aggregate(distinct(geneTerms.c.go_id))]).\
+                group_by(geneTerms.c.taxa_ncbi_id,geneTerms.c.aspect,geneTerms.c.ncbi_id)
+            connection.execute(table.insert().from_select(['taxa_ncbi_id','aspect','evidence_class',
+                                                           'ncbi_id','go_ids'],s))
+        rowCount = connection.execute(select([func.count()]).select_from(table)).scalar()
 
     timeStr = "...total time taken: %s"%time.strftime('%H:%M:%S', time.gmtime(time.time()-timeStart))
-    addedStr = "...%s unique go annotation entries were added."%annotationCount
-    return timeStr,addedStr,(ignoredAnnotationsUniprot,ignoredAnnotationsGene)
+    addedStr = "...%s taxa gene term entries were added."%rowCount
+    return timeStr,addedStr
 
 def print_db_summary():
     """
@@ -701,7 +717,7 @@ def print_db_summary():
     session,engine = db_connect(verbose=False)
     printstr += "\nDATABASE - %s - SUMMARY"%config.log['dbname'] + "\n"
     print("\nDATABASE - %s - SUMMARY"%config.log['dbname'])
-    for table in [Taxon,Gene,Uniprot,GoTerm,GoAnnotation]:
+    for table in [Taxon,Gene,Uniprot,GoTerm,GoAnnotation,GoAnnotationRef,TaxaGeneTerm]:
         print("There are %s entries in the %s table"%(session.query(table).count(),table.__tablename__))
         printstr += "There are %s entries in the %s table"%(session.query(table).count(),table.__tablename__) + "\n"
 
@@ -714,13 +730,16 @@ def get_idmapping_file():
     return the file path 
     """
 
-    config = Configure()
-    dataDir = config.log['data']
-    idmappingFile = os.path.join(dataDir,'idmapping.dat.db')
-    if os.path.exists(idmappingFile) == False:
-        raise Exception("Could not find 'idmapping.dat.db' -- did you run FetchDbData.py?")
+    return find_data_file('idmapping.dat')
+
+def get_gene_info_file():
+    """
+    check for presence of the gene info file
+    raise exception when not found
+    return the file path
+    """
 
-    return idmappingFile
+    return find_data_file('gene_info')
 
 def print_go_summary(outfile=os.path.join(".","go_summary.csv")):
     """
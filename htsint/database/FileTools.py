@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+Functions to find and read the downloaded data files
+
+The files may be read directly from the downloaded .gz files, the
+decompressed .db copies made by DatabaseFetch are optional.  When pigz is
+available the files are decompressed with several threads in a separate
+process, otherwise the gzip module is used with large buffered reads.
+
+Statistics about a file (i.e. the number of records for the configured taxa)
+are counted by the pass that loads the file into the database and kept in a
+sidecar file (file.stats.json) for the next build (i.e. to report progress).
+"""
+
+### make imports
+import os,io,gzip,json,shutil,hashlib,subprocess
+from htsint import Configure
+
+## the size of the read buffer in bytes
+BUFFER_SIZE = 16777216
+
+def find_data_file(fileName,dataDir=None):
+    """
+    return the path of a data file (i.e. 'gene2go') in the data directory
+    the decompressed copy (fileName.db) is used when present otherwise the download (fileName.gz)
+    """
+
+    if dataDir is None:
+        dataDir = Configure().log['data']
+
+    for filePath in [fileName+".db",fileName+".gz",fileName]:
+        filePath = os.path.join(dataDir,filePath)
+        if os.path.exists(filePath) == True:
+            return filePath
+
+    raise Exception("Could not find '%s' -- did you run FetchDbData.py?"%(fileName))
+
+class PipedFile(object):
+    """
+    a read-only text file whose contents are the output of a decompression process
+    """
+
+    def __init__(self,cmd,bufferSize=BUFFER_SIZE):
+        """
+        Constructor
+
+        cmd - the command as a list (i.e. ['pigz','-dc','file.gz'])
+        """
+
+        self.process = subprocess.Popen(cmd,stdout=subprocess.PIPE,bufsize=bufferSize)
+        self.fid = io.TextIOWrapper(self.process.stdout)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.fid)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def readline(self):
+        return self.fid.readline()
+
+    def read(self,size=-1):
+        return self.fid.read(size)
+
+    def close(self):
+        """
+        close the pipe and stop the process (it may not have reached the end of the file)
+        """
+
+        if self.fid.closed == False:
+            self.fid.close()
+        if self.process.poll() is None:
+            self.process.terminate()
+        self.process.wait()
+
+def open_data_file(filePath,threads=4,bufferSize=BUFFER_SIZE):
+    """
+    open a data file for reading as text, .gz files are decompressed as they are read
+
+    threads    - the number of pigz threads (pigz is used when it is found on the path)
+    bufferSize - the size of the read buffer in bytes
+    """
+
+    if filePath.endswith(".gz") == False:
+        return io.open(filePath,'r',buffering=bufferSize)
+
+    pigz = shutil.which('pigz')
+    if pigz is not None and threads > 1:
+        return PipedFile([pigz,'-dc','-p',str(threads),filePath],bufferSize=bufferSize)
+
+    return io.TextIOWrapper(io.BufferedReader(gzip.open(filePath,'rb'),buffer_size=bufferSize))
+
+def get_line_shards(filePath,shards):
+    """
+    return (start,end) byte ranges of the file that begin at the start of a line
+    a compressed file is a single shard (0,None)
+    """
+
+    if filePath.endswith(".gz") or shards < 2:
+        return [(0,None)]
+
+    fileSize = os.path.getsize(filePath)
+    offsets = [0]
+    fid = open(filePath,'rb')
+    for i in range(1,shards):
+        fid.seek(max(int(fileSize * i / shards),offsets[-1]))
+        fid.readline()
+        boundary = fid.tell()
+        if offsets[-1] < boundary < fileSize:
+            offsets.append(boundary)
+    fid.close()
+    offsets.append(fileSize)
+
+    return list(zip(offsets[:-1],offsets[1:]))
+
+def read_file_shard(filePath,start,end):
+    """
+    yield the lines of a shard (see get_line_shards), end=None reads the whole file
+    """
+
+    if end is None:
+        fid = open_data_file(filePath)
+        for line in fid:
+            yield line
+        fid.close()
+        return
+
+    fid = open(filePath,'rb')
+    fid.seek(start)
+    position = start
+    for line in fid:
+        position += len(line)
+        yield line.decode('utf-8')
+        if position >= end:
+            break
+    fid.close()
+
+def get_file_signature(filePath,sampleSize=1048576):
+    """
+    return the size, modification time and the checksum of the first and last sampleSize bytes
+    """
+
+    fileSize = os.path.getsize(filePath)
+    md5 = hashlib.md5()
+    fid = open(filePath,'rb')
+    md5.update(fid.read(sampleSize))
+    if fileSize > sampleSize:
+        fid.seek(max(sampleSize,fileSize-sampleSize))
+        md5.update(fid.read(sampleSize))
+    fid.close()
+
+    return {'size':fileSize,'mtime':int(os.path.getmtime(filePath)),'checksum':md5.hexdigest()}
+
+def get_stats_file(filePath):
+    """
+    return the path of the sidecar statistics file
+    """
+
+    return filePath + ".stats.json"
+
+def read_file_stats(filePath,taxaList):
+    """
+    return the cached statistics of a file (None if the file or the taxa have changed)
+    """
+
+    statsFile = get_stats_file(filePath)
+    if os.path.exists(statsFile) == False:
+        return None
+
+    try:
+        fid = open(statsFile,'r')
+        stats = json.load(fid)
+        fid.close()
+    except ValueError:
+        return None
+
+    if stats.get('signature') != get_file_signature(filePath) or \
+       stats.get('taxa') != sorted([str(taxon) for taxon in taxaList]):
+        return None
+
+    return stats['counts']
+
+def write_file_stats(filePath,taxaList,counts):
+    """
+    save the statistics of a file (the sidecar is written next to the file)
+    """
+
+    stats = {'version':1,'signature':get_file_signature(filePath),
+             'taxa':sorted([str(taxon) for taxon in taxaList]),'counts':counts}
+    try:
+        fid = open(get_stats_file(filePath),'w')
+        json.dump(stats,fid,indent=1)
+        fid.close()
+    except IOError:
+        print("WARNING: could not write the statistics file for %s"%filePath)
+
+def get_file_stats(filePath,taxaList,key='records'):
+    """
+    return a single cached count of a file (None when the file has not been counted)
+    """
+
+    counts = read_file_stats(filePath,taxaList)
+    if counts is None:
+        return None
+
+    return counts.get(key)
@@ -4,9 +4,18 @@ library of functions for use with the GeneOntology class
 """
 
 import os,sys,re,time
+import numpy as np
 from sqlalchemy.sql import select
 from htsint import Configure
-from .DatabaseTables import Taxon,Uniprot,Gene,GoTerm,GoAnnotation
+from .DatabaseTables import Taxon,Uniprot,Gene,GoTerm,GoAnnotation,TaxaGeneTerm,CURATED
+from .DatabaseTables import encode_evidence_codes,encode_aspect
+from .FileTools import find_data_file,get_file_stats
+from .OntologyIndex import get_ontology_index
+
+try:
+    from sys import intern
+except ImportError:
+    pass
 
 def remove_empty(lst):
     if None in lst:
@@ -33,64 +42,29 @@ def read_ontology_file():
     store all the relationships in a dictionary
     """
 
-    ontologyFile = get_ontology_file()
-    fid = open(ontologyFile,'r')
-    termCount = 0
-    goId = None
+    index = get_ontology_index(get_ontology_file())
     goDict = {"cellular_component":{},
               "molecular_function":{},
               "biological_process":{}}
 
-    def add_term(goNamespace,source,sink):
-        if len(sink) != 1 or source == sink[0]:
-            return
-        if not re.search("GO\:",source) or not re.search("GO\:",sink[0]):
-            raise Exception("Invalid go id in ontology file: %s, %s"%(source,sink[0]))
-
+    for source,sink in index.get_edges('is_a'):
+        goNamespace = index.get_namespace(index.positions[source])
+        if goNamespace is None:
+            continue
         if source not in goDict[goNamespace]:
             goDict[goNamespace][source] = set([])
-        goDict[goNamespace][source].update(sink)
-
-    for linja in fid.readlines():
-        linja = linja[:-1]
-
-        ## find go id
-        if re.search("^id\:",linja):
-            goId = re.sub("^id\:|\s+","",linja)
-            goName,goNamespace = None,None
-            is_a,part_of = None,None
-            isObsolete = False
-            termCount += 1
-            continue 
-
-        ## find a few go id attributes
-        if re.search("^name\:",linja):
-            goName = re.sub("^name\:\s+","",linja)
-        if re.search("^namespace\:",linja):
-            goNamespace = re.sub("^namespace\:\s+","",linja)
-        if re.search("^def\:",linja):
-            goDef = re.sub("^def\:\s+","",linja)
-            if re.search("OBSOLETE\.",goDef):
-                isObsolete = True
-
-        ## ignore obolete terms
-        if goId == None or isObsolete == True:
-            continue
+        goDict[goNamespace][source].add(sink)
 
-        ## add term relationships (is_a)
-        if re.search("^is\_a\:",linja):
-            is_a = re.sub("^is\_a\:\s+","",linja)
-            is_a_sink = re.findall("GO\:\d+",is_a)
-            add_term(goNamespace,goId,is_a_sink)
-
-        ## other term relationships
-        #if re.search("^relationship\:",linja):
-        #    part_of_sink = re.findall("GO\:\d+",linja)
-        #    add_term(goNamespace,goId,part_of_sink)
-    fid.close()
-        
     return goDict
 
+def read_ontology_alt_ids():
+    """
+    read the ontology file to map each alternate id (alt_id) to its primary go id
+    alternate ids of obsolete terms are not included
+    """
+
+    return get_ontology_index(get_ontology_file()).get_alt_ids()
+
 def get_annotation_file():
     """
     check for presence of the annotation file
@@ -98,53 +72,24 @@ def get_annotation_file():
     return the file path
     """
 
-    fileName = 'gene_association.goa_uniprot.db'
-    config = Configure()
-    dataDir = config.log['data']
-    annotationFile = os.path.join(dataDir,fileName)
-    if os.path.exists(annotationFile) == False:
-        raise Exception("Could not find '%s' -- did you run FetchDbData.py?"%(fileName))
-
-    return annotationFile
+    return find_data_file('gene_association.goa_uniprot')
 
 def get_total_annotations():
     """
-    get the number of annotations in the uniprot file
-    this does not include the gene2go file
+    get the number of annotations in the uniprot file (for the taxa) and the gene2go file
+    the counts are written by populate_go_annotations (see FileTools.get_file_stats)
+    returns None when the files have not been counted
     """
 
     config = Configure()
     taxaList = config.log['taxa']
 
-    annotationFile = get_annotation_file()
-    annotationFid = open(annotationFile,'rU')
-    annotsCount = 0
-    annotatedIds = {}
-    totalAnnotations = 0
+    annotationCount = get_file_stats(get_annotation_file(),taxaList)
+    gene2goCount = get_file_stats(get_gene2go_file(),taxaList)
+    if annotationCount is None or gene2goCount is None:
+        return None
 
-    for record in annotationFid:
-        record = record[:-1].split("\t")
-        if record[0][0] == "!":
-            continue
-        if record[0] != 'UniProtKB':
-            continue
-
-        taxon = re.sub("taxon:","",record[12])
-        if taxon == "" or re.search("\|",taxon):
-            continue
-        if taxon not in taxaList:
-            continue
-
-        totalAnnotations += 1
-
-    gene2goFile = get_gene2go_file()
-    gene2goFid = open(gene2goFile,'rU')
-    header = gene2goFid.__next__()
-
-    for record in gene2goFid:
-        totalAnnotations += 1
-
-    return totalAnnotations
+    return annotationCount + gene2goCount
 
 def get_gene2go_file():
     """
@@ -153,13 +98,7 @@ def get_gene2go_file():
     return the file path
     """
 
-    config = Configure()
-    dataDir = config.log['data']
-    annotationFile = os.path.join(dataDir,'gene2go.db')
-    if os.path.exists(annotationFile) == False:
-        raise Exception("Could not find 'gene2go' -- did you run FetchDbData.py?")
-
-    return annotationFile
+    return find_data_file('gene2go')
 
 def get_evidence_codes(useIea=False):
     """
@@ -188,8 +127,8 @@ def get_annotated_genes(session,taxonId,useIea=False,aspect='biological_process'
     acceptedCodes = get_evidence_codes(useIea=useIea)
     annotations = session.query(GoAnnotation).join(GoTerm).\
                   filter(GoAnnotation.taxa_id==taxaQuery.id).\
-                  filter(GoAnnotation.evidence_code.in_(acceptedCodes)).\
-                  filter(GoTerm.aspect==aspect).all()
+                  filter(GoAnnotation.evidence_code.in_(encode_evidence_codes(acceptedCodes))).\
+                  filter(GoTerm.aspect==encode_aspect(aspect)).all()
 
     annotatedGenes = list(set([a.gene_id for a in annotations]))
     annotatedProts = list(set([a.uniprot_id for a in annotations]))
@@ -223,8 +162,43 @@ def get_annotated_genes(session,taxonId,useIea=False,aspect='biological_process'
 
     return [session.query(Gene).filter_by(id=gid).first().ncbi_id for gid in annotatedGenes]
 
+def get_chunks(items,chunkSize):
+    """
+    split a list into chunks (i.e. to keep IN lists to a reasonable size)
+    """
+
+    return [items[i:i+chunkSize] for i in range(0,len(items),chunkSize)]
+
+def get_term_pairs_query(idColumn,ids,acceptedCodes,aspect):
+    """
+    return the query for the (id,go_id,name) annotations of a list of gene or uniprot db ids
+    """
+
+    return select([idColumn,GoTerm.go_id,GoTerm.name],GoAnnotation.go_term_id==GoTerm.id).\
+        where(idColumn.in_(ids)).\
+        where(GoAnnotation.evidence_code.in_(encode_evidence_codes(acceptedCodes))).\
+        where(GoTerm.aspect==encode_aspect(aspect))
+
+def fetch_term_pairs(conn,idColumn,ids,acceptedCodes,aspect,chunkSize=5000):
+    """
+    return a dict of id -> set([(go_id,name),...]) for the annotations of many ids
+
+    idColumn - GoAnnotation.gene_id or GoAnnotation.uniprot_id
+    ids      - database ids
+    """
+
+    results = {}
+    for chunk in get_chunks(ids,chunkSize):
+        s = get_term_pairs_query(idColumn,chunk,acceptedCodes,aspect)
+        for r in conn.execute(s):
+            if r[0] not in results:
+                results[r[0]] = set([])
+            results[r[0]].add((str(r[1]),str(r[2])))
+
+    return results
+
 def fetch_annotations(identifiers,engine,aspect='biological_process',
-                      idType='uniprot',useIea=True,verbose=False):
+                      idType='uniprot',useIea=True,verbose=False,chunkSize=5000):
     """
     Fetch the go annotations for a given list of identifiers
 
@@ -238,6 +212,8 @@ def fetch_annotations(identifiers,engine,aspect='biological_process',
 
     aspect is 'biological_process', 'cellular_component' or 'molecular_function'
 
+    The identifiers are resolved with a few queries using IN lists of chunkSize ids
+
     """
 
     acceptedCodes = get_evidence_codes(useIea=useIea)
@@ -251,124 +227,121 @@ def fetch_annotations(identifiers,engine,aspect='biological_process',
         raise Exception("Takes a list of identifiers")
 
     annotations = {}
-    taxaList = set([])
     idType = idType.lower()
     if idType not in ['uniprot','ncbi']:
         raise Exception("Invalid idType argument in fetch annotations use 'uniprot' or 'ncbi'")
 
+    identifiers = list(set(identifiers))
+    if verbose:
+        print('fetching annotations')
+
     if idType == 'ncbi':
         if verbose:
-            print('fetching annotations')
             print('...translating gene queries')
-        s = select([Gene.id,Gene.ncbi_id]).where(Gene.ncbi_id.in_(identifiers))
-        _geneQueries = conn.execute(s)
-        geneQueries = _geneQueries.fetchall()
+
+        ## gene db id -> ncbi id
+        gene2ncbi = {}
+        for chunk in get_chunks(identifiers,chunkSize):
+            s = select([Gene.id,Gene.ncbi_id]).where(Gene.ncbi_id.in_(chunk))
+            for r in conn.execute(s):
+                gene2ncbi[r[0]] = str(r[1])
         if verbose:
-            print("...%s/%s gene queries present"%(len(geneQueries),len(list(set(identifiers)))))
-        
-        for gquery in geneQueries:
-            ncbiId = str(gquery['ncbi_id'])
+            print("...%s/%s gene queries present"%(len(gene2ncbi),len(identifiers)))
+
+        ## uniprot db id -> gene db id
+        uniprot2gene = {}
+        for chunk in get_chunks(list(gene2ncbi.keys()),chunkSize):
+            s = select([Uniprot.id,Uniprot.gene_id]).where(Uniprot.gene_id.in_(chunk))
+            for r in conn.execute(s):
+                uniprot2gene[r[0]] = r[1]
+
+        for ncbiId in gene2ncbi.values():
             annotations[ncbiId] = set([])
-            
-            ## add results from the gene id
-            s = select([GoTerm.go_id,GoTerm.name],GoAnnotation.go_term_id==GoTerm.id).\
-                where(GoAnnotation.gene_id == gquery['id']).\
-                where(GoAnnotation.evidence_code.in_(acceptedCodes)).\
-                where(GoTerm.aspect==aspect)
-
-            _results = conn.execute(s)
-            results = [tuple(map(str,r)) for r in _results.fetchall()]
-            
-            if len(results) > 1:
-                annotations[ncbiId].update(results)
-
-            ## check for corresponding uniprot ids
-            s = select([Uniprot.id,Uniprot.uniprot_ac,Uniprot.gene_id]).\
-                where(Uniprot.gene_id==gquery['id'])
-            _uniprotQueries = conn.execute(s)
-            uniprotQueries = _uniprotQueries.fetchall()
-       
-            if len(uniprotQueries) > 0:
-                for uquery in uniprotQueries:
-                    uniprotAc = str(uquery['uniprot_ac'])
-            
-                ## add results from the uniprot id
-                s = select([GoTerm.go_id,GoTerm.name],GoAnnotation.go_term_id==GoTerm.id).\
-                    where(GoAnnotation.uniprot_id == uquery['id']).\
-                    where(GoAnnotation.evidence_code.in_(acceptedCodes)).\
-                    where(GoTerm.aspect==aspect)
-              
-                _results = conn.execute(s)
-                results = [tuple(map(str,r)) for r in _results.fetchall()]
-            
-                if len(results) > 1:
-                    annotations[ncbiId].update(results)
-    
+
+        ## add results from the gene ids and their uniprot ids
+        geneTerms = fetch_term_pairs(conn,GoAnnotation.gene_id,list(gene2ncbi.keys()),acceptedCodes,aspect,chunkSize)
+        for geneId,results in geneTerms.items():
+            annotations[gene2ncbi[geneId]].update(results)
+
+        uniprotTerms = fetch_term_pairs(conn,GoAnnotation.uniprot_id,list(uniprot2gene.keys()),acceptedCodes,aspect,chunkSize)
+        for uniprotId,results in uniprotTerms.items():
+            annotations[gene2ncbi[uniprot2gene[uniprotId]]].update(results)
+
     elif idType == 'uniprot':
         if verbose:
-            print('fetching annotations')
             print('...translating uniprot queries')
-        s = select([Uniprot.id,Uniprot.uniprot_ac,Uniprot.gene_id]).where(Uniprot.uniprot_ac.in_(identifiers))
-        _uniprotQueries = conn.execute(s)
-        uniprotQueries = _uniprotQueries.fetchall()
+
+        ## uniprot db id -> (uniprot ac,gene db id)
+        uniprotQueries = {}
+        for chunk in get_chunks(identifiers,chunkSize):
+            s = select([Uniprot.id,Uniprot.uniprot_ac,Uniprot.gene_id]).where(Uniprot.uniprot_ac.in_(chunk))
+            for r in conn.execute(s):
+                uniprotQueries[r[0]] = (str(r[1]),r[2])
         if verbose:
-            print("...%s/%s uniprot queries present"%(len(uniprotQueries),len(list(set(identifiers)))))
+            print("...%s/%s uniprot queries present"%(len(uniprotQueries),len(identifiers)))
 
-        for uquery in uniprotQueries:
-            uniprotAc = str(uquery['uniprot_ac'])
+        for uniprotAc,geneId in uniprotQueries.values():
             annotations[uniprotAc] = set([])
-            
-            ## add results from the uniprot id
-            s = select([GoTerm.go_id,GoTerm.name],GoAnnotation.go_term_id==GoTerm.id).where(GoAnnotation.uniprot_id == uquery['id']).\
-                where(GoAnnotation.evidence_code.in_(acceptedCodes)).\
-                where(GoTerm.aspect==aspect)
-              
-            _results = conn.execute(s)
-            results = [tuple(map(str,r)) for r in _results.fetchall()]
-            
-            if len(results) > 1:
-                annotations[uniprotAc].update(results)
-
-            ## add results from the associated gene id
-            if uquery['gene_id']:
-                s = select([GoTerm.go_id,GoTerm.name],GoAnnotation.go_term_id==GoTerm.id).\
-                    where(GoAnnotation.gene_id == uquery['gene_id']).\
-                    where(GoAnnotation.evidence_code.in_(acceptedCodes)).\
-                    where(GoTerm.aspect==aspect)
-              
-                _results = conn.execute(s)
-                results = [tuple(map(str,r)) for r in _results.fetchall()]
-
-                if len(results) > 1:
-                    annotations[uniprotAc].update(results)
-        
+
+        ## add results from the uniprot ids and the associated gene ids
+        uniprotTerms = fetch_term_pairs(conn,GoAnnotation.uniprot_id,list(uniprotQueries.keys()),acceptedCodes,aspect,chunkSize)
+        geneIds = list(set([geneId for uniprotAc,geneId in uniprotQueries.values() if geneId]))
+        geneTerms = fetch_term_pairs(conn,GoAnnotation.gene_id,geneIds,acceptedCodes,aspect,chunkSize)
+        for uniprotId,(uniprotAc,geneId) in uniprotQueries.items():
+            annotations[uniprotAc].update(uniprotTerms.get(uniprotId,[]))
+            if geneId:
+                annotations[uniprotAc].update(geneTerms.get(geneId,[]))
+
+    conn.close()
+
     ## remove any null results
     for key,items in annotations.items():
-        while () in items:
-            items.remove(())
-
+        items.discard(())
         annotations[key] = list(items)
 
     return annotations
 
+def get_taxa_annotations_query(identifiers,acceptedCodes,aspect):
+    """
+    return the query for the (go_id,gene ncbi_id,uniprot_ac,uniprot gene ncbi_id) annotations of taxa
+    """
+
+    ## annotations joined to the gene and uniprot entries (and the gene of each uniprot entry)
+    annotations = GoAnnotation.__table__
+    uniprotGenes = Gene.__table__.alias('uniprot_genes')
+    joined = annotations.join(GoTerm.__table__,annotations.c.go_term_id==GoTerm.id).\
+             join(Taxon.__table__,annotations.c.taxa_id==Taxon.id).\
+             outerjoin(Gene.__table__,annotations.c.gene_id==Gene.id).\
+             outerjoin(Uniprot.__table__,annotations.c.uniprot_id==Uniprot.id).\
+             outerjoin(uniprotGenes,(Uniprot.gene_id==uniprotGenes.c.id) & \
+                       (uniprotGenes.c.taxa_id==annotations.c.taxa_id))
+
+    return select([GoTerm.go_id,Gene.ncbi_id,Uniprot.uniprot_ac,uniprotGenes.c.ncbi_id]).\
+        select_from(joined).\
+        where(Taxon.ncbi_id.in_(identifiers)).\
+        where(annotations.c.evidence_code.in_(encode_evidence_codes(acceptedCodes))).\
+        where(GoTerm.aspect==encode_aspect(aspect))
 
 def fetch_taxa_annotations(identifiers,engine,aspect='biological_process',
-                           useIea=True,verbose=False):
+                           useIea=True,verbose=False,asArrays=False):
     """
     Fetch the go annotations for a given list of taxa
 
-    If the identifier is 'uniprot'. Then combine the annotations from that uniportId 
-    and the associated geneId if persent.
-
-    If the identifier is 'geneid' the find all uniprot entries and combine all 
-    uniprot and geneId results.
+    The annotations of a uniprot entry are also given to its gene and the annotations
+    of a gene are also given to its uniprot entries (when both are in the same taxa).
 
     aspect is 'biological_process', 'cellular_component' or 'molecular_function'
 
+    All taxa are fetched with a single joined query that is streamed (server-side cursor)
+    the results are gene and uniprot dictionaries of go id lists or when asArrays is True
+
+        terms, (genes,geneInds,geneTermInds), (uniprots,uniprotInds,uniprotTermInds)
+
+    where each (Inds,TermInds) pair is an integer-coded annotation
+
     """
 
     acceptedCodes = get_evidence_codes(useIea=useIea)
-    conn = engine.connect()
 
     if aspect not in ['biological_process','cellular_component','molecular_function']:
         raise Exception("Invalid aspect specified")
@@ -377,96 +350,53 @@ def fetch_taxa_annotations(identifiers,engine,aspect='biological_process',
     if type(identifiers) != type([]):
         raise Exception("Takes a list of identifiers")
 
-    goTerms = {}
-    geneAnnotations = {}
-    uniprotAnnotations = {}
-    gene2uniprot,uniprot2gene = {},{}
-    taxaList = set([])
-
-    ## translate the ncbi taxa ids into db ids
     if verbose:
         print('fetching annotations')
-        print('...translating uniprot queries')
-    s = select([Taxon.id,Taxon.ncbi_id]).where(Taxon.ncbi_id.in_(identifiers))
-    _taxaQueries = conn.execute(s)
-    taxaQueries = _taxaQueries.fetchall()
+
+    s = get_taxa_annotations_query(identifiers,acceptedCodes,aspect)
+
+    ## build the maps incrementally from the streamed rows
+    geneTerms,uniprotTerms,uniprot2gene = {},{},{}
+    totalRows = 0
+    conn = engine.connect()
+    results = conn.execution_options(stream_results=True).execute(s)
+    while True:
+        rows = results.fetchmany(10000)
+        if not rows:
+            break
+        totalRows += len(rows)
+        for goId,geneNcbi,uniprotAc,uniprotGeneNcbi in rows:
+            goId = intern(str(goId))
+            if geneNcbi != None:
+                geneNcbi = str(geneNcbi)
+                if geneNcbi not in geneTerms:
+                    geneTerms[geneNcbi] = set([])
+                geneTerms[geneNcbi].add(goId)
+            if uniprotAc != None:
+                uniprotAc = str(uniprotAc)
+                if uniprotAc not in uniprotTerms:
+                    uniprotTerms[uniprotAc] = set([])
+                uniprotTerms[uniprotAc].add(goId)
+                if uniprotGeneNcbi != None:
+                    uniprot2gene[uniprotAc] = str(uniprotGeneNcbi)
+    results.close()
+    conn.close()
+
     if verbose:
-        print("...%s/%s taxa queries present"%(len(taxaQueries),len(list(set(identifiers)))))
-
-    for tquery in taxaQueries:
-        ## get all the annotations for the taxa
-        s = select([GoTerm.go_id,GoTerm.name,GoAnnotation.uniprot_id,GoAnnotation.gene_id],GoAnnotation.taxa_id==tquery['id']).\
-                    where(GoAnnotation.go_term_id == GoTerm.id).\
-                    where(GoAnnotation.evidence_code.in_(acceptedCodes)).\
-                    where(GoTerm.aspect==aspect)
-        _annotQueries = conn.execute(s)
-        annotQueries = _annotQueries.fetchall()
-    
-        ## get all the gene ids and uniprot ids
-        geneIds = []
-        uniprotIds = []
-        for aq in annotQueries:
-            if aq['gene_id']:
-                geneIds.append(aq['gene_id'])
-            if aq['uniprot_id']:
-                uniprotIds.append(aq['uniprot_id'])
-            goTerms[str(aq[0])] = str(aq[1])
-
-        ## get the gene to uniprot mappings
-        s = select([Gene.id,Gene.ncbi_id],Gene.taxa_id==tquery['id'])
-        _geneQueries = conn.execute(s)
-        gene2Id = dict([tuple(map(str,r)) for r in _geneQueries.fetchall()])
-        
-        uniprot2id = {}
-        if len(uniprotIds) > 0:
-            s = select([Uniprot.id,Uniprot.uniprot_ac,Uniprot.gene_id]).where(Uniprot.id.in_(uniprotIds))
-            _uniprotQueries = conn.execute(s)
-            uniprotQueries = _uniprotQueries.fetchall()
-            for uquery in uniprotQueries:
-                uniprotAc = str(uquery['uniprot_ac'])
-                uniprot2id[str(uquery['id'])] = uniprotAc
-                if uquery['gene_id']:
-                    if str(uquery['gene_id']) not in gene2uniprot:
-                        if str(uquery['gene_id']) in gene2Id:
-                            geneNcbi = gene2Id[str(uquery['gene_id'])] 
-                            gene2uniprot[geneNcbi] = []
-                        else:
-                            geneNcbi = None
-                    if geneNcbi:
-                        gene2uniprot[geneNcbi].append(str(uquery['uniprot_ac']))
-                        uniprot2gene[uniprotAc] = geneNcbi
-                    else:
-                        print("could not find", uquery['gene_id'], 'but we have', uniprotAc)
-
-        ## gene centric results
-        for aq in annotQueries:
-            result = [str(aq[0])]
-            if aq[3]:
-                geneNcbiId = gene2Id[str(aq[3])]
-                if geneNcbiId not in geneAnnotations:
-                    geneAnnotations[geneNcbiId] = set([])
-                geneAnnotations[geneNcbiId].update(result)
-            if aq[2]:
-                uniprotAc = uniprot2id[str(aq[2])]
-                if uniprotAc not in uniprotAnnotations:
-                    uniprotAnnotations[uniprotAc] = set([])
-                uniprotAnnotations[uniprotAc].update(result)
-                
-            ## check if we can map gene annotation to uniprot products
-            if aq[3]:
-                if geneNcbiId not in gene2uniprot and len(gene2uniprot[geneNcbiId]) > 0:
-                    for newUniprotAc in gene2uniprot[geneNcbiId]:
-                        if newUniprotAc not in uniprotAnnotations:
-                            uniprotAnnotations[newUniprotAc] = set([])
-                        uniprotAnnotations[newUniprotAc].update(result)
-            
-            ## check if we can map uniprot annotation to gene products
-            if aq[2]:
-                if uniprotAc in uniprot2gene:
-                    newGeneId = uniprot2gene[uniprotAc]
-                    if newGeneId not in geneAnnotations:
-                        geneAnnotations[newGeneId] = set([])
-                    geneAnnotations[newGeneId].update(result)
+        print("...%s annotations for %s genes and %s uniprot entries"%(totalRows,len(geneTerms),len(uniprotTerms)))
+
+    ## map annotations between genes and their uniprot entries
+    geneAnnotations = dict([(key,set(items)) for key,items in geneTerms.items()])
+    uniprotAnnotations = dict([(key,set(items)) for key,items in uniprotTerms.items()])
+    for uniprotAc,geneNcbi in uniprot2gene.items():
+        if geneNcbi not in geneAnnotations:
+            geneAnnotations[geneNcbi] = set([])
+        geneAnnotations[geneNcbi].update(uniprotTerms[uniprotAc])
+        if geneNcbi in geneTerms:
+            uniprotAnnotations[uniprotAc].update(geneTerms[geneNcbi])
+
+    if asArrays == True:
+        return annotations_to_arrays(geneAnnotations,uniprotAnnotations)
 
     ## prep the results
     for annotations in [geneAnnotations,uniprotAnnotations]:
@@ -475,46 +405,69 @@ def fetch_taxa_annotations(identifiers,engine,aspect='biological_process',
 
     return geneAnnotations,uniprotAnnotations
 
-def read_annotation_file():
+def fetch_taxa_gene_terms(identifiers,engine,aspect='biological_process',useIea=True,verbose=False):
     """
-    read the annotation file into a dictionary
-    This will take some time
-    This function is intended for use with database population
+    Fetch the go annotations of the genes in a list of taxa from the taxa_gene_terms table
+
+    The result is the same as the gene dictionary of fetch_taxa_annotations
+    returns None when the table has not been built (see populate_taxa_gene_terms)
 
-    http://www.geneontology.org/GO.format.gaf-2_0.shtml
     """
 
-    annotationFile = get_annotation_file()
-    annotationFid = open(annotationFile,'rU')
-    result = {}
+    if aspect not in ['biological_process','cellular_component','molecular_function']:
+        raise Exception("Invalid aspect specified")
 
-    for record in annotationFid:
-        record = record[:-1].split("\t")
+    ## error check
+    if type(identifiers) != type([]):
+        raise Exception("Takes a list of identifiers")
 
-        ## check that it is a uniprot entry
-        if record[0][0] == "!":
-            continue
-        
-        dbObjectId = record[1]
-        dbObjectSymbol = record[2]
-        goID = record[4]
-        dbReference = record[5]
-        evidenceCode = record[6]
-        aspect = record[8]
-        dbObjectType = record[11]
-        taxon = re.sub("taxon:","",record[12])
-        date = record[13]
-        assignedBy = record[14]
-
-        ## ignore annotations with multiple species
-        if re.search("\|",taxon):
-            continue
+    conn = engine.connect()
+    table = TaxaGeneTerm.__table__
+    if engine.dialect.has_table(conn,table.name) == False or \
+       conn.execute(select([table.c.ncbi_id]).limit(1)).first() is None:
+        conn.close()
+        return None
+
+    s = select([table.c.ncbi_id,table.c.go_ids]).\
+        where(table.c.taxa_ncbi_id.in_([int(taxon) for taxon in identifiers])).\
+        where(table.c.aspect==encode_aspect(aspect))
+    if useIea == False:
+        s = s.where(table.c.evidence_class==CURATED)
+
+    geneTerms = {}
+    for geneNcbi,goIds in conn.execute(s):
+        if isinstance(goIds,str):
+            goIds = goIds.split(",")
+        geneNcbi = str(geneNcbi)
+        if geneNcbi not in geneTerms:
+            geneTerms[geneNcbi] = set([])
+        geneTerms[geneNcbi].update([intern(str(goId)) for goId in goIds])
+    conn.close()
+
+    if verbose:
+        print("...%s annotated genes"%len(geneTerms))
 
-        if dbObjectId not in result:
-            result[dbObjectId] = {'names':set([]),'annots':{},'taxon':taxon}
+    return dict([(key,list(items)) for key,items in geneTerms.items()])
 
-        result[dbObjectId]['annots'][goID] = [aspect,evidenceCode]
-        result[dbObjectId]['names'].update([dbObjectSymbol])
+def annotations_to_arrays(*annotationDicts):
+    """
+    convert dictionaries of annotations (key -> go ids) into integer-coded arrays
+    returns the sorted terms followed by (keys,keyInds,termInds) for each dictionary
+    """
 
-    annotationFid.close()
-    return result
+    terms = set([])
+    for annotations in annotationDicts:
+        for items in annotations.values():
+            terms.update(items)
+    terms = np.array(sorted(terms))
+    termIndex = dict([(term,i) for i,term in enumerate(terms)])
+
+    results = [terms]
+    for annotations in annotationDicts:
+        keys = np.array(sorted(annotations.keys()))
+        sizes = [len(annotations[key]) for key in keys]
+        keyInds = np.repeat(np.arange(keys.size,dtype=np.int32),sizes)
+        termInds = np.array([termIndex[term] for key in keys for term in sorted(annotations[key])],dtype=np.int32)
+        results.append((keys,keyInds,termInds))
+
+    return tuple(results)
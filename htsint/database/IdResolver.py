@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Resolve identifiers (i.e. ncbi ids or uniprot entries) into database ids
+
+The filter is done by the database using chunked IN lists and the rows are
+returned as plain tuples.  Resolved ids are kept in bounded caches that are
+shared by every caller in the process (see get_id_resolver).
+"""
+
+### make imports
+from collections import OrderedDict
+from sqlalchemy.sql import select
+
+## one resolver per database
+_resolvers = {}
+
+def get_id_resolver(engine):
+    """
+    return the resolver shared by all callers that use this engine
+    """
+
+    key = str(engine.url)
+    if key not in _resolvers:
+        _resolvers[key] = IdResolver(engine)
+
+    return _resolvers[key]
+
+class IdResolver(object):
+    """
+    map a key column to one or more value columns with cached, chunked queries
+    """
+
+    def __init__(self,engine,cacheSize=500000,chunkSize=5000):
+        """
+        Constructor
+
+        engine    - sqlalchemy engine
+        cacheSize - the maximum number of keys cached for each mapping
+        chunkSize - the number of keys in each IN list
+        """
+
+        self.engine = engine
+        self.cacheSize = cacheSize
+        self.chunkSize = chunkSize
+        self.caches = {}
+
+    def _get_cache(self,name):
+        if name not in self.caches:
+            self.caches[name] = OrderedDict()
+        return self.caches[name]
+
+    def _add_to_cache(self,cache,key,value):
+        cache[key] = value
+        while len(cache) > self.cacheSize:
+            cache.popitem(last=False)
+
+    def clear(self):
+        """
+        empty the caches (i.e. after the tables are modified)
+        """
+
+        self.caches = {}
+
+    def resolve(self,keyColumn,keys=None,valueColumns=None):
+        """
+        return a dictionary of str(key) -> value
+
+        keyColumn    - the column to match (i.e. Gene.ncbi_id)
+        keys         - the keys to resolve (None returns the whole table and is not cached)
+        valueColumns - the columns returned (defaults to the table id)
+                       when there is more than one column the values are tuples
+
+        keys that are not in the database are not included in the result
+        """
+
+        if valueColumns is None:
+            valueColumns = [keyColumn.table.c.id]
+        single = len(valueColumns) == 1
+        columns = [keyColumn] + list(valueColumns)
+
+        def get_value(row):
+            return row[1] if single else tuple(row[1:])
+
+        result = {}
+        conn = self.engine.connect()
+
+        ## the whole table is streamed
+        if keys is None:
+            rows = conn.execution_options(stream_results=True).execute(select(columns))
+            for row in rows:
+                result[str(row[0])] = get_value(row)
+            rows.close()
+            conn.close()
+            return result
+
+        ## use the cache and query the remaining keys
+        cache = self._get_cache(tuple([str(c) for c in columns]))
+        missing = []
+        for key in set([str(k) for k in keys]):
+            if key in cache:
+                value = cache.pop(key)
+                cache[key] = value
+                result[key] = value
+            else:
+                missing.append(key)
+
+        for i in range(0,len(missing),self.chunkSize):
+            s = select(columns).where(keyColumn.in_(missing[i:i+self.chunkSize]))
+            for row in conn.execute(s):
+                key = str(row[0])
+                result[key] = get_value(row)
+                self._add_to_cache(cache,key,result[key])
+
+        conn.close()
+
+        return result
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+library of functions used to parse the UniProt idmapping file in parallel
+
+The idmapping.dat file has three tab separated columns (accession, id type, id)
+and all the lines of an accession are consecutive.  An uncompressed file is
+split into byte ranges (shards) that begin at an accession boundary and each
+shard is parsed by a separate process.  A compressed file is parsed as a
+single shard.
+"""
+
+### make imports
+import os,sys
+from multiprocessing import Pool,cpu_count
+from .FileTools import open_data_file,read_file_shard
+
+## the taxa used by each worker process
+_taxa = set([])
+
+def get_idmapping_shards(filePath,shards):
+    """
+    return (start,end) byte ranges of the file that begin at an accession boundary
+    a compressed file is a single shard (0,None)
+    """
+
+    if filePath.endswith(".gz") or shards < 2:
+        return [(0,None)]
+
+    fileSize = os.path.getsize(filePath)
+    offsets = [0]
+    fid = open(filePath,'rb')
+    for i in range(1,shards):
+        position = max(int(fileSize * i / shards),offsets[-1])
+        fid.seek(position)
+
+        ## skip the partial line then find the first line of the next accession
+        fid.readline()
+        line = fid.readline()
+        if not line:
+            break
+        accession = line.split(b"\t",1)[0]
+        while True:
+            boundary = fid.tell()
+            line = fid.readline()
+            if not line or line.split(b"\t",1)[0] != accession:
+                break
+
+        if offsets[-1] < boundary < fileSize:
+            offsets.append(boundary)
+    fid.close()
+    offsets.append(fileSize)
+
+    return list(zip(offsets[:-1],offsets[1:]))
+
+def read_idmapping_shard(filePath,start,end):
+    """
+    return the lines of a shard (see FileTools.read_file_shard)
+    """
+
+    return read_file_shard(filePath,start,end)
+
+def parse_idmapping_shard(filePath,start,end,taxa):
+    """
+    return the entries of a shard in file order as tuples of
+    (uniprot_ac,uniprot_entry,refseq,ncbi taxa id,ncbi gene id)
+
+    only accessions with a UniProtKB-ID and a taxon in taxa are kept
+    (i.e. isoforms like XXXX-2 do not have a UniProtKB-ID)
+    """
+
+    entries = []
+    current = [None,None,[],None,None]
+
+    def add_entry(accession,uniprotEntry,refseqs,taxon,geneId):
+        if accession is None or uniprotEntry is None or taxon not in taxa:
+            return
+        refseq = ";".join(refseqs) if len(refseqs) > 0 else None
+        entries.append((accession,uniprotEntry,refseq,taxon,geneId))
+
+    for line in read_idmapping_shard(filePath,start,end):
+        record = line.rstrip("\n").split("\t")
+        if len(record) != 3:
+            continue
+
+        if record[0] != current[0]:
+            add_entry(*current)
+            current = [record[0],None,[],None,None]
+
+        if record[1] == 'UniProtKB-ID':
+            current[1] = record[2]
+        elif record[1] == 'RefSeq':
+            if record[2] not in current[2]:
+                current[2].append(record[2])
+        elif record[1] == 'NCBI_TaxID':
+            current[3] = record[2]
+        elif record[1] == 'GeneID':
+            current[4] = record[2]
+
+    add_entry(*current)
+
+    return entries
+
+def mp_init(taxaList):
+    global _taxa
+
+    ## forked workers must not use the database connections of the parent process
+    databaseTools = sys.modules.get(__package__ + ".DatabaseTools")
+    if databaseTools is not None:
+        databaseTools.dispose_engines(close=False)
+
+    _taxa = set([str(taxon) for taxon in taxaList])
+
+def mp_worker(args):
+    filePath,start,end = args
+    return parse_idmapping_shard(filePath,start,end,_taxa)
+
+def parse_idmapping_file(filePath,taxaList,processes=None,shardsPerProcess=4):
+    """
+    parse the idmapping file with a pool of processes
+    yields the entries of each shard (see parse_idmapping_shard) in file order
+    """
+
+    if processes is None:
+        processes = cpu_count()
+
+    shards = get_idmapping_shards(filePath,processes * shardsPerProcess)
+    if len(shards) == 1 or processes < 2:
+        mp_init(taxaList)
+        for start,end in shards:
+            yield mp_worker((filePath,start,end))
+        return
+
+    po = Pool(processes=min(processes,len(shards)),initializer=mp_init,initargs=(taxaList,))
+    try:
+        for entries in po.imap(mp_worker,[(filePath,start,end) for start,end in shards]):
+            yield entries
+    finally:
+        po.terminate()
+        po.join()
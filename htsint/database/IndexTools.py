@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Post-load index and query plan tools
+
+The indexes declared with the tables are created after the tables are
+loaded, several at a time, and the tables are then analyzed so the planner
+has up to date statistics.  explain_queries returns the plans of the
+canonical library queries and can be used to check that none of them fall
+back to a sequential scan of the large tables.
+"""
+
+### make imports
+import sys,os,re,time
+from multiprocessing.pool import ThreadPool
+from sqlalchemy import text
+from .DatabaseTables import Gene,Uniprot,GoAnnotation
+from .GeneOntologyLib import get_term_pairs_query,get_taxa_annotations_query,get_evidence_codes
+
+## tables that should never be read with a sequential scan by the canonical queries
+LARGE_TABLES = ['go_annotations','genes','uniprot']
+
+def create_indexes(engine,metadata,jobs=4,verbose=False):
+    """
+    create the indexes declared in the metadata
+    each index is built with its own connection so jobs indexes are built at the same time
+    """
+
+    indexes = [index for table in metadata.sorted_tables for index in table.indexes]
+    if len(indexes) == 0:
+        return []
+
+    def create_index(index):
+        timeStart = time.time()
+        index.create(engine,checkfirst=True)
+        return index.name,time.time()-timeStart
+
+    ## sqlite allows a single writer
+    if engine.dialect.name != 'postgresql':
+        jobs = 1
+
+    p = ThreadPool(max(1,min(jobs,len(indexes))))
+    results = p.map(create_index,indexes)
+    p.close()
+    p.join()
+
+    if verbose == True:
+        for name,seconds in results:
+            print("...%s created (%s seconds)"%(name,round(seconds,1)))
+
+    return results
+
+def analyze_tables(engine,metadata):
+    """
+    update the planner statistics of each table
+    """
+
+    timeStart = time.time()
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            connection.execute(text("ANALYZE %s"%table.name))
+
+    return "...tables analyzed: %s"%time.strftime('%H:%M:%S',time.gmtime(time.time()-timeStart))
+
+def get_canonical_queries(taxa=['9606'],aspect='biological_process',useIea=True):
+    """
+    return a dictionary of name -> query for the queries used by the library
+    the id lists are placeholders, only the shape of the plans is of interest
+    """
+
+    acceptedCodes = get_evidence_codes(useIea=useIea)
+    queries = {}
+    queries['taxa_annotations'] = get_taxa_annotations_query(taxa,acceptedCodes,aspect)
+    queries['gene_terms'] = get_term_pairs_query(GoAnnotation.gene_id,[1,2,3],acceptedCodes,aspect)
+    queries['uniprot_terms'] = get_term_pairs_query(GoAnnotation.uniprot_id,[1,2,3],acceptedCodes,aspect)
+    queries['gene_ids'] = Gene.__table__.select().where(Gene.ncbi_id.in_(['1','2','3']))
+    queries['uniprot_entries'] = Uniprot.__table__.select().where(Uniprot.uniprot_entry.in_(['A','B','C']))
+    queries['uniprot_accessions'] = Uniprot.__table__.select().where(Uniprot.uniprot_ac.in_(['A','B','C']))
+    queries['uniprot_genes'] = Uniprot.__table__.select().where(Uniprot.gene_id.in_([1,2,3]))
+
+    return queries
+
+def get_sequential_scans(plan,tables=LARGE_TABLES):
+    """
+    return the tables in a plan that are read with a sequential scan
+    """
+
+    scans = []
+    for line in plan:
+        for table in tables:
+            ## postgresql: 'Seq Scan on genes'  sqlite: 'SCAN genes' (an index is used with SEARCH or SCAN ... USING)
+            if re.search(r"Seq Scan on %s\b"%table,line) or \
+               (re.search(r"^SCAN( TABLE)? %s\b"%table,line.strip()) and "USING" not in line):
+                if table not in scans:
+                    scans.append(table)
+
+    return scans
+
+def explain_queries(engine,queries=None,verbose=False):
+    """
+    return a dictionary of name -> (plan lines,tables read with a sequential scan)
+
+    queries - a dictionary of name -> query (defaults to get_canonical_queries)
+    """
+
+    if queries is None:
+        queries = get_canonical_queries()
+
+    if engine.dialect.name == 'postgresql':
+        explain = "EXPLAIN "
+    elif engine.dialect.name == 'sqlite':
+        explain = "EXPLAIN QUERY PLAN "
+    else:
+        raise Exception("Query plans are not available for %s"%engine.dialect.name)
+
+    results = {}
+    with engine.connect() as connection:
+        for name in sorted(queries.keys()):
+            sql = str(queries[name].compile(dialect=engine.dialect,compile_kwargs={"literal_binds":True}))
+            plan = [str(row[-1]) for row in connection.execute(text(explain + sql))]
+            results[name] = (plan,get_sequential_scans(plan))
+
+            if verbose == True:
+                print("%s\n\t%s"%(name,"\n\t".join(plan)))
+
+    return results
+
+def check_query_plans(engine,queries=None):
+    """
+    raise an exception if a canonical query reads one of the large tables sequentially
+    intended as a regression check after the schema or a query is changed
+    on a small (i.e. test) database the planner may rightly prefer a sequential scan
+    """
+
+    results = explain_queries(engine,queries=queries)
+    failed = ["%s (%s)"%(name,",".join(scans)) for name,(plan,scans) in sorted(results.items()) if len(scans) > 0]
+    if len(failed) > 0:
+        raise Exception("The following queries use sequential scans\n%s"%"\n".join(failed))
+
+    return results
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+A compact index of the gene ontology (go.obo)
+
+The obo file is read in a single pass that splits each line on the first
+colon (no regular expressions).  The terms are numbered in file order and the
+index holds their ids, namespaces, names, definitions, alternate ids,
+obsolete flags and is_a/part_of edges as numpy arrays.  The index is saved
+next to the obo file (go.obo.index.npz) and reused as long as the
+data-version header, the size and the modification time of the file are
+unchanged.
+"""
+
+### make imports
+import os
+import numpy as np
+from .DatabaseTables import ASPECTS,encode_aspect,decode_aspect
+
+## increment when the layout of the saved index changes
+INDEX_VERSION = 1
+
+## one index per obo file in each process
+_indexes = {}
+
+def _pack_strings(strings):
+    """
+    pack a list of strings into a utf-8 byte array and an array of offsets
+    """
+
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded)+1,dtype=np.int64)
+    offsets[1:] = np.cumsum([len(s) for s in encoded])
+    data = np.frombuffer(b"".join(encoded),dtype=np.uint8)
+
+    return data,offsets
+
+def _unpack_strings(data,offsets):
+    """
+    inverse of _pack_strings
+    """
+
+    blob = data.tobytes()
+    offsets = offsets.tolist()
+
+    return [blob[offsets[i]:offsets[i+1]].decode('utf-8') for i in range(len(offsets)-1)]
+
+def read_obo_header(filePath):
+    """
+    return the header of an obo file as a dictionary (i.e. 'data-version')
+    """
+
+    header = {}
+    fid = open(filePath,'r')
+    for line in fid:
+        if line.startswith("["):
+            break
+        tag,sep,value = line.partition(":")
+        if sep:
+            header[tag.strip()] = value.strip()
+    fid.close()
+
+    return header
+
+def get_index_key(filePath):
+    """
+    return the string that identifies a version of the obo file
+    """
+
+    dataVersion = read_obo_header(filePath).get('data-version','')
+
+    return "%s|%s|%s|%s"%(INDEX_VERSION,dataVersion,os.path.getsize(filePath),os.path.getmtime(filePath))
+
+def get_index_file(filePath):
+    """
+    return the path of the saved index
+    """
+
+    return filePath + ".index.npz"
+
+class OntologyIndex(object):
+    """
+    the terms of the gene ontology and the edges between them
+    terms are referred to by their position (i.e. isA[:,0] are the positions of the child terms)
+    """
+
+    def __init__(self,goIds,namespaces,names,definitions,obsolete,altIds,altTerms,isA,partOf,key=''):
+        """
+        Constructor
+
+        goIds       - list of go ids
+        namespaces  - int8 array of encoded aspects (0 when there is no namespace)
+        names       - list of term names
+        definitions - list of term definitions (the text after 'def: ')
+        obsolete    - bool array
+        altIds      - list of alternate ids
+        altTerms    - int32 array with the position of the term of each alternate id
+        isA         - int32 array of (child,parent) positions
+        partOf      - int32 array of (child,parent) positions
+        key         - the version of the obo file (see get_index_key)
+        """
+
+        self.goIds = goIds
+        self.namespaces = namespaces
+        self.names = names
+        self.definitions = definitions
+        self.obsolete = obsolete
+        self.altIds = altIds
+        self.altTerms = altTerms
+        self.isA = isA
+        self.partOf = partOf
+        self.key = key
+        self.positions = dict([(goId,i) for i,goId in enumerate(goIds)])
+
+    def __len__(self):
+        return len(self.goIds)
+
+    def get_namespace(self,position):
+        """
+        return the namespace of a term (i.e. 'biological_process') or None
+        """
+
+        return decode_aspect(int(self.namespaces[position]))
+
+    def get_edges(self,relation='is_a',includeObsolete=False):
+        """
+        return a list of (child,parent) go ids
+        relation - 'is_a' or 'part_of'
+        """
+
+        if relation == 'is_a':
+            edges = self.isA
+        elif relation == 'part_of':
+            edges = self.partOf
+        else:
+            raise Exception("Invalid relation specified %s"%relation)
+
+        if includeObsolete == False:
+            edges = edges[~self.obsolete[edges[:,0]]]
+
+        return [(self.goIds[child],self.goIds[parent]) for child,parent in edges.tolist()]
+
+    def get_alt_ids(self,includeObsolete=False):
+        """
+        return a dictionary of alternate id -> go id
+        """
+
+        altIds = {}
+        for altId,position in zip(self.altIds,self.altTerms.tolist()):
+            if includeObsolete == False and self.obsolete[position]:
+                continue
+            altIds[altId] = self.goIds[position]
+
+        return altIds
+
+    def save(self,filePath):
+        """
+        save the index as a numpy (.npz) file
+        """
+
+        arrays = {'key':np.array(self.key),'namespaces':self.namespaces,'obsolete':self.obsolete,
+                  'altTerms':self.altTerms,'isA':self.isA,'partOf':self.partOf}
+        for name in ['goIds','names','definitions','altIds']:
+            arrays[name+'Data'],arrays[name+'Offsets'] = _pack_strings(getattr(self,name))
+
+        tmpPath = filePath + ".tmp"
+        fid = open(tmpPath,'wb')
+        np.savez(fid,**arrays)
+        fid.close()
+        os.replace(tmpPath,filePath)
+
+    @classmethod
+    def load(cls,filePath):
+        """
+        load an index saved with save
+        """
+
+        arrays = np.load(filePath,allow_pickle=False)
+        strings = {}
+        for name in ['goIds','names','definitions','altIds']:
+            strings[name] = _unpack_strings(arrays[name+'Data'],arrays[name+'Offsets'])
+
+        index = cls(strings['goIds'],arrays['namespaces'],strings['names'],strings['definitions'],
+                    arrays['obsolete'],strings['altIds'],arrays['altTerms'],arrays['isA'],arrays['partOf'],
+                    key=str(arrays['key']))
+        arrays.close()
+
+        return index
+
+def parse_obo_file(filePath):
+    """
+    read an obo file in a single pass and return an OntologyIndex
+    only [Term] stanzas are indexed and edges to unknown terms are ignored
+    """
+
+    goIds,namespaces,names,definitions,obsolete = [],[],[],[],[]
+    altIds,altTerms = [],[]
+    isA,partOf = [],[]
+    inTerm = False
+
+    fid = open(filePath,'r')
+    for line in fid:
+        if line.startswith("["):
+            inTerm = line.startswith("[Term]")
+            continue
+        if inTerm == False:
+            continue
+
+        tag,sep,value = line.partition(":")
+        if not sep:
+            continue
+        value = value.strip()
+
+        if tag == 'id':
+            goIds.append(value)
+            namespaces.append(0)
+            names.append('')
+            definitions.append('')
+            obsolete.append(False)
+        elif len(goIds) == 0:
+            continue
+        elif tag == 'name':
+            names[-1] = value
+        elif tag == 'namespace':
+            if value in ASPECTS:
+                namespaces[-1] = encode_aspect(value)
+        elif tag == 'def':
+            definitions[-1] = value
+            if "OBSOLETE." in value:
+                obsolete[-1] = True
+        elif tag == 'is_obsolete':
+            if value == 'true':
+                obsolete[-1] = True
+        elif tag == 'alt_id':
+            altIds.append(value)
+            altTerms.append(len(goIds)-1)
+        elif tag == 'is_a':
+            isA.append((len(goIds)-1,value.split(" ",1)[0]))
+        elif tag == 'relationship':
+            tokens = value.split()
+            if len(tokens) > 1 and tokens[0] == 'part_of':
+                partOf.append((len(goIds)-1,tokens[1]))
+    fid.close()
+
+    positions = dict([(goId,i) for i,goId in enumerate(goIds)])
+
+    def get_edge_array(edges):
+        edges = [(child,positions[parent]) for child,parent in edges if parent in positions and goIds[child] != parent]
+        return np.array(edges,dtype=np.int32).reshape(-1,2)
+
+    return OntologyIndex(goIds,np.array(namespaces,dtype=np.int8),names,definitions,
+                         np.array(obsolete,dtype=bool),altIds,np.array(altTerms,dtype=np.int32),
+                         get_edge_array(isA),get_edge_array(partOf))
+
+def get_ontology_index(filePath,useCache=True):
+    """
+    return the OntologyIndex of an obo file
+    the saved index is used when the obo file is unchanged otherwise the file is parsed and the index saved
+    """
+
+    key = get_index_key(filePath)
+    if useCache == False:
+        index = parse_obo_file(filePath)
+        index.key = key
+        return index
+
+    if filePath in _indexes and _indexes[filePath].key == key:
+        return _indexes[filePath]
+
+    index = None
+    indexFile = get_index_file(filePath)
+    if os.path.exists(indexFile):
+        try:
+            index = OntologyIndex.load(indexFile)
+        except (IOError,ValueError,KeyError):
+            index = None
+        if index is not None and index.key != key:
+            index = None
+
+    if index is None:
+        index = parse_obo_file(filePath)
+        index.key = key
+        try:
+            index.save(indexFile)
+        except (IOError,OSError):
+            print("WARNING: could not save the ontology index for %s"%filePath)
+
+    _indexes[filePath] = index
+
+    return index
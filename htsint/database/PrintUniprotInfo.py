@@ -2,12 +2,12 @@
 
 import time,csv,re,sys,gc
 import numpy as np
-from htsint.database import get_idmapping_file,get_file_sizes
+from htsint.database import get_idmapping_file,get_file_sizes,open_data_file
 
 timeStart = time.time()
 totalRecords = 0
 idmappingFile = get_idmapping_file()
-idmappingFid = open(idmappingFile,'rb')
+idmappingFid = open_data_file(idmappingFile)
 reader = csv.reader(idmappingFid,delimiter="\t")
 
 print("...gathering data this may take a few minutes")
@@ -2,11 +2,21 @@
 ## database functions and classes
 from .GeneOntologyLib import read_ontology_file,get_annotation_file,get_ontology_file,get_gene2go_file
 from .GeneOntologyLib import get_total_annotations,get_evidence_codes,fetch_annotations,get_annotated_genes
-from .GeneOntologyLib import fetch_taxa_annotations
-from .DatabaseTables import Base,Taxon,Gene,Uniprot,GoTerm,GoAnnotation
+from .GeneOntologyLib import fetch_taxa_annotations,fetch_taxa_gene_terms,read_ontology_alt_ids
+from .GeneOntologyLib import get_taxa_annotations_query,get_term_pairs_query
+from .DatabaseTables import Base,Taxon,Gene,Uniprot,GoTerm,GoAnnotation,GoAnnotationRef,TaxaGeneTerm
+from .DatabaseTables import encode_evidence_code,encode_evidence_codes,decode_evidence_code,encode_aspect,decode_aspect
 from .DatabaseTables import taxa_mapper,gene_mapper,uniprot_mapper,goterm_mapper
-from .DatabaseTools import get_idmapping_file,get_file_sizes,print_db_summary
+from .BulkLoader import BulkLoader,create_tables,finalize_tables
+from .OntologyIndex import OntologyIndex,parse_obo_file,get_ontology_index
+from .AnnotationLib import GafRecord,read_gaf_file
+from .IdResolver import IdResolver,get_id_resolver
+from .IndexTools import create_indexes,analyze_tables,explain_queries,check_query_plans
+from .DatabaseTools import get_idmapping_file,get_gene_info_file,get_file_sizes,print_db_summary
+from .FileTools import find_data_file,open_data_file,get_file_stats,write_file_stats
 from .DatabaseTools import ask_upass,db_connect,print_go_summary,read_gene_info_file
+from .DatabaseTools import populate_taxa_gene_terms,get_db_file
+from .DatabaseTools import get_engine,dispose_engines,session_scope
 from .ConversionTools import convert_gene_ids
 from .DatabaseFetch import DatabaseFetch
 from .DatabaseCreate import DatabaseCreate
@@ -16,16 +16,25 @@ import numpy as np
 from htsint.stats import SpectralCluster
 
 
+## the clustering object shared by the worker processes (see mp_init)
+_worker = {}
+
+def mp_init(matrixPath,dtype):
+    """
+    memory-map the saved matrix once in each worker process
+    """
+
+    _worker['sc'] = SpectralCluster(np.load(matrixPath,mmap_mode='r'),dtype=dtype)
+
 def mp_worker(args):
     """
-    run spectral clustering
+    run spectral clustering for every k with a single sigma
     """
-    k,sigma,distancePath,dtype = args
-    
-    sc = SpectralCluster(distancePath,dtype=dtype)
-    sc.run(k,sk=None,sigma=sigma,verbose=True)
-    
-    return sc
+    sigma,kRange = args
+
+    results = _worker['sc'].run_sweep(kRange,sk=None,sigma=sigma,verbose=True)
+
+    return sigma,results
 
 class SpectralClusterParamSearch(object):
     """
@@ -36,6 +45,8 @@ class SpectralClusterParamSearch(object):
 
         i,j,[dist|similarity]
 
+    or a DistanceStore path (.dist) as produced by GeneDistances
+
     """
 
     def __init__(self,distancePath,dtype='distance',aspect='biological_process'):
@@ -57,18 +68,18 @@ class SpectralClusterParamSearch(object):
         self.aspect = aspect
         self.distancePath = distancePath
         sc = SpectralCluster(distancePath,dtype=dtype)
-        matrixPath = re.sub("\.csv","-matrix.npy",distancePath)
-        genesPath = re.sub("\.csv","-genes.npy",distancePath)
-        self.M = np.load(matrixPath)
+        matrixPath = re.sub("\.(csv|dist)$","-matrix.npy",distancePath)
+        genesPath = re.sub("\.(csv|dist)$","-genes.npy",distancePath)
+        self.M = np.load(matrixPath,mmap_mode='r')
         self.items = np.load(genesPath)
 
         ## output
-        self.resultsPath1 = re.sub("\.csv","-scparams-sv.csv",distancePath)
-        self.resultsPath2 = re.sub("\.csv","-scparams-cl.csv",distancePath)
+        self.resultsPath1 = re.sub("\.(csv|dist)$","-scparams-sv.csv",distancePath)
+        self.resultsPath2 = re.sub("\.(csv|dist)$","-scparams-cl.csv",distancePath)
       
     def run(self,kRange=None,sigmaRange=None,chunks=None):
         """
-        chunks - log(size(M)) (can be reduced if there are memory issues)
+        chunks - log(size(M)) the number of sigma values run at once (can be reduced if there are memory issues)
         kRange - the range of k to search
         sigmaRange - the range of sigma to search
         """
@@ -113,57 +124,49 @@ class SpectralClusterParamSearch(object):
             chunks = int(round((np.log(self.M.shape[0]))))
         print("chunks = %s"%chunks)
 
-        toRun = []
-        for k in kRange:
-            toRun += [(k,sigma,self.distancePath,self.dtype) for sigma in sigmaRange]
-
-        stopPoints = np.arange(0,len(toRun),chunks)
-        if stopPoints[-1] < len(toRun):
-            stopPoints = np.hstack([stopPoints[1:],np.array([len(toRun)])])
-
-        begin = 0
+        ## the eigenvectors are found once for each sigma and shared by every k
+        toRun = [(sigma,kRange) for sigma in sigmaRange]
 
         if chunks == 1:
             self._run_sc(toRun)
         else:
-            for i,chunk in enumerate(range(stopPoints.size)):
-                stop = stopPoints[chunk]
-                print('...running %s-%s/%s'%(begin,stop,len(toRun)))
-                self.run_sc(toRun,begin,stop)
-                begin = stop
+            self.run_sc(toRun,chunks)
 
         print("complete.")
         outFid1.close()
         outFid2.close()
 
     ## determin all clusters larger than a cutoff and cluster them again
-    def get_cluster_sizes(self,sc):
+    def get_cluster_sizes(self,labels):
         """
-        return cluster sizes from a SpectralClustering object that has results
+        return cluster sizes from spectral clustering labels
         """
 
         clusterSizes = []
-        clusters = sc.labels
-        for k in np.arange(clusters.max()):
-            clusterSizes.append(len(np.where(clusters==k)[0]))  
+        for k in np.arange(labels.max()):
+            clusterSizes.append(len(np.where(labels==k)[0]))  
         
         return clusterSizes
 
-    def run_sc(self,toRun,begin,stop):
+    def write_results(self,sigma,results):
+        """
+        write the silhouette values and cluster sizes for a single sigma
+        """
+
+        for k,avgSilValue,labels in results:
+            self.writer1.writerow([k,sigma] + [round(avgSilValue,4)])
+            self.writer2.writerow([k,sigma] + self.get_cluster_sizes(labels))
+
+    def run_sc(self,toRun,chunks):
         """
         use multiprocessing to run spectral clustering over a range of values
+        chunks limits the number of sigma values (and decompositions) held in memory at once
         """
 
-        po = Pool(processes=cpu_count()-1)
-        _results = po.map_async(mp_worker,toRun[begin:stop])
-        results =  _results.get()
-    
-        ## write the cluster sizes to file
-        for r,sc in enumerate(results):
-            k,sigma,dpath,dtype = toRun[begin:stop][r]
-            clusterSizes = self.get_cluster_sizes(sc)      
-            self.writer1.writerow([k,sigma] + [round(sc.avgSilValue,4)])
-            self.writer2.writerow([k,sigma] + clusterSizes)
+        matrixPath = re.sub("\.(csv|dist)$","-matrix.npy",self.distancePath)
+        po = Pool(processes=max(1,min(chunks,cpu_count()-1)),initializer=mp_init,initargs=(matrixPath,self.dtype))
+        for sigma,results in po.imap(mp_worker,toRun):
+            self.write_results(sigma,results)
 
         po.close()
         po.join()
@@ -173,10 +176,7 @@ class SpectralClusterParamSearch(object):
         run spectral clustering (single core)
         """
 
-        for params in toRun:
-            k,sigma,dpath,dtype = params
-            sc = SpectralCluster(self.distancePath,dtype=dtype)
-            sc.run(k,sk=None,sigma=sigma,verbose=True)
-            clusterSizes = self.get_cluster_sizes(sc)
-            self.writer1.writerow([k,sigma] + [round(sc.avgSilValue,4)])
-            self.writer2.writerow([k,sigma] + clusterSizes)
+        sc = SpectralCluster(self.M,dtype=self.dtype)
+        for sigma,kRange in toRun:
+            results = sc.run_sweep(kRange,sk=None,sigma=sigma,verbose=True)
+            self.write_results(sigma,results)
@@ -19,10 +19,16 @@ In Advances in Neural Information Processing Systems 17, 2004
 __author__ = "Adam Richards"
 
 import sys,os,re,csv
+from itertools import islice
 import numpy as np
 from scipy.spatial.distance import pdist,cdist,squareform
 from scipy.cluster.vq import kmeans2
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import eigsh,lobpcg
+from scipy.sparse.csgraph import connected_components
 from htsint.stats import get_silhouette_values
+from htsint.DistanceLib import condensed_to_square
+from htsint.DistanceStore import DistanceStore
 
 class SpectralCluster(object):
     """
@@ -46,43 +52,35 @@ class SpectralCluster(object):
         if dtype not in ['points','distance','similarity']:
             raise Exception("Invalid dtype %s"%dtype)
 
-        ## if M is a filepath with lines (i,j,[dist|sim]) then save/load
-        if type(M) == type('str') and os.path.exists(M) and re.search(".csv",M):
+        ## if M is a filepath with lines (i,j,[dist|sim]) or a DistanceStore then save/load
+        items = None
+        if type(M) == type('str') and os.path.exists(M) and re.search("\.(csv|dist)$",M):
             distancesPath = M
-            matrixPath = re.sub("\.csv","-matrix.npy",distancesPath)
-            genesPath = re.sub("\.csv","-genes.npy",distancesPath)
-            if not os.path.exists(matrixPath):
+            matrixPath = re.sub("\.(csv|dist)$","-matrix.npy",distancesPath)
+            genesPath = re.sub("\.(csv|dist)$","-genes.npy",distancesPath)
+            if not os.path.exists(matrixPath) and re.search("\.dist$",distancesPath):
                 print("...saving matrix in binary format for faster indexing")
-                fid = open(distancesPath,'r')
-                reader = csv.reader(fid)
-                header = reader.next()
-
-                items = set([])
-                for linja in reader:
-                    items.update(linja[:1])
-                fid.close()
-                items = np.sort(np.array(list(items)))
-
-                ## create the similarity matrix
-                M = np.zeros((items.size,items.size),)
-                fid = open(distancesPath,'r')
-                reader = csv.reader(fid)
-                header = reader.next()
-                for linja in reader:
-                    i = np.where(items == linja[0])
-                    j = np.where(items == linja[1])
-                    M[i,j] = float(linja[2])
-                    M[j,i] = float(linja[2])
-
-                fid.close()
+                store = DistanceStore(distancesPath)
+                items = np.array(store.get_items())
+                M = condensed_to_square(store.distances,store.n)
+
+                ## genes without a path are given the largest distance
+                finite = np.isfinite(M)
+                M[~finite] = M[finite].max() if finite.any() else 0.0
+                M = M.astype(float)
+                store.close()
                 np.save(genesPath,items)
                 np.save(matrixPath,M)
+            elif not os.path.exists(matrixPath):
+                print("...saving matrix in binary format for faster indexing")
+                M,items = self.csv_to_matrix(distancesPath,matrixPath)
+                np.save(genesPath,items)
             else:
                 M = np.load(matrixPath)
                 items = np.load(genesPath)
 
         ## error check
-        if type(M) != type(np.array([1,2,3])):
+        if not isinstance(M,np.ndarray):
             raise Exception("M must be a matrix or a valid file path to a matrix")
 
         if dtype == 'points':
@@ -95,15 +93,63 @@ class SpectralCluster(object):
             M = np.sqrt(M.max()-M)
 
         ## add eps to avoid divide by zero
-        M = M + np.spacing(1)
+        ## a memory-mapped distance matrix is shared (not copied) so eps is added as it is read
+        if isinstance(M,np.memmap):
+            self.eps = np.spacing(1)
+        else:
+            M = M + np.spacing(1)
+            self.eps = 0.0
 
         self.items = items
         self.M = M
 
-    def run(self,k,sk=None,sigma=None,verbose=False):
+    def csv_to_matrix(self,distancesPath,matrixPath,chunkSize=1000000):
+        """
+        read a csv file with lines (i,j,[dist|sim]) into a symmetric matrix
+        the matrix is written directly to a memory-mapped .npy file (matrixPath)
+
+        the file is read twice a chunk of lines at a time, first to find the items
+        then to fill the matrix, each chunk is parsed with np.loadtxt into typed arrays
+        and the items are located with a binary search of the sorted items
+        returns the matrix and the sorted items
+        """
+
+        def read_chunks():
+            fid = open(distancesPath,'r')
+            header = fid.readline()
+            while True:
+                lines = list(islice(fid,chunkSize))
+                if len(lines) == 0:
+                    break
+                ids = np.loadtxt(lines,dtype=str,delimiter=",",usecols=(0,1),ndmin=2)
+                values = np.loadtxt(lines,dtype=np.float64,delimiter=",",usecols=(2,),ndmin=1)
+                yield ids,values
+            fid.close()
+
+        ## first pass: find all items
+        items = np.array([],dtype=str)
+        for ids,values in read_chunks():
+            items = np.union1d(items,ids.ravel())
+
+        ## second pass: fill the matrix with fancy indexing
+        M = np.lib.format.open_memmap(matrixPath,mode='w+',dtype=np.float64,shape=(items.size,items.size))
+        for ids,values in read_chunks():
+            i = np.searchsorted(items,ids[:,0])
+            j = np.searchsorted(items,ids[:,1])
+            M[i,j] = values
+            M[j,i] = values
+        M.flush()
+
+        return M,items
+
+    def run(self,k,sk=None,sigma=None,verbose=False,sparse=False,knn=10):
         """
         run spectral clustering
         given a number of clusters (k) and bandwidth param (sigma) 
+
+        sparse - keep only the knn nearest neighbour affinities in a sparse matrix
+                 and find the top k eigenvectors with an iterative solver (ARPACK)
+        knn    - the number of neighbours kept for each item when sparse=True
         
         """
 
@@ -116,38 +162,48 @@ class SpectralCluster(object):
         self.k = k
         self.sigma = sigma
 
-        self.A = self.similarity_to_affinity(self.M,sk=sk,sigma=sigma)
-        
-        ## create the diagonal matrix D
-        if verbose == True:
-            print("\tcreating diagonal matrix...")
+        self.X = self.get_eigenvectors(k,sk=sk,sigma=sigma,verbose=verbose,sparse=sparse,knn=knn)
 
-        self.D = np.diag(self.A.sum(axis=1)**-0.5)
-        
-        ## create the L matrix
-        if verbose == True:
-            print("\tcreating laplacian matrix...")
+        return self.cluster_eigenvectors(verbose=verbose)
 
-        _L = np.dot(self.D,self.A)                      # multiply A and D^{-1/2}
-        self.L = np.dot(_L,self.D)                      # multiply the above result times D^{-1/2}
-     
-        # ensure L contains real, finite numbers
-        testNan = np.where(np.isnan(self.L) == True)
-        testFinite = np.where(np.isfinite(self.L) == False)
+    def run_sweep(self,kRange,sk=None,sigma=None,verbose=False,sparse=False,knn=10):
+        """
+        run spectral clustering for several k with a single bandwidth param (sigma)
 
-        if np.array([len(z) for z in testFinite]).sum() > 0:
-            print("WARNING: failed finite check")
-        elif np.array([len(z) for z in testNan]).sum() > 0:
-            print("WARNING: failed nan check")
+        the eigenvectors are found once for max(k) and each k uses the top k of them
+        returns a list of (k,avgSilValue,labels)
+        """
 
-        ## find the k largest eigenvectors of L
-        if verbose == True:
-            print("\tfinding eigenvalues and eigenvectors...")
+        kRange = sorted(set([int(round(k)) for k in kRange]))
+        self.sigma = sigma
+        eigVecs = self.get_eigenvectors(kRange[-1],sk=sk,sigma=sigma,verbose=verbose,sparse=sparse,knn=knn)
 
-        eigVals, eigVecs = np.linalg.eig(self.L)
-        eigVecs = -1.0 * eigVecs
-        sortedEigInds = np.argsort(np.sum(abs(eigVecs),0))
-        self.X = eigVecs[:,sortedEigInds[-k:]]
+        results = []
+        for k in kRange:
+            if verbose == True:
+                print("\tk=%s, sigma=%s"%(k,sigma))
+            self.k = k
+            self.X = eigVecs[:,-k:]
+            self.cluster_eigenvectors(verbose=verbose)
+            results.append((k,self.avgSilValue,self.labels))
+
+        return results
+
+    def get_eigenvectors(self,k,sk=None,sigma=None,verbose=False,sparse=False,knn=10):
+        """
+        return the k eigenvectors used for clustering (the last column is the top eigenvector)
+        the top j < k eigenvectors are the last j columns
+        """
+
+        if sparse == True:
+            return self._sparse_eigenvectors(k,sk,sigma,knn,verbose)
+
+        return self._dense_eigenvectors(k,sk,sigma,verbose)
+
+    def cluster_eigenvectors(self,verbose=False):
+        """
+        normalize the eigenvectors (X) and cluster the rows with kmeans
+        """
 
         ## compute normalized matrix Y from X
         if verbose == True:
@@ -178,13 +234,13 @@ class SpectralCluster(object):
                                                       minNumEvents=3,resultsType='raw')
             avgSilVal = silValues['0'].mean()
 
-            if kmeanResults == None or avgSilVal == -2.0:
+            if kmeanResults is None or avgSilVal == -2.0:
                 continue
 
             if avgSilVal > bestRepeat[2]:
                 bestRepeat = (kmeanResults,kmeanLabels,avgSilVal)
 
-        if bestRepeat[0] == None:
+        if bestRepeat[0] is None:
             raise Exception('Kmeans on Y matrix -- did not obtain results')
             return None
 
@@ -193,45 +249,181 @@ class SpectralCluster(object):
 
         return self.avgSilValue
         
-    def similarity_to_affinity(self,dMat,sk=7,sigma=None):
+    def _dense_eigenvectors(self,k,sk,sigma,verbose):
         """
-        transform a similarity matrix into an affinity matrix
-
+        find the k eigenvectors of the dense laplacian
         """
 
-        ## Ng et al. method
-        if sk == None:
-            if sigma == None:
-                raise Exception("If using Ng et al method must specify sigma")
+        self.A = self.similarity_to_affinity(self.M,sk=sk,sigma=sigma)
         
-            A = np.exp(-1.0 * (self.M**2.0)  /  2.0 * (sigma**2.0))
+        ## create the diagonal matrix D
+        if verbose == True:
+            print("\tcreating diagonal matrix...")
 
+        self.D = np.diag(self.A.sum(axis=1)**-0.5)
+        
+        ## create the L matrix
+        if verbose == True:
+            print("\tcreating laplacian matrix...")
+
+        _L = np.dot(self.D,self.A)                      # multiply A and D^{-1/2}
+        self.L = np.dot(_L,self.D)                      # multiply the above result times D^{-1/2}
+     
+        # ensure L contains real, finite numbers
+        testNan = np.where(np.isnan(self.L) == True)
+        testFinite = np.where(np.isfinite(self.L) == False)
+
+        if np.array([len(z) for z in testFinite]).sum() > 0:
+            print("WARNING: failed finite check")
+        elif np.array([len(z) for z in testNan]).sum() > 0:
+            print("WARNING: failed nan check")
 
-        ## using method proposed by Zelnik-Manor et al. method
+        ## find the k largest eigenvectors of L
+        if verbose == True:
+            print("\tfinding eigenvalues and eigenvectors...")
+
+        eigVals, eigVecs = np.linalg.eig(self.L)
+        eigVecs = -1.0 * eigVecs
+        sortedEigInds = np.argsort(np.sum(abs(eigVecs),0))
+
+        return eigVecs[:,sortedEigInds[-k:]]
+
+    def _sparse_eigenvectors(self,k,sk,sigma,knn,verbose):
+        """
+        find the k largest eigenvectors of the sparse knn laplacian
+        D^{-1/2} A D^{-1/2} is formed by scaling the rows and columns of A
+        """
+
+        self.A = self.similarity_to_sparse_affinity(self.M,sk=sk,sigma=sigma,knn=knn)
+
+        if verbose == True:
+            print("\tcreating laplacian matrix...")
+
+        degree = np.asarray(self.A.sum(axis=1)).ravel()
+        self.D = np.zeros(degree.size)
+        self.D[degree > 0] = degree[degree > 0]**-0.5
+        _L = self.A.tocoo()
+        self.L = csr_matrix((_L.data * self.D[_L.row] * self.D[_L.col],(_L.row,_L.col)),shape=_L.shape)
+
+        if np.isfinite(self.L.data).all() == False:
+            print("WARNING: failed finite check")
+
+        if verbose == True:
+            print("\tfinding eigenvalues and eigenvectors...")
+
+        ## ARPACK finds a single vector for a repeated eigenvalue and a knn graph with several
+        ## components repeats the eigenvalue 1 for each component so the block solver (LOBPCG) is used
+        n = self.L.shape[0]
+        if 5 * k >= n:
+            eigVals, eigVecs = np.linalg.eigh(self.L.toarray())
+        elif connected_components(self.A,directed=False,return_labels=False) == 1:
+            eigVals, eigVecs = eigsh(self.L,k=k,which='LA')
         else:
-            A = np.zeros(dMat.shape)
+            X0 = np.random.RandomState(0).normal(size=(n,k))
+            eigVals, eigVecs = lobpcg(self.L,X0,largest=True,tol=1e-8,maxiter=1000)
+        sortedEigInds = np.argsort(eigVals)
 
-            if dMat == None:
-                print("ERROR: distance matrix is None cannot find affinity")
-                return None
+        return eigVecs[:,sortedEigInds[-k:]]
 
-            ## get sigma k for each row
-            sigmaK = np.zeros(dMat.shape[0])
-            for i in range(dMat.shape[0]):
-                row = dMat[i,:]
-                sigmaK[i] = np.sort(row)[sk-1]
+    def similarity_to_affinity(self,dMat,sk=7,sigma=None,dtype=np.float64,blockSize=None,out=None):
+        """
+        transform a similarity matrix into an affinity matrix
 
-            ## there is prob a faster was of doing this
-            for i in range(dMat.shape[0]):
-                for j in range(dMat.shape[0]):
-                    A[i,j] = np.exp((-1.0 * (dMat[i,j]**2.0))  /  (sigmaK[i] * sigmaK[j]))
+        dtype     - the affinity dtype (np.float32 halves the memory)
+        blockSize - the number of rows transformed at a time (None transforms all rows at once)
+        out       - optional preallocated (n,n) array (i.e. a np.memmap for out-of-core use)
 
-        
-        ## ensure diag is zeros
-        A = A - np.diag(np.diag(A))
+        """
+
+        if dMat is None:
+            print("ERROR: distance matrix is None cannot find affinity")
+            return None
+
+        if sk == None and sigma == None:
+            raise Exception("If using Ng et al method must specify sigma")
+
+        n = dMat.shape[0]
+        if blockSize == None:
+            blockSize = n
+        if out is None:
+            out = np.empty(dMat.shape,dtype=dtype)
+        A = out
+
+        ## using method proposed by Zelnik-Manor et al. get sigma k (sk-th smallest distance) for each row
+        if sk != None:
+            sigmaK = np.zeros(n,dtype=dtype)
+            for first in range(0,n,blockSize):
+                last = min(first+blockSize,n)
+                sigmaK[first:last] = np.partition(np.asarray(dMat[first:last]),sk-1,axis=1)[:,sk-1]
+            sigmaK += self.eps
+
+        for first in range(0,n,blockSize):
+            last = min(first+blockSize,n)
+            ## each block is transformed in place in the output
+            block = A[first:last]
+            block[:] = dMat[first:last]
+            block += self.eps
+            np.square(block,out=block)
+
+            ## Ng et al. method
+            if sk == None:
+                block *= -1.0 / (2.0 * sigma**2.0)
+            else:
+                block /= np.outer(sigmaK[first:last],sigmaK)
+                np.negative(block,out=block)
+
+            np.exp(block,out=block)
+
+            ## ensure diag is zeros
+            block[np.arange(last-first),np.arange(first,last)] = 0.0
 
         return A
 
+    def similarity_to_sparse_affinity(self,dMat,sk=7,sigma=None,knn=10,blockSize=1000):
+        """
+        transform a similarity matrix into a sparse affinity matrix
+        only the affinities to the knn nearest neighbours of each item are kept
+        and the result is made symmetric
+
+        """
+
+        if sk == None and sigma == None:
+            raise Exception("If using Ng et al method must specify sigma")
+        if sk != None and sk > knn + 1:
+            raise Exception("knn (%s) must be at least sk-1 (%s)"%(knn,sk-1))
+
+        n = dMat.shape[0]
+        knn = min(knn,n-1)
+        rows = np.repeat(np.arange(n),knn)
+        cols = np.zeros(n*knn,dtype=int)
+        dists = np.zeros(n*knn)
+        sigmaK = np.zeros(n)
+
+        ## find the nearest neighbours (the item itself is the first) a block of rows at a time
+        for first in range(0,n,blockSize):
+            last = min(first+blockSize,n)
+            block = np.array(dMat[first:last],dtype=float) + self.eps
+            block[np.arange(last-first),np.arange(first,last)] = -np.inf
+            nearest = np.argpartition(block,knn,axis=1)[:,:knn+1]
+            nearestDists = np.take_along_axis(block,nearest,axis=1)
+            order = np.argsort(nearestDists,axis=1)
+            nearest = np.take_along_axis(nearest,order,axis=1)[:,1:]
+            nearestDists = np.take_along_axis(nearestDists,order,axis=1)[:,1:]
+            cols[first*knn:last*knn] = nearest.ravel()
+            dists[first*knn:last*knn] = nearestDists.ravel()
+
+            ## the sk-th smallest distance including the item itself
+            if sk != None:
+                sigmaK[first:last] = dMat[np.arange(first,last),np.arange(first,last)] if sk == 1 else nearestDists[:,sk-2]
+
+        if sk == None:
+            data = np.exp(-1.0 * (dists**2.0)  /  (2.0 * sigma**2.0))
+        else:
+            data = np.exp((-1.0 * (dists**2.0))  /  (sigmaK[rows] * sigmaK[cols]))
+
+        A = csr_matrix((data,(rows,cols)),shape=(n,n))
+
+        return A.maximum(A.T).tocsr()
 
     def save(self,labelsPath='sc-labels.csv'):
         """
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+GAF reader specific tests
+These tests do not require the database
+"""
+
+import sys,os,pickle,unittest
+from htsint.database.AnnotationLib import read_gaf_file,parse_gaf_shard,get_gaf_filters
+from htsint.database.FileTools import get_line_shards
+
+## test class for the GAF reader
+class AnnotationTest(unittest.TestCase):
+    """
+    Run a number of tests using a small annotation file
+    """
+
+    def setUp(self):
+        """
+        write a small annotation file
+        """
+
+        self.filePath = 'annotation-test.gaf'
+        fid = open(self.filePath,'w')
+        fid.write("!gaf-version: 2.1\n")
+        for i in range(60):
+            db = 'UniProtKB' if i % 10 != 9 else 'RNAcentral'
+            taxon = ['taxon:9606','taxon:10090','taxon:9606|taxon:10090'][i % 3]
+            fields = [db,"P%05d"%i,"GENE%s"%i,"","GO:%07d"%i,"PMID:%s"%i,['IDA','IEA'][i % 2],"",
+                      ['P','F','C'][i % 4 % 3],"","ENTRY%s_HUMAN|GENE%s"%(i,i),"protein",taxon,"20140101","UniProt","",""]
+            fid.write("\t".join(fields) + "\n")
+        fid.close()
+
+    def tearDown(self):
+        os.remove(self.filePath)
+
+    def testFilters(self):
+        """
+        ensure the records are filtered and the fields are parsed
+        """
+
+        records = list(read_gaf_file(self.filePath,processes=1))
+        self.assertEqual(len(records),36)
+        self.assertEqual(records[0].uniprotEntry,'ENTRY0_HUMAN')
+        self.assertEqual(records[0].taxon,'9606')
+        self.assertEqual(records[0].goId,'GO:0000000')
+
+        records = list(read_gaf_file(self.filePath,taxaList=['9606'],evidenceCodes=['IDA'],
+                                     aspects=['biological_process'],processes=1))
+        self.assertEqual([record.uniprotId for record in records],['P00000','P00012','P00024','P00036','P00048'])
+
+        record = pickle.loads(pickle.dumps(records[0]))
+        self.assertEqual((record.uniprotId,record.evidenceCode,record.aspect),('P00000','IDA','P'))
+
+    def testShards(self):
+        """
+        ensure the sharded and pooled reads give the same records as a single pass
+        """
+
+        records = [record.uniprotId for record in read_gaf_file(self.filePath,taxaList=['9606'],processes=1)]
+        filters = get_gaf_filters(taxaList=['9606'])
+
+        sharded = []
+        for start,end in get_line_shards(self.filePath,7):
+            sharded.extend([record.uniprotId for record in parse_gaf_shard(self.filePath,start,end,filters)])
+        self.assertEqual(sharded,records)
+
+        pooled = [record.uniprotId for record in read_gaf_file(self.filePath,taxaList=['9606'],processes=2,shardSize=500)]
+        self.assertEqual(pooled,records)
+
+### Run the tests
+if __name__ == '__main__':
+    unittest.main()
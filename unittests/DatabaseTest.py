@@ -8,7 +8,7 @@ See /src/database/HOWTO
 import sys,os,unittest,time,re,time
 from sqlalchemy.sql import select
 from htsint.database import db_connect,ask_upass,fetch_annotations,fetch_taxa_annotations
-from htsint.database import Taxon,Gene,Uniprot,GoTerm,GoAnnotation
+from htsint.database import Taxon,Gene,Uniprot,GoTerm,GoAnnotation,decode_aspect
 
 ## global variables
 UPASS = ask_upass()
@@ -27,6 +27,14 @@ class DatabaseTest(unittest.TestCase):
         self.session, self.engine = db_connect(upass=UPASS)
         self.conn = self.engine.connect()
         self.testID = '5476'
+
+    def tearDown(self):
+        """
+        return the connections to the pool
+        """
+
+        self.conn.close()
+        self.session.close()
     
     def testTaxa(self):
         """
@@ -79,7 +87,7 @@ class DatabaseTest(unittest.TestCase):
         """
 
         termQuery = self.session.query(GoTerm).filter_by(go_id="GO:0007623").first()
-        self.assertEqual(termQuery.aspect,"biological_process")
+        self.assertEqual(decode_aspect(termQuery.aspect),"biological_process")
         self.assertEqual(termQuery.name,"circadian rhythm")
         descLook = re.search("that recurs with a regularity of approximately 24 hours.",termQuery.description)
         self.assertTrue(termQuery.description,descLook)
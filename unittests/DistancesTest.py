@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Distance engine specific tests
+These tests do not require the database
+"""
+
+import sys,os,shutil,unittest
+import numpy as np
+import networkx as nx
+from htsint.DistanceLib import graph_to_csr,term_distances,get_condensed_index,get_condensed_size
+from htsint.DistanceLib import pack_gene_terms,gene_distances
+from htsint.DistanceLib import get_chunk_ranges,get_chunk_file,write_chunk_manifest,mark_chunk_complete
+from htsint.DistanceLib import get_incomplete_chunks,read_chunk_manifest,get_file_checksum
+from htsint.DistanceStore import DistanceStore
+
+## test class for the distance functions
+class DistancesTest(unittest.TestCase):
+    """
+    Run a number of tests using a small weighted term graph
+    """
+
+    def setUp(self):
+        """
+        simple setup
+        """
+
+        self.G = nx.Graph()
+        self.G.add_edge('GO:01','GO:02',weight=1.0)
+        self.G.add_edge('GO:02','GO:03',weight=0.5)
+        self.G.add_edge('GO:03','GO:04',weight=0.0)
+        self.G.add_edge('GO:01','GO:04',weight=3.0)
+        self.G.add_edge('GO:05','GO:06',weight=2.0)
+        self.terms = ['GO:01','GO:03','GO:04','GO:05','GO:06','GO:07']
+
+    def testTermDistances(self):
+        """
+        ensure the condensed distances match networkx
+        """
+
+        csgraph,termNodes = graph_to_csr(self.G,self.terms)
+        dist = term_distances(csgraph,termNodes,blockSize=2)
+        n = len(self.terms)
+        self.assertEqual(dist.size,get_condensed_size(n))
+        self.assertEqual(dist.dtype,np.float32)
+
+        for i in range(n):
+            for j in range(i+1,n):
+                source,sink = self.terms[i],self.terms[j]
+                if source in self.G and sink in self.G and nx.has_path(self.G,source,sink):
+                    expected = nx.dijkstra_path_length(self.G,source,sink)
+                else:
+                    expected = np.inf
+                self.assertAlmostEqual(dist[get_condensed_index(i,j,n)],expected)
+
+    def testTermDistanceRange(self):
+        """
+        ensure a range of condensed indices matches the full calculation
+        """
+
+        csgraph,termNodes = graph_to_csr(self.G,self.terms)
+        dist = term_distances(csgraph,termNodes)
+        part = term_distances(csgraph,termNodes,first=3,last=11,blockSize=1)
+        self.assertTrue(np.array_equal(part,dist[3:11]))
+
+    def testDistanceStore(self):
+        """
+        ensure distances can be saved, memory-mapped and looked up
+        """
+
+        storePath = 'term-distances.dist'
+        if os.path.exists(storePath) == True:
+            os.remove(storePath)
+
+        csgraph,termNodes = graph_to_csr(self.G,self.terms)
+        store = DistanceStore(storePath,items=self.terms,mode='w')
+        term_distances(csgraph,termNodes,out=store.distances)
+        store.close()
+
+        store = DistanceStore(storePath)
+        self.assertEqual(store.get_items(),self.terms)
+        self.assertAlmostEqual(store.get_item_distance('GO:04','GO:01'),1.5)
+        self.assertEqual(store.get_item_distance('GO:01','GO:01'),0.0)
+        self.assertTrue(np.isinf(store.get_item_distance('GO:01','GO:07')))
+        self.assertEqual(store.get_item_distance('GO:01','GO:99'),None)
+        store.close()
+        os.remove(storePath)
+
+    def testGeneDistances(self):
+        """
+        ensure the gene distances are the minimum over pairs of distinct terms
+        """
+
+        csgraph,termNodes = graph_to_csr(self.G,self.terms)
+        termDist = term_distances(csgraph,termNodes)
+        nTerms = len(self.terms)
+        geneTerms = [np.array([0,1]),np.array([],dtype=int),np.array([1]),np.array([3,4]),np.array([2,5])]
+        packed = pack_gene_terms(geneTerms)
+        first,dist = gene_distances(termDist,nTerms,geneTerms,packed,0,len(geneTerms))
+        self.assertEqual(first,0)
+
+        n = len(geneTerms)
+        for i in range(n):
+            for j in range(i+1,n):
+                expected = np.inf
+                for ti in geneTerms[i]:
+                    for tj in geneTerms[j]:
+                        if ti != tj:
+                            expected = min(expected,termDist[get_condensed_index(ti,tj,nTerms)])
+                self.assertAlmostEqual(dist[get_condensed_index(i,j,n)],expected)
+
+        ## blocks of source genes give the same result
+        first,part = gene_distances(termDist,nTerms,geneTerms,packed,2,4)
+        self.assertTrue(np.array_equal(part,dist[first:first+part.size]))
+
+    def testChunkManifest(self):
+        """
+        ensure missing and corrupt chunks are found
+        """
+
+        resultsDir = 'chunk-results'
+        if os.path.isdir(resultsDir) == True:
+            shutil.rmtree(resultsDir)
+        os.mkdir(resultsDir)
+
+        chunkRanges = get_chunk_ranges(get_condensed_size(len(self.terms)),4)
+        self.assertEqual(chunkRanges[0][0],0)
+        self.assertEqual(chunkRanges[-1][1],get_condensed_size(len(self.terms)))
+        manifest = write_chunk_manifest(resultsDir,chunkRanges,get_condensed_size(len(self.terms)))
+        self.assertEqual(len(get_incomplete_chunks(resultsDir,manifest)),len(chunkRanges))
+
+        csgraph,termNodes = graph_to_csr(self.G,self.terms)
+        for first,last in chunkRanges:
+            chunkFile = get_chunk_file(resultsDir,first,last)
+            np.save(chunkFile,term_distances(csgraph,termNodes,first=first,last=last))
+            mark_chunk_complete(chunkFile)
+        self.assertEqual(len(get_incomplete_chunks(resultsDir,manifest)),0)
+
+        ## the manifest holds the checksums once the chunks are complete
+        manifest = read_chunk_manifest(resultsDir)
+        first,last = chunkRanges[0]
+        self.assertEqual(manifest['chunks'][0]['checksum'],get_file_checksum(get_chunk_file(resultsDir,first,last)))
+        os.remove(get_chunk_file(resultsDir,first,last)+".done")
+        self.assertEqual(len(get_incomplete_chunks(resultsDir,manifest)),0)
+
+        ## corrupt a single chunk
+        first,last = chunkRanges[1]
+        np.save(get_chunk_file(resultsDir,first,last),np.zeros(last-first,dtype=np.float32))
+        incomplete = get_incomplete_chunks(resultsDir,manifest)
+        self.assertEqual([i for i,chunk in incomplete],[1])
+        shutil.rmtree(resultsDir)
+
+### Run the tests
+if __name__ == '__main__':
+    unittest.main()
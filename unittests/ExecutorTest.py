@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Executor specific tests
+These tests do not require the database or a cluster queue
+"""
+
+import sys,os,io,shutil,tempfile,unittest
+from contextlib import redirect_stdout
+import numpy as np
+from htsint.Executor import LocalExecutor,SgeExecutor,INCOMPLETE
+from htsint.DistanceLib import mark_chunk_complete,check_chunk
+
+## test class for the executors
+class ExecutorTest(unittest.TestCase):
+    """
+    Run a number of tests using small shell scripts
+    """
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def write_script(self,name,lines):
+        script = os.path.join(self.tmpDir,name)
+        fid = open(script,'w')
+        fid.write("#!/bin/bash\n" + "\n".join(lines) + "\n")
+        fid.close()
+        return script
+
+    def testRetries(self):
+        """
+        ensure a script that fails once is run again and the progress is reported
+        """
+
+        flag = os.path.join(self.tmpDir,'failed-once')
+        flaky = self.write_script('flaky.sh',["if [ ! -e %s ]; then touch %s; exit 3; fi"%(flag,flag)])
+        broken = self.write_script('broken.sh',["exit 2"])
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            executor = LocalExecutor(cpus=2,retries=1)
+            results = executor.submit([flaky,broken])
+
+        self.assertEqual(results,{flaky:0,broken:2})
+        self.assertEqual(executor.attempts,{flaky:2,broken:2})
+        self.assertEqual(executor.get_failed(),[broken])
+        self.assertTrue("...2/2 scripts finished" in out.getvalue())
+        self.assertTrue("retrying flaky.sh (exit code 3)" in out.getvalue())
+
+    def testCompletedChunks(self):
+        """
+        ensure a chunk with a valid marker is not run again and a chunk without one is retried
+        """
+
+        chunkFiles = {}
+        for name in ['done','todo']:
+            chunkFile = os.path.join(self.tmpDir,"out-%s.npy"%name)
+            ran = os.path.join(self.tmpDir,"%s.ran"%name)
+            chunkFiles[self.write_script(name+'.sh',["echo run >> %s"%ran])] = (chunkFile,3)
+        np.save(chunkFiles[os.path.join(self.tmpDir,'done.sh')][0],np.zeros(3,dtype=np.float32))
+        mark_chunk_complete(chunkFiles[os.path.join(self.tmpDir,'done.sh')][0])
+
+        executor = LocalExecutor(cpus=2,retries=1,verbose=False)
+        results = executor.submit(sorted(chunkFiles.keys()),check=lambda script: check_chunk(*chunkFiles[script]))
+
+        doneScript,todoScript = [os.path.join(self.tmpDir,name+'.sh') for name in ['done','todo']]
+        self.assertEqual(results,{doneScript:0,todoScript:INCOMPLETE})
+        self.assertEqual(executor.skipped,[doneScript])
+        self.assertFalse(os.path.exists(os.path.join(self.tmpDir,"done.ran")))
+        self.assertEqual(executor.attempts[todoScript],2)
+
+    def testSgeNoWait(self):
+        """
+        ensure the default sge executor submits each script once without polling the queue
+        """
+
+        qsub = self.write_script('qsub',["echo $2 >> %s"%os.path.join(self.tmpDir,'queued'),"echo 1234"])
+        qstat = self.write_script('qstat',["touch %s"%os.path.join(self.tmpDir,'polled')])
+        scripts = [self.write_script("job-%s.sh"%i,["exit 0"]) for i in range(3)]
+
+        executor = SgeExecutor(qsub="bash %s"%qsub,qstat="bash %s"%qstat,verbose=False)
+        results = executor.submit(scripts,check=lambda script: False)
+
+        self.assertEqual(results,dict([(script,0) for script in scripts]))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpDir,'polled')))
+        fid = open(os.path.join(self.tmpDir,'queued'),'r')
+        self.assertEqual(fid.read().split(),scripts)
+        fid.close()
+        fid = open(os.path.join(self.tmpDir,'job-0.submit.log'),'r')
+        self.assertEqual(fid.read(),"1234\n")
+        fid.close()
+        self.assertFalse(os.path.exists(os.path.join(self.tmpDir,'job-0.log')))
+
+### Run the tests
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+idmapping parser specific tests
+These tests do not require the database
+"""
+
+import sys,os,unittest
+from htsint.database.IdmappingLib import get_idmapping_shards,parse_idmapping_shard,parse_idmapping_file
+
+## test class for the idmapping parser
+class IdmappingTest(unittest.TestCase):
+    """
+    Run a number of tests using a small idmapping file
+    """
+
+    def setUp(self):
+        """
+        write a small idmapping file
+        """
+
+        self.filePath = 'idmapping-test.dat'
+        fid = open(self.filePath,'w')
+        for i in range(50):
+            accession = "P%05d"%i
+            fid.write("%s\tUniProtKB-ID\tENTRY%s_HUMAN\n"%(accession,i))
+            fid.write("%s\tRefSeq\tNP_%s.1\n"%(accession,i))
+            fid.write("%s\tNCBI_TaxID\t%s\n"%(accession,9606 if i % 2 == 0 else 10090))
+            fid.write("%s\tGeneID\t%s\n"%(accession,1000+i))
+            fid.write("%s-2\tRefSeq\tNP_%s.2\n"%(accession,i))
+        fid.close()
+
+    def tearDown(self):
+        os.remove(self.filePath)
+
+    def testShards(self):
+        """
+        ensure the shards begin at accession boundaries and give the same entries as a single pass
+        """
+
+        shards = get_idmapping_shards(self.filePath,7)
+        self.assertEqual(shards[0][0],0)
+        self.assertEqual(shards[-1][1],os.path.getsize(self.filePath))
+
+        fid = open(self.filePath,'rb')
+        for start,end in shards[1:]:
+            fid.seek(start-1)
+            self.assertEqual(fid.read(1),b"\n")
+        fid.close()
+
+        entries = parse_idmapping_shard(self.filePath,0,None,set(['9606']))
+        self.assertEqual(len(entries),25)
+        self.assertEqual(entries[0],('P00000','ENTRY0_HUMAN','NP_0.1','9606','1000'))
+
+        sharded = []
+        for start,end in shards:
+            sharded.extend(parse_idmapping_shard(self.filePath,start,end,set(['9606'])))
+        self.assertEqual(sharded,entries)
+
+        pooled = []
+        for shardEntries in parse_idmapping_file(self.filePath,['9606'],processes=2,shardsPerProcess=3):
+            pooled.extend(shardEntries)
+        self.assertEqual(pooled,entries)
+
+### Run the tests
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+ontology index specific tests
+These tests do not require the database
+"""
+
+import sys,os,unittest
+from htsint.database.OntologyIndex import parse_obo_file,get_ontology_index,get_index_file
+
+## test class for the ontology index
+class OntologyIndexTest(unittest.TestCase):
+    """
+    Run a number of tests using a small obo file
+    """
+
+    def setUp(self):
+        """
+        write a small obo file
+        """
+
+        self.filePath = 'ontology-test.obo'
+        fid = open(self.filePath,'w')
+        fid.write("format-version: 1.2\ndata-version: releases/2000-01-01\n\n")
+        fid.write("[Term]\nid: GO:0000001\nname: root\nnamespace: biological_process\ndef: \"a root\" []\n\n")
+        fid.write("[Term]\nid: GO:0000002\nname: child\nnamespace: biological_process\nalt_id: GO:0000020\n")
+        fid.write("is_a: GO:0000001 ! root\nrelationship: part_of GO:0000001 ! root\n\n")
+        fid.write("[Term]\nid: GO:0000003\nname: old\nnamespace: biological_process\nalt_id: GO:0000030\n")
+        fid.write("def: \"OBSOLETE. old\" []\nis_obsolete: true\nis_a: GO:0000001 ! root\n\n")
+        fid.write("[Typedef]\nid: part_of\nname: part of\n")
+        fid.close()
+
+    def tearDown(self):
+        for filePath in [self.filePath,get_index_file(self.filePath)]:
+            if os.path.exists(filePath):
+                os.remove(filePath)
+
+    def testIndex(self):
+        """
+        ensure the terms and edges are parsed and the saved index is the same
+        """
+
+        index = parse_obo_file(self.filePath)
+        self.assertEqual(index.goIds,['GO:0000001','GO:0000002','GO:0000003'])
+        self.assertEqual(index.get_namespace(1),'biological_process')
+        self.assertEqual(index.get_edges('is_a'),[('GO:0000002','GO:0000001')])
+        self.assertEqual(index.get_edges('part_of'),[('GO:0000002','GO:0000001')])
+        self.assertEqual(index.get_alt_ids(),{'GO:0000020':'GO:0000002'})
+        self.assertEqual(index.obsolete.tolist(),[False,False,True])
+
+        cached = get_ontology_index(self.filePath)
+        self.assertTrue(os.path.exists(get_index_file(self.filePath)))
+        loaded = get_ontology_index(self.filePath)
+        self.assertEqual(loaded.names,['root','child','old'])
+        self.assertEqual(loaded.definitions[0],'"a root" []')
+        self.assertEqual(loaded.get_edges('is_a',includeObsolete=True),index.get_edges('is_a',includeObsolete=True))
+
+### Run the tests
+if __name__ == '__main__':
+    unittest.main()
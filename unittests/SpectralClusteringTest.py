@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Spectral clustering specific tests
+These tests do not require the database
+"""
+
+import sys,os,unittest
+import numpy as np
+from htsint.stats import SpectralCluster
+
+## test class for spectral clustering
+class SpectralClusteringTest(unittest.TestCase):
+    """
+    Run a number of tests using three well separated groups of points
+    """
+
+    def setUp(self):
+        """
+        simple setup
+        """
+
+        rs = np.random.RandomState(42)
+        self.points = np.vstack([rs.normal(center,0.3,(40,2)) for center in [(0,0),(3,0),(0,3)]])
+        self.labels = np.repeat([0,1,2],40)
+
+    def testAffinity(self):
+        """
+        ensure the self-tuning affinity matches the definition (blocked and float32)
+        """
+
+        sc = SpectralCluster(self.points,dtype='points')
+        n = self.points.shape[0]
+        sigmaK = np.array([np.sort(sc.M[i,:])[6] for i in range(n)])
+        expected = np.zeros((n,n))
+        for i in range(n):
+            for j in range(n):
+                if i != j:
+                    expected[i,j] = np.exp((-1.0 * (sc.M[i,j]**2.0))  /  (sigmaK[i] * sigmaK[j]))
+
+        self.assertTrue(np.allclose(sc.similarity_to_affinity(sc.M,sk=7),expected))
+        A = sc.similarity_to_affinity(sc.M,sk=7,dtype=np.float32,blockSize=16)
+        self.assertEqual(A.dtype,np.float32)
+        self.assertTrue(np.allclose(A,expected,atol=1e-6))
+
+    def testSparseAffinity(self):
+        """
+        ensure the sparse affinity matches the dense affinity when every neighbour is kept
+        """
+
+        sc = SpectralCluster(self.points,dtype='points')
+        n = self.points.shape[0]
+        dense = sc.similarity_to_affinity(sc.M,sk=None,sigma=0.5)
+        sparse = sc.similarity_to_sparse_affinity(sc.M,sk=None,sigma=0.5,knn=n-1,blockSize=50)
+        self.assertTrue(np.allclose(sparse.toarray(),dense))
+        self.assertTrue(np.isclose(dense[0,1],np.exp(-1.0 * ((sc.M[0,1]+sc.eps)**2.0) / (2.0 * 0.5**2.0))))
+
+        sparse = sc.similarity_to_sparse_affinity(sc.M,sk=7,knn=10)
+        self.assertTrue(np.allclose(sparse.toarray(),sparse.toarray().T))
+        self.assertTrue(sparse.nnz <= 2 * 10 * n)
+
+    def testSparseClustering(self):
+        """
+        ensure the sparse mode recovers the groups
+        """
+
+        sc = SpectralCluster(self.points,dtype='points')
+        sc.run(3,sk=7,sparse=True,knn=10)
+        for label in range(3):
+            self.assertEqual(np.unique(sc.labels[self.labels == label]).size,1)
+        self.assertEqual(np.unique(sc.labels).size,3)
+
+    def testSweep(self):
+        """
+        ensure a sweep over k uses the eigenvectors of a single decomposition
+        """
+
+        sc = SpectralCluster(self.points,dtype='points')
+        results = sc.run_sweep([4,2,3],sk=None,sigma=0.5)
+        self.assertEqual([k for k,avgSilValue,labels in results],[2,3,4])
+        self.assertEqual(sc.X.shape[1],4)
+
+        X = sc.get_eigenvectors(3,sigma=0.5)
+        self.assertTrue(np.allclose(sc.get_eigenvectors(4,sigma=0.5)[:,-3:],X))
+
+    def testCsvToMatrix(self):
+        """
+        ensure a csv of pairwise distances is read into a symmetric matrix
+        """
+
+        distancesPath = 'sc-distances.csv'
+        matrixPath = 'sc-distances-matrix.npy'
+        genesPath = 'sc-distances-genes.npy'
+        for filePath in [matrixPath,genesPath]:
+            if os.path.exists(filePath) == True:
+                os.remove(filePath)
+
+        fid = open(distancesPath,'w')
+        fid.write("i,j,distance\nb,a,1.5\nb,c,2.0\na,d,0.5\n")
+        fid.close()
+
+        sc = SpectralCluster(distancesPath,dtype='distance')
+        self.assertEqual(list(sc.items),['a','b','c','d'])
+        M,items = sc.csv_to_matrix(distancesPath,matrixPath,chunkSize=2)
+        expected = np.array([[0,1.5,0,0.5],[1.5,0,2.0,0],[0,2.0,0,0],[0.5,0,0,0]])
+        self.assertTrue(np.array_equal(M,expected))
+        self.assertTrue(np.array_equal(np.load(matrixPath),expected))
+
+        for filePath in [distancesPath,matrixPath,genesPath]:
+            os.remove(filePath)
+
+### Run the tests
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Database creation tests using the sqlite backend
+A small database is built from fixture data files in a temporary directory
+These tests do not require PostgreSQL or the downloaded data files
+"""
+
+import sys,os,gzip,shutil,tempfile,unittest
+from htsint import Configure
+from htsint.database import DatabaseCreate,db_connect,dispose_engines,get_file_sizes,get_total_annotations
+from htsint.database import get_file_stats,get_gene2go_file
+from htsint.database import fetch_annotations,fetch_taxa_annotations,fetch_taxa_gene_terms
+from htsint.database import Taxon,Gene,Uniprot,GoTerm,GoAnnotation,GoAnnotationRef,TaxaGeneTerm
+
+## the data files (files ending in .gz are compressed)
+FIXTURES = {}
+
+FIXTURES['names.dmp'] = ["9606\t|\tHomo sapiens\t|\t\t|\tscientific name\t|",
+                         "9606\t|\thuman\t|\t\t|\tgenbank common name\t|",
+                         "10090\t|\tMus musculus\t|\t\t|\tscientific name\t|",
+                         "7227\t|\tDrosophila melanogaster\t|\t\t|\tscientific name\t|"]
+
+FIXTURES['gene_info'] = ["#tax_id\tGeneID\tSymbol\tLocusTag\tSynonyms\tdbXrefs\tchromosome\tmap_location\tdescription",
+                         "9606\t100\tAQP1\t-\tCHIP28\t-\t7\t7p14.3\taquaporin 1",
+                         "9606\t200\tADH1\t-\t-\t-\t4\t4q23\talcohol dehydrogenase 1",
+                         "9606\t300\tTP53\t-\tP53\t-\t17\t17p13.1\ttumor protein p53",
+                         "10090\t400\tAqp1\t-\t-\t-\t6\t6 B3\taquaporin 1",
+                         "7227\t500\tAdh\t-\t-\t-\t2L\t35B3\talcohol dehydrogenase"]
+
+FIXTURES['idmapping.dat'] = ["P10001\tUniProtKB-ID\tAQP1_HUMAN","P10001\tRefSeq\tNP_1.1",
+                             "P10001\tNCBI_TaxID\t9606","P10001\tGeneID\t100",
+                             "P10002\tUniProtKB-ID\tADH1_HUMAN","P10002\tNCBI_TaxID\t9606","P10002\tGeneID\t200",
+                             "P10003\tUniProtKB-ID\tAQP1_MOUSE","P10003\tNCBI_TaxID\t10090","P10003\tGeneID\t400",
+                             "P10004\tUniProtKB-ID\tADH_DROME","P10004\tNCBI_TaxID\t7227","P10004\tGeneID\t500",
+                             "P10005\tUniProtKB-ID\tNOGENE_HUMAN","P10005\tNCBI_TaxID\t9606"]
+
+FIXTURES['go.obo'] = ["format-version: 1.2","data-version: releases/2000-01-01","",
+                      "[Term]","id: GO:0000001","name: root process","namespace: biological_process",
+                      "def: \"a process\" []","",
+                      "[Term]","id: GO:0000002","name: child process","namespace: biological_process",
+                      "alt_id: GO:0000012","def: \"a child process\" []","is_a: GO:0000001 ! root process","",
+                      "[Term]","id: GO:0000003","name: a function","namespace: molecular_function",
+                      "def: \"a function\" []","",
+                      "[Term]","id: GO:0000004","name: old process","namespace: biological_process",
+                      "def: \"OBSOLETE. an old process\" []","is_obsolete: true",""]
+
+def gaf_line(uniprotAc,goId,reference,evidenceCode,aspect,synonyms,taxon):
+    return "\t".join(['UniProtKB',uniprotAc,'S','',goId,reference,evidenceCode,'',aspect,'',
+                      synonyms,'protein',taxon,'20000101','UniProt','',''])
+
+FIXTURES['gene_association.goa_uniprot.gz'] = ["!gaf-version: 2.1",
+    gaf_line('P10001','GO:0000002','PMID:1','IDA','P','AQP1_HUMAN|AQP1','taxon:9606'),
+    gaf_line('P10002','GO:0000012','GO_REF:2','IEA','P','ADH1_HUMAN','taxon:9606'),
+    gaf_line('P10003','GO:0000001','PMID:3','TAS','P','AQP1_MOUSE','taxon:10090'),
+    gaf_line('P10005','GO:0000003','','IDA','F','NOGENE_HUMAN','taxon:9606'),
+    gaf_line('P10004','GO:0000001','PMID:4','IDA','P','ADH_DROME','taxon:7227'),
+    gaf_line('P10001','GO:0000001','PMID:5','IDA','P','AQP1_HUMAN','taxon:9606|taxon:10090'),
+    gaf_line('P99999','GO:0000001','PMID:6','IDA','P','UNKNOWN_HUMAN','taxon:9606')]
+
+FIXTURES['gene2go.gz'] = ["#tax_id\tGeneID\tGO_ID\tEvidence\tQualifier\tGO_term\tPubMed\tCategory",
+                          "#a comment line that is not counted",
+                          "9606\t100\tGO:0000001\tIMP\t-\troot process\tPMID:7\tProcess",
+                          "9606\t300\tGO:0000003\tIDA\t-\ta function\t-\tFunction",
+                          "10090\t400\tGO:0000002\tIEA\t-\tchild process\t-\tProcess",
+                          "7227\t500\tGO:0000001\tIDA\t-\troot process\t-\tProcess",
+                          "9606\t300\tGO:9999999\tIDA\t-\tunknown\t-\tProcess"]
+
+## test class for the sqlite database build
+class SqliteBuildTest(unittest.TestCase):
+    """
+    Build a small sqlite database with DatabaseCreate and query it
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        write the data files and a config in a temporary home directory then create the database
+        """
+
+        cls.tmpDir = tempfile.mkdtemp()
+        cls.home = os.environ.get('HOME')
+        os.environ['HOME'] = cls.tmpDir
+        dispose_engines()
+
+        dataDir = os.path.join(cls.tmpDir,'data')
+        os.mkdir(dataDir)
+        for fileName,lines in FIXTURES.items():
+            filePath = os.path.join(dataDir,fileName)
+            fid = gzip.open(filePath,'wt') if fileName.endswith(".gz") else open(filePath,'w')
+            fid.write("\n".join(lines) + "\n")
+            fid.close()
+
+        config = Configure()
+        config.log['data'] = dataDir
+        config.log['dbname'] = 'htsinttest'
+        config.log['dbbackend'] = 'sqlite'
+        config.log['taxa'] = ['9606','10090']
+        config.save()
+
+        DatabaseCreate().run()
+
+    @classmethod
+    def tearDownClass(cls):
+        dispose_engines()
+        if cls.home is None:
+            del os.environ['HOME']
+        else:
+            os.environ['HOME'] = cls.home
+        shutil.rmtree(cls.tmpDir)
+
+    def setUp(self):
+        self.session,self.engine = db_connect()
+
+    def tearDown(self):
+        self.session.close()
+
+    def testRowCounts(self):
+        """
+        ensure the taxa and filtered records are loaded
+        """
+
+        counts = dict([(table.__tablename__,self.session.query(table).count()) for table in \
+                       [Taxon,Gene,Uniprot,GoTerm,GoAnnotation,GoAnnotationRef,TaxaGeneTerm]])
+        self.assertEqual(counts,{'taxa':3,'genes':4,'uniprot':4,'go_terms':4,'go_annotations':7,
+                                 'go_annotation_refs':6,'taxa_gene_terms':5})
+
+        gene = self.session.query(Gene).filter_by(ncbi_id='100').first()
+        self.assertEqual(gene.symbol,'AQP1')
+        uniprot = self.session.query(Uniprot).filter_by(uniprot_ac='P10001').first()
+        self.assertEqual((uniprot.uniprot_entry,uniprot.gene_id),('AQP1_HUMAN',gene.id))
+
+    def testFileStats(self):
+        """
+        ensure the file counts were written by the loading pass
+        """
+
+        self.assertEqual(get_file_sizes(),(4,4))
+        self.assertEqual(get_file_stats(get_gene2go_file(),['9606','10090']),5)
+        self.assertEqual(get_total_annotations(),10)
+
+    def testFetchAnnotations(self):
+        """
+        ensure the annotations of a uniprot entry include those of its gene
+        """
+
+        annotations = fetch_annotations(['P10001','P10005'],self.engine,idType='uniprot')
+        self.assertEqual(sorted([goId for goId,name in annotations['P10001']]),['GO:0000001','GO:0000002'])
+        self.assertEqual(annotations['P10005'],[])
+
+        annotations = fetch_annotations(['300'],self.engine,idType='ncbi',aspect='molecular_function')
+        self.assertEqual(annotations['300'],[('GO:0000003','a function')])
+
+    def testTaxaGeneTerms(self):
+        """
+        ensure the materialized gene terms are the same as the gene annotations of fetch_taxa_annotations
+        """
+
+        for aspect in ['biological_process','molecular_function']:
+            for useIea in [True,False]:
+                geneAnnotations,uniprotAnnotations = fetch_taxa_annotations(['9606','10090'],self.engine,
+                                                                            aspect=aspect,useIea=useIea)
+                geneTerms = fetch_taxa_gene_terms(['9606','10090'],self.engine,aspect=aspect,useIea=useIea)
+                self.assertEqual(dict([(key,sorted(items)) for key,items in geneTerms.items()]),
+                                 dict([(key,sorted(items)) for key,items in geneAnnotations.items()]))
+
+        geneAnnotations,uniprotAnnotations = fetch_taxa_annotations(['9606'],self.engine,useIea=False)
+        self.assertEqual(sorted(geneAnnotations['100']),['GO:0000001','GO:0000002'])
+        self.assertTrue('200' not in geneAnnotations)
+
+### Run the tests
+if __name__ == '__main__':
+    unittest.main()
@@ -28,6 +28,11 @@ from .DatabaseTest import *
 DatabaseTestSuite = unittest.TestLoader().loadTestsFromTestCase(DatabaseTest)
 DatabaseSuite = unittest.TestSuite([DatabaseTestSuite])
 
+## sqlite database build tests
+from .SqliteBuildTest import *
+SqliteBuildTestSuite = unittest.TestLoader().loadTestsFromTestCase(SqliteBuildTest)
+SqliteBuildSuite = unittest.TestSuite([SqliteBuildTestSuite])
+
 ## GeneOntology tests
 from .GeneOntologyTest import *
 GeneOntologyTestSuite = unittest.TestLoader().loadTestsFromTestCase(GeneOntologyTest)
@@ -42,3 +47,33 @@ from .BlastMapperTest import *
 BlastMapperTestSuite = unittest.TestLoader().loadTestsFromTestCase(BlastMapperTest)
 BlastMapperSuite = unittest.TestSuite([BlastMapperTestSuite])
 
+
+## Distance tests
+from .DistancesTest import *
+DistancesTestSuite = unittest.TestLoader().loadTestsFromTestCase(DistancesTest)
+DistancesSuite = unittest.TestSuite([DistancesTestSuite])
+
+## Executor tests
+from .ExecutorTest import *
+ExecutorTestSuite = unittest.TestLoader().loadTestsFromTestCase(ExecutorTest)
+ExecutorSuite = unittest.TestSuite([ExecutorTestSuite])
+
+## idmapping parser tests
+from .IdmappingTest import *
+IdmappingTestSuite = unittest.TestLoader().loadTestsFromTestCase(IdmappingTest)
+IdmappingSuite = unittest.TestSuite([IdmappingTestSuite])
+
+## GAF reader tests
+from .AnnotationTest import *
+AnnotationTestSuite = unittest.TestLoader().loadTestsFromTestCase(AnnotationTest)
+AnnotationSuite = unittest.TestSuite([AnnotationTestSuite])
+
+## ontology index tests
+from .OntologyIndexTest import *
+OntologyIndexTestSuite = unittest.TestLoader().loadTestsFromTestCase(OntologyIndexTest)
+OntologyIndexSuite = unittest.TestSuite([OntologyIndexTestSuite])
+
+## Spectral clustering tests
+from .SpectralClusteringTest import *
+SpectralClusteringTestSuite = unittest.TestLoader().loadTestsFromTestCase(SpectralClusteringTest)
+SpectralClusteringSuite = unittest.TestSuite([SpectralClusteringTestSuite])